@@ -1,21 +1,81 @@
 # Importing required modules
-from flask import Flask, request, render_template, redirect, url_for, send_from_directory, jsonify
+from flask import Flask, request, render_template, redirect, url_for, send_from_directory, send_file, jsonify
+import io
+import mimetypes
 import os
-import requests
 from werkzeug.utils import secure_filename
 from flask_sqlalchemy import SQLAlchemy
 from pprint import pprint
 from flask_cors import CORS # Include CORS Requests
 from datetime import datetime, timedelta
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 
 # Import the database instance
 from db_instance import db
 
 # Immigration Checkpoint Workflow Logic
-from immigration_logic import immigration_walkthrough
+from immigration_logic import immigration_walkthrough, immigration_walkthrough_batch, immigration_walkthrough_fuzzy, consume_pass, classify_consume_conflict
 
 from models import UserSensitiveInformation, Vehicle, UserVehicle, Preset, PresetTraveller, Pass, PassTraveller, UserTraveller
 
+# Canonical plate form used for every vehicle lookup
+from plate_utils import canonicalize_plate
+
+# Bulk loaders for list endpoints (fixed query count per request)
+from loaders import parse_page_args, load_user_passes, load_pass_travellers, load_user_presets_with_counts, load_user_presets_with_members, load_users_by_passport
+
+# Profile validation, serialization and ETags
+from user_profile import PROFILE_FIELDS, profile_dict, profile_etag, parse_profile_patch
+
+# Per-user data versions behind ETags and conditional GETs
+from data_versions import conditional_get, cached_response, bump_user_versions, bump_user_and_dependents, CACHE_CONTROL
+
+# Rendered responses of the per-user read endpoints (in-process LRU, optional shared store)
+from response_cache import response_cache
+
+# orjson-backed responses built from precompiled row templates, compressed per Accept-Encoding
+from serialization import json_response, init_response_compression, PASS_ROW, UTILIZED_PASS_ROW, VEHICLE_ROW, PRESET_COUNT_ROW, PRESET_USER_ROW, USER_TRAVELLER_ROW
+
+# In-memory map of today's valid passes used by the checkpoint lane
+from pass_cache import hot_plate_cache
+
+# Bloom filter of registered plates, rejects unknown vehicles at the gate without a query
+from plate_filter import plate_filter
+
+# OCR-tolerant matching of recognized plates against registered vehicles
+from plate_matcher import plate_matcher
+
+# Pooled, retrying PlateRecognizer client (API url can be pointed at plate_recognizer_stub.py via PLATE_RECOGNIZER_URL)
+from plate_recognizer import recognize_license_plate, recognize_license_plates, get_client, plate_from_response, plate_candidates_from_response, RecognitionError
+
+# Content-addressed cache of recognition results
+from recognition_cache import recognition_cache
+
+# Downscaling/cropping of frames before recognition, run on a process pool
+from image_preprocess import image_preprocessor
+
+# In-process recognition job queue (upload returns a job id, clients poll for the result)
+from recognition_jobs import recognition_jobs, QueueFull
+
+# Optional background archiving of uploaded frames
+from upload_archive import UploadArchiver
+
+# Memory-mappable manifests of upcoming passes for offline kiosk validation
+from lane_manifest import latest_version, manifest_name, delta_name
+
+# Background move of long-expired passes out of the tables the checkpoint path searches
+from pass_archive import pass_archiver
+
+# Read replica routing with read-your-writes stickiness
+from db_routing import read_only, replica_binds, init_db_routing
+
+# SQLite tuning profiles (WAL, pragmas, pooling)
+from db_config import engine_options, attach_pragmas
+
+# Versioned schema migrations
+from migrations import create_or_upgrade
+
 # Import mock_data function
 from mock_data import insert_mock_data
 
@@ -26,10 +86,52 @@ CORS(app)  # Enable CORS for React Native requests
 # Configuration
 UPLOAD_FOLDER = 'uploads' # Directory where uploaded images will be saved
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER # Use Upload_Folder for file uploads
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///immigration.db' # SQLite Database URI for local testing
+app.config['ARCHIVE_UPLOADS'] = True # Keep a copy of uploaded frames on disk (written in the background)
+app.config['UPLOAD_ARCHIVE_FOLDER'] = 'archive' # Sub-folder of UPLOAD_FOLDER managed by the retention policy
+app.config['UPLOAD_RETENTION_DAYS'] = 7 # Archived frames older than this are deleted
+app.config['UPLOAD_ARCHIVE_MAX_BYTES'] = 500 * 1024 * 1024 # Oldest archived frames are deleted beyond this size
+app.config['ARCHIVE_EXPIRED_PASSES'] = True # Move expired passes to pass_archive/pass_traveller_archive in the background
+app.config['PASS_ARCHIVE_AFTER_HOURS'] = 24 # Passes expired longer than this are archived
+app.config['PASS_ARCHIVE_INTERVAL'] = 300 # Seconds between archive sweeps
+app.config['PASS_ARCHIVE_BATCH_SIZE'] = 500 # Passes moved per transaction
+app.config['LANE_MANIFEST_FOLDER'] = os.path.join('instance', 'manifests') # Written by "python lane_manifest.py build|delta"
+app.config['LANE_MANIFEST_WINDOW_HOURS'] = 24 # A manifest lists the passes valid in the next this many hours
+app.config['PLATE_FILTER_PATH'] = os.environ.get('PLATE_FILTER_PATH', os.path.join(app.instance_path, 'plate_filter.bin')) # Persisted Bloom filter of registered plates
+app.config['PLATE_FILTER_ERROR_RATE'] = 0.001 # Target false-positive rate (unknown plates that still reach the database)
+app.config['PLATE_FILTER_REFRESH_SECONDS'] = 5 # Vehicles registered through other worker processes are picked up this often
+app.config['FUZZY_MATCH_MAX_COST'] = 1.0 # Largest OCR-weighted edit distance considered a match (one arbitrary edit)
+app.config['FUZZY_MATCH_AUTO_ACCEPT'] = False # Resolve clear matches without an officer; off, they are returned as suggestions to confirm
+app.config['FUZZY_MATCH_AUTO_ACCEPT_COST'] = 0.6 # Largest cost of a clear match (confusion misreads)
+app.config['FUZZY_MATCH_BUDGET_MS'] = 25 # Latency budget of one fuzzy match
+app.config['FUZZY_MATCH_LIMIT'] = 5 # Ranked suggestions returned
+app.config['RECOGNITION_CACHE_PATH'] = os.environ.get('RECOGNITION_CACHE_PATH', os.path.join(app.instance_path, 'recognition_cache.db')) # SQLite cache of PlateRecognizer results by frame digest
+app.config['PREPROCESS_IMAGES'] = True # Re-encode frames before sending them to PlateRecognizer
+app.config['PREPROCESS_MAX_SIDE'] = 1280 # Longest side (px) of the frame sent for recognition
+app.config['PREPROCESS_JPEG_QUALITY'] = 85 # JPEG quality of the re-encoded frame
+app.config['LANE_REGIONS'] = {} # Per-lane crop as fractions (left, top, right, bottom), e.g. {"lane-1": (0.0, 0.4, 1.0, 1.0)}
+app.config['CHECKPOINT_BATCH_MAX_ITEMS'] = 64 # Most frames/plates accepted by /api/checkpoint/batch in one request
+app.config['RECOGNITION_JOB_WORKERS'] = 8 # Threads recognizing queued frames (/api/checkpoint/jobs)
+app.config['RECOGNITION_JOB_MAX_DEPTH'] = 1000 # Queued frames beyond this are rejected with 503 + Retry-After
+app.config['RECOGNITION_JOB_RESULT_TTL'] = 600 # Seconds a finished job stays available for polling
+app.config['RECOGNITION_JOB_MAX_WAIT'] = 30 # Longest long-poll (?wait=) in seconds
+app.config['LANE_PRIORITIES'] = {} # Queue priority per lane, lower is served first (lanes not listed get 10), e.g. {"lane-1": 0}
+app.config['ASYNC_MAX_IN_FLIGHT'] = 256 # ASGI mode (asgi_app.py): recognitions in flight per process
+app.config['ASYNC_WORKER_THREADS'] = 16 # ASGI mode: threads for database work, rendering and the non-lane routes
+app.config['ASYNC_MAX_BODY_BYTES'] = 32 * 1024 * 1024 # ASGI mode: largest accepted request body
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///immigration.db') # Primary database (all writes), SQLite for local testing
+app.config['SQLALCHEMY_BINDS'] = replica_binds([url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]) # Comma-separated read replica URIs
+app.config['READ_YOUR_WRITES_SECONDS'] = 5 # After a write, the client's reads stay on the primary this long
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = 10_000 # Per-process LRU of rendered per-user responses
+app.config['RESPONSE_CACHE_MAX_BYTES'] = 64 * 1024 * 1024
+app.config['RESPONSE_CACHE_TTL'] = 300 # Seconds, also the lifetime of entries in the shared store
+app.config['COMPRESS_MIN_BYTES'] = 1024 # Smaller JSON responses are sent uncompressed
+app.config['COMPRESS_GZIP_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_QUALITY'] = 4 # Only used when the brotli package is installed
+app.config['RESPONSE_CACHE_SHARED_URL'] = os.environ.get('RESPONSE_CACHE_SHARED_URL', '') # "" (process-local only), sqlite:///path or redis://host:port/db
 # app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-TOKEN = "210ed0449ee06e8d9bcee4a67c742814e4e7366e" # This is the PlateRecognizer API Token
-API_URL = "https://api.platerecognizer.com/v1/plate-reader/" # This is the PlateRecognizer API Url
+app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'production') # SQLite tuning profile from db_config.DATABASE_PROFILES
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['DATABASE_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI'])
+TOKEN = os.environ.get("PLATE_RECOGNIZER_TOKEN", "210ed0449ee06e8d9bcee4a67c742814e4e7366e") # This is the PlateRecognizer API Token
 
 
 # Ensure the upload directory exists
@@ -39,6 +141,108 @@ if not os.path.exists(UPLOAD_FOLDER):
 # Initialize SQLAlchemy for the Flask app
 db.init_app(app)
 
+# Route read-only endpoints to replicas, with read-your-writes stickiness after a mutation
+init_db_routing(app)
+
+# Apply the profile's PRAGMAs to every connection the engines open
+with app.app_context():
+    for engine in db.engines.values():
+        attach_pragmas(engine, app.config['DATABASE_PROFILE'])
+
+# Keep the recognition cache in the Flask instance folder whatever the working directory
+recognition_cache.configure(path=app.config['RECOGNITION_CACHE_PATH'])
+
+# Apply the preprocessing settings to the shared preprocessor
+image_preprocessor.configure(
+    enabled=app.config['PREPROCESS_IMAGES'],
+    max_side=app.config['PREPROCESS_MAX_SIDE'],
+    quality=app.config['PREPROCESS_JPEG_QUALITY'],
+    lane_regions=app.config['LANE_REGIONS']
+)
+
+# gzip/brotli for JSON responses of at least COMPRESS_MIN_BYTES
+init_response_compression(app)
+
+# Per-user response cache shared by the worker processes when a shared store is configured
+response_cache.configure(
+    max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+    max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+    ttl=app.config['RESPONSE_CACHE_TTL'],
+    shared_url=app.config['RESPONSE_CACHE_SHARED_URL']
+)
+
+# Recognition + checkpoint resolution of a queued frame, run on a job worker thread
+# The recognizer's alternative readings let a misread plate still resolve (see immigration_walkthrough_fuzzy)
+def process_checkpoint_job(image_bytes, lane):
+    try:
+        data = get_client(TOKEN).recognize(image_bytes, lane)
+    except RecognitionError as e:
+        return {"license_plate": None, "immigration_result": {"status": "failure", "message": str(e)}}
+
+    license_plate = plate_from_response(data)
+    if license_plate == "No license plate detected.":
+        return {"license_plate": None, "immigration_result": {"status": "failure", "message": license_plate}}
+
+    with app.app_context():
+        return {"license_plate": license_plate, "immigration_result": immigration_walkthrough_fuzzy(plate_candidates_from_response(data))}
+
+
+recognition_jobs.configure(
+    handler=process_checkpoint_job,
+    workers=app.config['RECOGNITION_JOB_WORKERS'],
+    max_depth=app.config['RECOGNITION_JOB_MAX_DEPTH'],
+    result_ttl=app.config['RECOGNITION_JOB_RESULT_TTL'],
+    lane_priorities=app.config['LANE_PRIORITIES']
+)
+
+plate_matcher.configure(
+    max_cost=app.config['FUZZY_MATCH_MAX_COST'],
+    auto_accept=app.config['FUZZY_MATCH_AUTO_ACCEPT'],
+    auto_accept_cost=app.config['FUZZY_MATCH_AUTO_ACCEPT_COST'],
+    budget_ms=app.config['FUZZY_MATCH_BUDGET_MS'],
+    limit=app.config['FUZZY_MATCH_LIMIT']
+)
+
+# Background writer for uploaded frames, the request path never touches the disk
+upload_archiver = UploadArchiver(
+    os.path.join(UPLOAD_FOLDER, app.config['UPLOAD_ARCHIVE_FOLDER']),
+    max_age_days=app.config['UPLOAD_RETENTION_DAYS'],
+    max_total_bytes=app.config['UPLOAD_ARCHIVE_MAX_BYTES']
+)
+
+# Loaded or built at startup (below) or in the background on the first checkpoint lookup, then kept up to date from the vehicle table
+plate_filter.configure(
+    path=app.config['PLATE_FILTER_PATH'],
+    error_rate=app.config['PLATE_FILTER_ERROR_RATE'],
+    refresh_interval=timedelta(seconds=app.config['PLATE_FILTER_REFRESH_SECONDS'])
+)
+
+# Sweeps expired passes into the archive tables, started with the first request (the tables exist by then)
+pass_archiver.configure(
+    archive_after=timedelta(hours=app.config['PASS_ARCHIVE_AFTER_HOURS']),
+    batch_size=app.config['PASS_ARCHIVE_BATCH_SIZE'],
+    interval=app.config['PASS_ARCHIVE_INTERVAL']
+)
+
+@app.before_request
+def start_pass_archiver():
+    if app.config['ARCHIVE_EXPIRED_PASSES']:
+        pass_archiver.start(app)
+
+
+# Read an uploaded frame into memory and queue it for archiving if enabled
+# Returns the image bytes and the name to show it under (None when not archived)
+def read_upload(file):
+    image_bytes = file.read()
+
+    archived_name = None
+    if app.config['ARCHIVE_UPLOADS']:
+        name = upload_archiver.archive(secure_filename(file.filename), image_bytes)
+        if name:
+            archived_name = f"{app.config['UPLOAD_ARCHIVE_FOLDER']}/{name}"
+
+    return image_bytes, archived_name
+
 
 # Defines the route for Homepage (consisting of Image Upload)
 @app.route('/', methods=['GET', 'POST'])
@@ -60,29 +264,31 @@ def upload_file():
         # If file was correctly uploaded so far
         if file:
 
-            # Sanitize the filename
-            filename = secure_filename(file.filename)
-
-            # Save uploaded file to specific path/folder
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            # Keep the frame in memory, archiving (if enabled) happens in the background
+            image_bytes, filename = read_upload(file)
             
             # Process the image using PlateRecognizer API
-            license_plate = recognize_license_plate(file_path, TOKEN)
+            license_plate = recognize_license_plate(image_bytes, TOKEN, lane=request.form.get('lane'))
 
-            if "Error" in license_plate or license_plate == "No license plate detected.":
-                return render_template('upload.html', filename=filename, license_plate=license_plate)
-            
-            # Start the database logic process
-            immigration_result = immigration_walkthrough(license_plate)
-            
-            return render_template('upload.html', filename=filename, license_plate=license_plate, immigration_result=immigration_result)
+            return checkpoint_page(filename, license_plate)
 
     
     # GET Method is called
     else:
         return render_template('upload.html')
 
+
+# Checkpoint page for a recognized plate (shared with the async lane service in asgi_app.py)
+def checkpoint_page(filename, license_plate):
+
+    if "Error" in license_plate or license_plate == "No license plate detected.":
+        return render_template('upload.html', filename=filename, license_plate=license_plate)
+
+    # Start the database logic process
+    immigration_result = immigration_walkthrough(license_plate)
+
+    return render_template('upload.html', filename=filename, license_plate=license_plate, immigration_result=immigration_result)
+
 # Define the route for Mask of Vehicular Guidance System
 @app.route('/vehicular-guidance-system', methods=['GET', 'POST'])
 def vehicular_guidance_system():
@@ -103,83 +309,223 @@ def vehicular_guidance_system():
         # If file was correctly uploaded so far
         if file:
 
-            # Sanitize the filename
-            filename = secure_filename(file.filename)
-
-            # Save uploaded file to specific path/folder
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            # Keep the frame in memory, archiving (if enabled) happens in the background
+            image_bytes, filename = read_upload(file)
             
             # Process the image using PlateRecognizer API
-            #TODO - Need to change the PlateRecognizer API and include Make, Model and Color to be returned and validation for that
-            license_plate = recognize_license_plate(file_path, TOKEN)
-            make = "make"
-            model = "model"
-            color = "color"
-            error_messages = [] # List of error messages to be stored for license plate, make, model and color
-
-            # The vehicular data in json format
-            vehicular_data = {
-                "license_plate": None,
-                "make": None,
-                "model": None,
-                "color": None
-            }
-
-            # --- LICENSE PLATE ---
-            if "Error" in license_plate or license_plate == "No license plate detected.":
-                error_messages.append("No license plate detected")
-                vehicular_data["license_plate"] = None
-            else:
-                vehicular_data["license_plate"] = license_plate
-
-            # --- MAKE ---
-            if "Error" in make or make == "No make detected.":
-                error_messages.append("No make detected")
-                vehicular_data["make"] = None
-            else:
-                vehicular_data["make"] = make
-
-            # --- MODEL ---
-            if "Error" in model or model == "No model detected.":
-                error_messages.append("No model detected")
-                vehicular_data["model"] = None
-            else:
-                vehicular_data["model"] = model
-
-            # --- COLOR ---
-            if "Error" in color or color == "No color detected.":
-                error_messages.append("No color detected")
-                vehicular_data["color"] = None
-            else:
-                vehicular_data["color"] = color
-
-
-            # Determine overall status
-            if error_messages:
-                status = "failed"
-                message = " | ".join(error_messages)  # Join all errors into one string
-            else:
-                status = "success"
-                message = "All fields recognized successfully"
-
-            vehicular_guidance_system_result = {
-                "status": status,
-                "message": message,
-                **vehicular_data  # unpacking the vehicular data dictionary with recognized data
-            }
-
-            return render_template(
-                'vehicular_guidance_system.html',
-                filename = filename,
-                vehicular_guidance_system_result = vehicular_guidance_system_result
-            )
+            license_plate = recognize_license_plate(image_bytes, TOKEN, lane=request.form.get('lane'))
+            return vehicular_guidance_page(filename, license_plate)
     
     # GET Method is called
     else:
         return render_template('vehicular_guidance_system.html')
 
 
+# Vehicular guidance page for a recognized plate (shared with the async lane service in asgi_app.py)
+def vehicular_guidance_page(filename, license_plate):
+
+    #TODO - Need to change the PlateRecognizer API and include Make, Model and Color to be returned and validation for that
+    make = "make"
+    model = "model"
+    color = "color"
+    error_messages = [] # List of error messages to be stored for license plate, make, model and color
+
+    # The vehicular data in json format
+    vehicular_data = {
+        "license_plate": None,
+        "make": None,
+        "model": None,
+        "color": None
+    }
+
+    # --- LICENSE PLATE ---
+    if "Error" in license_plate or license_plate == "No license plate detected.":
+        error_messages.append("No license plate detected")
+        vehicular_data["license_plate"] = None
+    else:
+        vehicular_data["license_plate"] = license_plate
+
+    # --- MAKE ---
+    if "Error" in make or make == "No make detected.":
+        error_messages.append("No make detected")
+        vehicular_data["make"] = None
+    else:
+        vehicular_data["make"] = make
+
+    # --- MODEL ---
+    if "Error" in model or model == "No model detected.":
+        error_messages.append("No model detected")
+        vehicular_data["model"] = None
+    else:
+        vehicular_data["model"] = model
+
+    # --- COLOR ---
+    if "Error" in color or color == "No color detected.":
+        error_messages.append("No color detected")
+        vehicular_data["color"] = None
+    else:
+        vehicular_data["color"] = color
+
+
+    # Determine overall status
+    if error_messages:
+        status = "failed"
+        message = " | ".join(error_messages)  # Join all errors into one string
+    else:
+        status = "success"
+        message = "All fields recognized successfully"
+
+    vehicular_guidance_system_result = {
+        "status": status,
+        "message": message,
+        **vehicular_data  # unpacking the vehicular data dictionary with recognized data
+    }
+
+    return render_template(
+        'vehicular_guidance_system.html',
+        filename = filename,
+        vehicular_guidance_system_result = vehicular_guidance_system_result
+    )
+
+
+# Batch checkpoint for a bank of lanes: many frames (multipart) or plates (JSON) in one request
+# Multipart: files under "frames", with optional "lane" and "id" fields in the same order
+# JSON: {"items": [{"id": ..., "lane": ..., "plate": "SKR9859E"}, ...]}
+@app.route('/api/checkpoint/batch', methods=['POST'])
+def checkpoint_batch():
+
+    try:
+        items = batch_items(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not items:
+        return jsonify({"error": "No frames or plates provided"}), 400
+
+    if len(items) > app.config['CHECKPOINT_BATCH_MAX_ITEMS']:
+        return jsonify({"error": f"At most {app.config['CHECKPOINT_BATCH_MAX_ITEMS']} items per batch"}), 413
+
+    # Recognize all submitted frames concurrently
+    frame_items = [item for item in items if "frame" in item]
+    if frame_items:
+        images = [read_upload(item["frame"])[0] for item in frame_items]
+        plates = recognize_license_plates(images, TOKEN, [item["lane"] for item in frame_items])
+        for item, plate in zip(frame_items, plates):
+            item["plate"] = plate
+
+    return batch_results(items), 200
+
+
+# Items of a batch checkpoint request: frames with their lane and id (multipart) or plates (JSON)
+# Raises ValueError when the JSON body is not {"items": [{"plate": "...", ...}, ...]}
+def batch_items(request):
+
+    if request.files:
+        frames = request.files.getlist('frames')
+        lanes = request.form.getlist('lane')
+        ids = request.form.getlist('id')
+        items = [
+            {
+                "id": ids[i] if i < len(ids) else i,
+                "lane": lanes[i] if i < len(lanes) else None,
+                "frame": frame
+            }
+            for i, frame in enumerate(frames)
+        ]
+    else:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict) or not isinstance(data.get("items", []), list):
+            raise ValueError("Expected a JSON object with an items list")
+
+        items = []
+        for i, item in enumerate(data.get("items", [])):
+            if not isinstance(item, dict):
+                raise ValueError(f"Item {i} must be an object")
+            if not isinstance(item.get("plate"), (str, type(None))):
+                raise ValueError(f"Item {i}: plate must be a string")
+            items.append({"id": item.get("id", i), "lane": item.get("lane"), "plate": item.get("plate")})
+
+    return items
+
+
+# Resolve batch items whose plates are recognized into the batch response
+def batch_results(items):
+
+    results = [None] * len(items)
+    plates = [None] * len(items)
+
+    for index, item in enumerate(items):
+        plate = item.get("plate")
+
+        if not plate or "Error" in plate or plate == "No license plate detected.":
+            results[index] = {"status": "failure", "message": plate or "No license plate provided."}
+        else:
+            plates[index] = plate
+
+    # Resolve every recognized plate with one set-based query
+    resolvable = [index for index, plate in enumerate(plates) if plate is not None]
+    resolved = immigration_walkthrough_batch([plates[index] for index in resolvable])
+    for index, result in zip(resolvable, resolved):
+        results[index] = result
+
+    return jsonify({
+        "results": [
+            {
+                "id": item["id"],
+                "lane": item["lane"],
+                "license_plate": plate,
+                "immigration_result": result
+            }
+            for item, plate, result in zip(items, plates, results)
+        ]
+    })
+
+
+# Queue a frame for recognition and return a job id at once (202); poll GET /api/checkpoint/jobs/<job_id> for the result
+# Multipart: the frame under "file" with an optional "lane" (sets the queue priority, see LANE_PRIORITIES)
+@app.route('/api/checkpoint/jobs', methods=['POST'])
+def submit_checkpoint_job():
+
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({"error": "No frame provided"}), 400
+
+    image_bytes, filename = read_upload(file)
+
+    try:
+        job = recognition_jobs.submit(image_bytes, lane=request.form.get('lane'), filename=filename)
+    except QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = url_for('get_checkpoint_job', job_id=job.job_id)
+    return response, 202
+
+
+# Status of a queued frame, with the license plate and immigration result once done
+# ?wait=<seconds> long-polls until the job finishes (capped at RECOGNITION_JOB_MAX_WAIT)
+@app.route('/api/checkpoint/jobs/<job_id>', methods=['GET'])
+def get_checkpoint_job(job_id):
+
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), app.config['RECOGNITION_JOB_MAX_WAIT'])
+    except ValueError:
+        return jsonify({"error": "Invalid wait parameter"}), 400
+
+    job = recognition_jobs.wait(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+
+    return jsonify(job.to_dict()), 200
+
+
+# Queue depth per lane, rejections and queue-wait/processing latency of the recognition job queue
+@app.route('/api/checkpoint/jobs/stats', methods=['GET'])
+def get_checkpoint_job_stats():
+    return jsonify(recognition_jobs.stats()), 200
+
 
 @app.route('/api/users/<int:user_id>/vehicles', methods=['POST'])
 def add_vehicle_to_user(user_id):
@@ -195,14 +541,14 @@ def add_vehicle_to_user(user_id):
     user_vehicle_model = data.get('user_vehicle_model') # Name user has assigned to the vehicle
     
     # If vehicle number or user vehicle name is not mentioned in incoming JSON, throw error
-    if not vehicle_number:
+    if not vehicle_number or not canonicalize_plate(vehicle_number):
         return jsonify({"error": "Missing vehicle_number"}), 400
 
     if not user_vehicle_model:
             return {"error_code": 400, "message": "Missing user_vehicle_model"}, 400
     
-    # 3. Check if the vehicle (by plate number) already exists
-    vehicle = Vehicle.query.filter_by(vehicle_number=vehicle_number).first()
+    # 3. Check if the vehicle (by canonical plate, so "skr9859e" matches "SKR9859E") already exists
+    vehicle = Vehicle.query.filter_by(canonical_plate=canonicalize_plate(vehicle_number)).first()
 
     
     if not vehicle:
@@ -219,8 +565,16 @@ def add_vehicle_to_user(user_id):
         user_vehicle_model = user_vehicle_model
     )
 
+    # The vehicle's other owners are bumped too: other workers' cached checkpoint results for it carry their versions
+    owner_ids = [owner_id for (owner_id,) in db.session.query(UserVehicle.user_id).filter(UserVehicle.vehicle_id == vehicle.vehicle_id)]
+
     db.session.add(user_vehicle)
+    bump_user_versions([user_id, *owner_ids])
     db.session.commit()
+
+    # The vehicle may now resolve to one of this user's passes
+    hot_plate_cache.invalidate_plate(vehicle.canonical_plate)
+    plate_filter.add(vehicle.canonical_plate)
     
     return jsonify({
         "message": "Vehicle added to user successfully",
@@ -233,35 +587,9 @@ def add_vehicle_to_user(user_id):
     }), 201
 
 
-# Function to recognize license plate using PlateRecognizer API
-def recognize_license_plate(image_path, token):
-
-    # Create headers dictionary for authentication
-    headers = {
-        "Authorization": f"Token {token}"
-    }
-
-    with open(image_path, "rb") as fp:
-
-        # Send request to Plate Recognizer
-        response = requests.post(API_URL, headers=headers, files={"upload": fp})
-        
-        # If request was successful
-        if response.status_code == 200 or response.status_code == 201:
-            
-            data = response.json()
-            if data['results']:
-                
-                # Extract license plate from the response
-                return data['results'][0]['plate']
-            
-            else:
-                return "No license plate detected."
-        
-        else:
-            return f"Error: {response.status_code}, {response.text}"
-
 @app.route('/api/users/<int:user_id>/vehicles', methods=['GET'])
+@read_only
+@conditional_get
 def get_user_vehicles(user_id):
 
     # 1. Make sure the user exists
@@ -269,34 +597,30 @@ def get_user_vehicles(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    # 2. Join UserVehicle and Vehicle to retrieve user-vehicle pairs
+    # 2. Join UserVehicle and Vehicle to retrieve user-vehicle pairs (only the columns we return)
     user_vehicles = (
-        db.session.query(UserVehicle, Vehicle)
+        db.session.query(
+            UserVehicle.user_vehicle_id,
+            UserVehicle.user_vehicle_model,
+            Vehicle.vehicle_id,
+            Vehicle.vehicle_number
+        )
         .join(Vehicle, UserVehicle.vehicle_id == Vehicle.vehicle_id)
         .filter(UserVehicle.user_id == user_id)
         .all()
     )
-    # user_vehicles will be a list of tuples: (UserVehicle, Vehicle)
     
-    # 3. Build a list of dicts with the info we need
-    vehicles_list = []
-    for uv, v in user_vehicles:
-        vehicles_list.append({
-            "user_vehicle_id": uv.user_vehicle_id,
-            "user_vehicle_model": uv.user_vehicle_model,
-            "vehicle_id": v.vehicle_id,
-            "vehicle_number": v.vehicle_number
-        })
-    
-    # 4. Return the JSON response
-    return jsonify({
+    # 3. Return the JSON response
+    return json_response({
         # "user_id": user_id,
-        "vehicles": vehicles_list
-    }), 200
+        "vehicles": VEHICLE_ROW.render_many(user_vehicles)
+    })
 
 
 # Get all the preset names and passenger count for a user id (used on homepage)
 @app.route('/api/users/<int:user_id>/presets_name', methods=['GET'])
+@read_only
+@conditional_get
 def get_user_presets(user_id):
     
     # Check if user exists
@@ -304,30 +628,19 @@ def get_user_presets(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    # Fetch presets for the given user_id
-    presets = Preset.query.filter_by(user_id=user_id).all()
-
-    # Convert to JSON format with passenger count
-    presets_list = []
-    for p in presets:
-        # Count number of passengers in the preset
-        passenger_count = db.session.query(PresetTraveller).filter_by(preset_id=p.preset_id).count()
-        
-        presets_list.append({
-            "preset_id": p.preset_id,
-            "preset_name": p.preset_name,
-            "passenger_count": passenger_count  # Add passenger count
-        })
+    # Fetch presets for the given user_id with their passenger counts in one GROUP BY query
+    presets = load_user_presets_with_counts(user_id)
 
-    # Return response
-    return jsonify({
+    # Return response with passenger count
+    return json_response({
         "user_id": user_id,
-        "presets": presets_list
-    }), 200
+        "presets": PRESET_COUNT_ROW.render_many(presets)
+    })
 
 
 # Get all the users for a given preset id - not needed now
 @app.route('/api/presets/<int:preset_id>/users', methods=['GET'])
+@read_only
 def get_preset_users(preset_id):
 
     # Check if the preset exists
@@ -348,21 +661,18 @@ def get_preset_users(preset_id):
         .all()
     )
 
-    # Convert to JSON-friendly format
-    users_list = [
-        {"user_id": u.user_id, "first_name": u.first_name, "middle_name": u.middle_name, "last_name": u.last_name}
-        for u in users
-    ]
-
     # Return response
-    return jsonify({
+    return json_response({
         "preset_id": preset.preset_id,
         "preset_name": preset.preset_name,
-        "users": users_list
-    }), 200
+        "users": PRESET_USER_ROW.render_many(users)
+    })
 
 # Get preset id, name and users list 
 @app.route('/api/users/<int:user_id>/created-presets-with-users', methods=['GET'])
+@read_only
+@conditional_get
+@cached_response
 def get_user_created_presets_with_users(user_id):
     
     # Check if the user exists
@@ -370,55 +680,13 @@ def get_user_created_presets_with_users(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    # Fetch presets created by the user
-    presets = (
-        db.session.query(Preset.preset_id, Preset.preset_name)
-        .filter(Preset.user_id == user_id)
-        .all()
-    )
-
-    # If user hasn't created any presets, return empty list
-    if not presets:
-        return jsonify({"user_id": user_id, "presets_created": []}), 200
-
-    presets_data = []
-    for preset_id, preset_name in presets:
-        # Fetch all users associated with the preset
-        preset_users = (
-            db.session.query(
-                UserSensitiveInformation.user_id,
-                UserSensitiveInformation.first_name,
-                UserSensitiveInformation.middle_name,
-                UserSensitiveInformation.last_name,
-                UserSensitiveInformation.passport_number
-            )
-            .join(PresetTraveller, UserSensitiveInformation.user_id == PresetTraveller.user_id)
-            .filter(PresetTraveller.preset_id == preset_id)
-            .all()
-        )
+    # Fetch presets created by the user together with their members in a single join
+    presets_data = load_user_presets_with_members(user_id)
 
-        # Convert users into JSON format
-        users_list = [
-            {
-                "user_id": u.user_id,
-                "first_name": u.first_name,
-                "middle_name": u.middle_name,
-                "last_name": u.last_name,
-                "passport_number": u.passport_number
-            }
-            for u in preset_users
-        ]
-
-        presets_data.append({
-            "preset_id": preset_id,
-            "preset_name": preset_name,
-            "users": users_list
-        })
-
-    return jsonify({
+    return json_response({
         "user_id": user_id,
         "presets_created": presets_data
-    }), 200
+    })
 
 # Create presets
 @app.route('/api/presets/create', methods=['POST'])
@@ -442,44 +710,46 @@ def create_preset():
     if not creator:
         return jsonify({"error": f"User ID {user_id} not found"}), 404
 
-    # Create the new preset
-    new_preset = Preset(preset_name=preset_name, user_id=user_id)
-    db.session.add(new_preset)
-    db.session.commit()  # Commit to generate preset_id
-
-    preset_id = new_preset.preset_id  # Retrieve the new preset_id
-
-    # List to store successfully added travellers
-    travellers_added = []
-
-    # Process each traveller
+    # Resolve every traveller's passport number with one query before writing anything
+    users_by_passport = load_users_by_passport(t.get("passport_number") for t in travellers)
     for traveller in travellers:
         passport_number = traveller.get("passport_number")
-        given_first_name = traveller.get("first_name")
-        given_middle_name = traveller.get("middle_name")
-        given_last_name = traveller.get("last_name")
-
-        # Find user_id from passport_number
-        user_sensitive = UserSensitiveInformation.query.filter_by(passport_number=passport_number).first()
-        if not user_sensitive:
+        if passport_number not in users_by_passport:
             return jsonify({"error": f"Traveller with passport number {passport_number} not found"}), 404
 
-        traveller_user_id = user_sensitive.user_id
+    # Create the new preset and its travellers in one transaction
+    try:
+        new_preset = Preset(preset_name=preset_name, user_id=user_id)
+        db.session.add(new_preset)
+        db.session.flush()  # Flush to generate preset_id
 
-        # Add traveller to PresetTraveller table
-        preset_traveller = PresetTraveller(preset_id=preset_id, user_id=traveller_user_id)
-        db.session.add(preset_traveller)
+        preset_id = new_preset.preset_id  # Retrieve the new preset_id
 
-        # Append to response list, keeping the given names from request
-        travellers_added.append({
-            "user_id": traveller_user_id,
-            "first_name": given_first_name,
-            "middle_name": given_middle_name,
-            "last_name": given_last_name,
-            "passport_number": passport_number
-        })
+        # Bulk insert into PresetTraveller table
+        if travellers:
+            db.session.execute(insert(PresetTraveller), [
+                {"preset_id": preset_id, "user_id": users_by_passport[t.get("passport_number")].user_id}
+                for t in travellers
+            ])
 
-    db.session.commit()  # Commit all travellers
+        bump_user_versions([user_id])
+        db.session.commit()  # Commit preset and all travellers together
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Response list, keeping the given names from request
+    travellers_added = [
+        {
+            "user_id": users_by_passport[t.get("passport_number")].user_id,
+            "first_name": t.get("first_name"),
+            "middle_name": t.get("middle_name"),
+            "last_name": t.get("last_name"),
+            "passport_number": t.get("passport_number")
+        }
+        for t in travellers
+    ]
 
     return jsonify({
         "message": "Preset created successfully",
@@ -490,7 +760,12 @@ def create_preset():
     }), 201
 
 
+# Get a user's passes with their travellers, paginated with ?limit= (max 500) and ?after=<last pass_id>
+# Always runs three queries (user, one page of passes, all their travellers) however many passes the user has
 @app.route('/api/users/<int:user_id>/passes', methods=['GET'])
+@read_only
+@conditional_get
+@cached_response
 def get_user_passes(user_id):
 
     # Check if the user exists
@@ -499,64 +774,22 @@ def get_user_passes(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    # Fetch all passes created by the user
-    passes = (
-        db.session.query(
-            Pass.pass_id,
-            # Pass.vehicle_id,
-            Pass.pass_date,
-            Pass.expiry_datetime,
-            Pass.pass_utilized
-        )
-        .filter(Pass.creator_user_id == user_id)
-        .all()
-    )
-
-    passes_list = []
-    for p in passes:
-        # Fetch all travellers for the given pass
-        travellers = (
-            db.session.query(
-                UserSensitiveInformation.user_id,
-                UserSensitiveInformation.first_name,
-                UserSensitiveInformation.middle_name,
-                UserSensitiveInformation.last_name,
-                UserSensitiveInformation.passport_number
-            )
-            .join(PassTraveller, UserSensitiveInformation.user_id == PassTraveller.user_id)
-            #.join(UserSensitiveInformation, UserSensitiveInformation.user_id == UserSensitiveInformation.user_id)
-            .filter(PassTraveller.pass_id == p.pass_id)
-            .all()
-        )
+    try:
+        limit, after = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
 
-        # Convert traveller data to JSON format
-        travellers_list = [
-            {
-                "user_id": t.user_id,
-                "first_name": t.first_name,
-                "middle_name": t.middle_name,
-                "last_name": t.last_name,
-                "passport_number": t.passport_number
-            }
-            for t in travellers
-        ]
+    # Fetch one page of passes created by the user
+    passes, next_cursor = load_user_passes(user_id, limit, after)
 
-        passes_list.append({
-            "pass_id": p.pass_id,
-            # "vehicle_id": p.vehicle_id,
-            # "creation_datetime": p.creation_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-            "expiry_datetime": p.expiry_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-            "pass_date": p.pass_date.strftime("%Y-%m-%d %H:%M:%S"),
-            # "origin_id": p.origin_id,
-            # "destination_id": p.destination_id,
-            "pass_utilized": p.pass_utilized,
-            "travellers": travellers_list
-        })
+    # Fetch the travellers of every pass on the page at once
+    travellers_by_pass = load_pass_travellers([p.pass_id for p in passes])
 
-    return jsonify({
+    return json_response({
         "user_id": user_id,
-        "passes": passes_list
-    }), 200
+        "passes": PASS_ROW.render_many(passes, travellers=travellers_by_pass),
+        "next_cursor": next_cursor
+    })
 
 @app.route('/api/passes/create', methods=['POST'])
 def create_pass():
@@ -584,54 +817,63 @@ def create_pass():
     except ValueError:
         return jsonify({"error": "Invalid date format"}), 400
 
-    # Check if the vehicle exists
-    vehicle = Vehicle.query.filter_by(vehicle_number=vehicle_number).first()
+    # Check if the vehicle exists (by canonical plate)
+    vehicle = Vehicle.query.filter_by(canonical_plate=canonicalize_plate(vehicle_number)).first()
     if not vehicle:
         return jsonify({"error": f"Vehicle with number {vehicle_number} not found"}), 404
 
-    # Create new pass
-    new_pass = Pass(
-        # vehicle_id=vehicle_id,
-        creator_user_id=creator_user_id,
-        # creation_datetime=creation_datetime,
-        expiry_datetime=expiry_datetime,
-        pass_date=pass_date,
-        pass_utilized=pass_utilized,
-        # origin_id = 1,  # Default (1): Singapore
-        # destination_id = 2  # Default (2): Johor Bahru
-    )
+    # Resolve every traveller's passport number with one query before writing anything
+    users_by_passport = load_users_by_passport(traveller_passport_numbers)
+    for passport_number in traveller_passport_numbers:
+        if passport_number not in users_by_passport:
+            return jsonify({"error": f"Traveller with passport number {passport_number} not found"}), 404
 
-    db.session.add(new_pass)
-    db.session.commit()  # Commit to generate pass_id
+    # Create the new pass and its travellers in one transaction
+    try:
+        new_pass = Pass(
+            # vehicle_id=vehicle_id,
+            creator_user_id=creator_user_id,
+            # creation_datetime=creation_datetime,
+            expiry_datetime=expiry_datetime,
+            pass_date=pass_date,
+            pass_utilized=pass_utilized,
+            # origin_id = 1,  # Default (1): Singapore
+            # destination_id = 2  # Default (2): Johor Bahru
+        )
 
-    pass_id = new_pass.pass_id
+        db.session.add(new_pass)
+        db.session.flush()  # Flush to generate pass_id
 
-    # List to store successfully added travellers
-    travellers_added = []
+        pass_id = new_pass.pass_id
 
-    # Process each traveller
-    for passport_number in traveller_passport_numbers:
-        # Find user_id from passport_number
-        user_sensitive = UserSensitiveInformation.query.filter_by(passport_number=passport_number).first()
-        if not user_sensitive:
-            return jsonify({"error": f"Traveller with passport number {passport_number} not found"}), 404
+        # Bulk insert into PassTravellers table
+        if traveller_passport_numbers:
+            db.session.execute(insert(PassTraveller), [
+                {"pass_id": pass_id, "user_id": users_by_passport[passport_number].user_id}
+                for passport_number in traveller_passport_numbers
+            ])
 
-        traveller_user_id = user_sensitive.user_id
+        bump_user_versions([creator_user_id])
+        db.session.commit()  # Commit pass and all travellers together
 
-        # Add traveller to PassTravellers table
-        pass_traveller = PassTraveller(pass_id=pass_id, user_id=traveller_user_id)
-        db.session.add(pass_traveller)
+    except Exception:
+        db.session.rollback()
+        raise
 
-        # Append to response list
-        travellers_added.append({
-            "user_id": traveller_user_id,
-            "first_name": user_sensitive.first_name,
-            "middle_name": user_sensitive.middle_name,
-            "last_name": user_sensitive.last_name,
+    # Response list of travellers added
+    travellers_added = [
+        {
+            "user_id": users_by_passport[passport_number].user_id,
+            "first_name": users_by_passport[passport_number].first_name,
+            "middle_name": users_by_passport[passport_number].middle_name,
+            "last_name": users_by_passport[passport_number].last_name,
             "passport_number": passport_number
-        })
+        }
+        for passport_number in traveller_passport_numbers
+    ]
 
-    db.session.commit()  # Commit all travellers
+    # The creator's vehicles may now resolve to this pass
+    hot_plate_cache.invalidate_user(creator_user_id)
 
     return jsonify({
         "message": "Pass created successfully",
@@ -645,14 +887,167 @@ def create_pass():
         "travellers_added": travellers_added
     }), 201
 
-@app.route('/uploads/<filename>')
+# Mark a pass utilized at a checkpoint lane, exactly once even when several lanes accept it at the same moment
+# JSON: {"lane": "lane-1", "request_id": "<unique per lane attempt>"} (or the request id in an Idempotency-Key header);
+# retrying with the same request id returns the original result instead of failing as already used
+@app.route('/api/passes/<int:pass_id>/consume', methods=['POST'])
+def consume_pass_at_lane(pass_id):
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+
+    request_id = request.headers.get('Idempotency-Key') or data.get('request_id')
+    lane = data.get('lane')
+
+    if not isinstance(request_id, str) or not request_id or len(request_id) > 64:
+        return jsonify({"error": "A request_id string of at most 64 characters is required"}), 400
+
+    if lane is not None and (not isinstance(lane, str) or len(lane) > 50):
+        return jsonify({"error": "lane must be a string of at most 50 characters"}), 400
+
+    try:
+        outcome, consumption, creator_user_id = consume_pass(pass_id, request_id, lane)
+
+        if outcome == "consumed":
+            bump_user_versions([creator_user_id])  # the creator's passes and history change
+
+        db.session.commit()
+
+    except IntegrityError:
+        db.session.rollback()
+        conflict = classify_consume_conflict(pass_id, request_id)
+        if conflict is None:
+            raise
+        outcome, consumption = conflict
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if outcome == "consumed":
+        hot_plate_cache.invalidate_pass(pass_id)
+        return jsonify({"status": "consumed", "replayed": False, **consumption}), 200
+
+    if outcome == "replayed":
+        return jsonify({"status": "consumed", "replayed": True, **consumption}), 200
+
+    if outcome == "not_found":
+        return jsonify({"error": "Pass not found"}), 404
+
+    if outcome == "already_used":
+        return jsonify({"error": "Pass has already been used", "consumption": consumption}), 409
+
+    if outcome == "not_yet_valid":
+        return jsonify({"error": "Pass is not valid yet"}), 409
+
+    if outcome == "expired":
+        return jsonify({"error": "Pass has expired"}), 409
+
+    return jsonify({"error": "request_id was already used for another pass"}), 409
+
+
+# Registered vehicles ranked against a plate reading, tolerating OCR misreads
+# JSON: {"plate": "SKR9B59E"} and/or {"candidates": [{"plate": "SKR9B59E", "score": 0.9}, ...]} (recognizer alternatives)
+@app.route('/api/checkpoint/match', methods=['POST'])
+def match_plate():
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not isinstance(data.get("candidates", []), list):
+        return jsonify({"error": "Expected a JSON object with a plate and/or a candidates list"}), 400
+
+    if not isinstance(data.get("plate"), (str, type(None))):
+        return jsonify({"error": "plate must be a string"}), 400
+
+    if not all(isinstance(c, dict) and isinstance(c.get("plate"), str) for c in data.get("candidates", [])):
+        return jsonify({"error": "Each candidate must be an object with a string plate"}), 400
+
+    try:
+        candidates = [(c["plate"], float(c.get("score", 0))) for c in data.get("candidates", [])]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Candidate scores must be numbers"}), 400
+
+    if data.get("plate"):
+        candidates.insert(0, (data["plate"], 1.0))
+
+    if not candidates:
+        return jsonify({"error": "A plate or candidates are required"}), 400
+
+    ranked, complete = plate_matcher.match(candidates)
+    return jsonify({"matches": ranked, "complete": complete}), 200
+
+# Fuzzy plate matching counters
+@app.route('/api/checkpoint/match-stats', methods=['GET'])
+def get_plate_match_stats():
+    return jsonify(plate_matcher.stats()), 200
+
+# Hit, miss and eviction counters of the checkpoint hot-plate cache
+@app.route('/api/checkpoint/cache-stats', methods=['GET'])
+def get_checkpoint_cache_stats():
+    return jsonify(hot_plate_cache.stats()), 200
+
+# Newest lane manifest for kiosks; its version is in X-Manifest-Version, deltas are fetched from /<version>/deltas/1, 2, ...
+@app.route('/api/checkpoint/manifest', methods=['GET'])
+def get_lane_manifest():
+    version = latest_version(app.config['LANE_MANIFEST_FOLDER'])
+    if version is None:
+        return jsonify({"error": "No manifest has been built yet"}), 404
+
+    response = send_from_directory(os.path.abspath(app.config['LANE_MANIFEST_FOLDER']), manifest_name(version), mimetype="application/octet-stream")
+    response.headers["X-Manifest-Version"] = str(version)
+    return response
+
+# One delta of a manifest; 404 until it has been written (kiosks poll for the next sequence)
+@app.route('/api/checkpoint/manifest/<int:version>/deltas/<int:sequence>', methods=['GET'])
+def get_lane_manifest_delta(version, sequence):
+    return send_from_directory(os.path.abspath(app.config['LANE_MANIFEST_FOLDER']), delta_name(version, sequence), mimetype="application/octet-stream")
+
+# Passes moved to the archive tables by the background sweep
+@app.route('/api/passes/archive-stats', methods=['GET'])
+def get_pass_archive_stats():
+    return jsonify(pass_archiver.stats()), 200
+
+# Size and rejections of the registered-plate Bloom filter
+@app.route('/api/checkpoint/plate-filter-stats', methods=['GET'])
+def get_plate_filter_stats():
+    return jsonify(plate_filter.stats()), 200
+
+# Hit rate of the per-user response cache
+@app.route('/api/responses/cache-stats', methods=['GET'])
+def get_response_cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+# Hit rate of the recognition result cache (repeated frames resolved without calling PlateRecognizer)
+@app.route('/api/recognition/cache-stats', methods=['GET'])
+def get_recognition_cache_stats():
+    return jsonify(recognition_cache.stats()), 200
+
+# Bytes saved by preprocessing and the resulting PlateRecognizer latency
+@app.route('/api/recognition/preprocess-stats', methods=['GET'])
+def get_recognition_preprocess_stats():
+    stats = image_preprocessor.stats()
+    stats.update(get_client(TOKEN).api_stats())
+    return jsonify(stats), 200
+
+@app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     # return redirect(url_for('static', filename='uploads/' + filename), code=301)
 
+    # The frame may still be queued for archiving
+    archive_prefix = app.config['UPLOAD_ARCHIVE_FOLDER'] + '/'
+    if filename.startswith(archive_prefix):
+        pending = upload_archiver.pending_bytes(filename[len(archive_prefix):])
+        if pending is not None:
+            return send_file(io.BytesIO(pending), mimetype=mimetypes.guess_type(filename)[0])
+
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 
+# Get a user's utilized passes, paginated like get_user_passes
 @app.route('/api/users/<int:user_id>/passes/history', methods=['GET'])
+@read_only
+@conditional_get
+@cached_response
 def get_utilized_passes(user_id):
 
     # Check if the user exists
@@ -660,38 +1055,19 @@ def get_utilized_passes(user_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    # Fetch all utilized passes created by the user
-    utilized_passes = (
-        db.session.query(
-            Pass.pass_id,
-            # Pass.vehicle_id,
-            Pass.expiry_datetime,
-            Pass.pass_date,
-            #Pass.origin_id,
-            # Pass.destination_id
-        )
-        .filter(Pass.creator_user_id == user_id, Pass.pass_utilized == True)
-        .all()
-    )
+    try:
+        limit, after = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
 
-    # Convert results into JSON format
-    passes_list = [
-        {
-            "pass_id": p.pass_id,
-            # "vehicle_id": p.vehicle_id,
-            # "creation_datetime": p.creation_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-            "expiry_datetime": p.expiry_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-            "pass_date": p.pass_date.strftime("%Y-%m-%d %H:%M:%S"),
-            #"origin_id": p.origin_id,
-            # "destination_id": p.destination_id
-        }
-        for p in utilized_passes
-    ]
+    # Fetch one page of utilized passes created by the user
+    utilized_passes, next_cursor = load_user_passes(user_id, limit, after, utilized=True)
 
-    return jsonify({
+    return json_response({
         "user_id": user_id,
-        "passes_utilized": passes_list
-    }), 200
+        "passes_utilized": UTILIZED_PASS_ROW.render_many(utilized_passes),
+        "next_cursor": next_cursor
+    })
 
 # Updating first name of the user in the profile page
 @app.route('/api/users/<int:user_id>/first-name', methods=['GET', 'POST'])
@@ -706,7 +1082,9 @@ def manage_user_first_name(user_id):
     if request.method == 'POST':
         data = request.get_json()
         user.first_name = data.get("first_name", user.first_name)
+        bump_user_and_dependents(user_id)
         db.session.commit()
+        hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
         return jsonify({"message": "First name updated successfully"}), 200
 
 
@@ -723,7 +1101,9 @@ def manage_user_middle_name(user_id):
     if request.method == 'POST':
         data = request.get_json()
         user.middle_name = data.get("middle_name", user.middle_name)
+        bump_user_and_dependents(user_id)
         db.session.commit()
+        hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
         return jsonify({"message": "Middle name updated successfully"}), 200
 
 
@@ -740,7 +1120,9 @@ def manage_user_last_name(user_id):
     if request.method == 'POST':
         data = request.get_json()
         user.last_name = data.get("last_name", user.last_name)
+        bump_user_and_dependents(user_id)
         db.session.commit()
+        hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
         return jsonify({"message": "Last name updated successfully"}), 200
 
 # Updating Date of birth of the user in the profile page
@@ -757,7 +1139,9 @@ def manage_user_dob(user_id):
         data = request.get_json()
         try:
             user.date_of_birth = datetime.strptime(data.get("date_of_birth"), "%Y-%m-%d").date()
+            bump_user_and_dependents(user_id)
             db.session.commit()
+            hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
             return jsonify({"message": "Date of Birth updated successfully"}), 200
         except ValueError:
             return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
@@ -776,7 +1160,9 @@ def manage_user_nationality(user_id):
     if request.method == 'POST':
         data = request.get_json()
         user.passport_issuing_country = data.get("nationality", user.passport_issuing_country)
+        bump_user_and_dependents(user_id)
         db.session.commit()
+        hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
         return jsonify({"message": "Nationality updated successfully"}), 200
 
 
@@ -794,7 +1180,9 @@ def manage_passport_expiry(user_id):
         data = request.get_json()
         try:
             user.passport_expiry = datetime.strptime(data.get("passport_expiry"), "%Y-%m-%d")
+            bump_user_and_dependents(user_id)
             db.session.commit()
+            hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
             return jsonify({"message": "Passport expiry date updated successfully"}), 200
         except ValueError:
             return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
@@ -813,32 +1201,88 @@ def manage_passport_number(user_id):
     if request.method == 'POST':
         data = request.get_json()
         user.passport_number = data.get("passport_number", user.passport_number)
+        bump_user_and_dependents(user_id)
         db.session.commit()
+        hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
         return jsonify({"message": "Passport number updated successfully"}), 200
 
 # Retrieving all information of user in the profile page
 @app.route('/api/users/<int:user_id>/profile', methods=['GET'])
+@read_only
 def get_user_profile(user_id):
     user = UserSensitiveInformation.query.get(user_id)
     
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    # Only middle name should be the truly optional field. Adding if-else statements for the rest to safely return None in JSON.
-    profile_data = {
-        "first_name": user.first_name if user.first_name else None,
-        "middle_name": user.middle_name if user.middle_name else None,
-        "last_name": user.last_name if user.last_name else None,
-        "date_of_birth": user.date_of_birth.strftime("%Y-%m-%d") if user.date_of_birth else None,
-        "nationality": user.passport_issuing_country if user.passport_issuing_country else None,
-        "passport_expiry": user.passport_expiry.strftime("%Y-%m-%d") if user.passport_expiry else None,
-        "passport_number": user.passport_number if user.passport_number else None
-    }
+    profile_data = profile_dict(user)
+    etag = profile_etag(profile_data)
+
+    # The profile is a single row, so its content ETag is as cheap as a version lookup and also serves PATCH If-Match
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = json_response(profile_data)
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+# Update any subset of profile fields in one transaction and return the updated profile
+# With If-Match, the update only applies if the profile is unchanged since that ETag was issued
+@app.route('/api/users/<int:user_id>/profile', methods=['PATCH'])
+def patch_user_profile(user_id):
+    user = UserSensitiveInformation.query.get(user_id)
+
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({"error": "Expected a JSON object with at least one profile field"}), 400
+
+    changes, errors = parse_profile_patch(data)
+    if errors:
+        return jsonify({"error": "Invalid profile fields", "fields": errors}), 400
 
-    return jsonify(profile_data), 200
+    current = profile_dict(user)
+    if request.if_match and not request.if_match.contains(profile_etag(current)):
+        return jsonify({"error": "Profile was modified, reload it and retry", "profile": current}), 412
+
+    try:
+        statement = update(UserSensitiveInformation).where(UserSensitiveInformation.user_id == user_id)
+
+        # Compare-and-set on the values the ETag was checked against, so a concurrent update can't slip in between
+        if request.if_match:
+            for column, _ in PROFILE_FIELDS.values():
+                value = getattr(user, column.key)
+                statement = statement.where(column.is_(None) if value is None else column == value)
+
+        result = db.session.execute(statement.values(**changes).execution_options(synchronize_session=False))
+        if result.rowcount == 0:
+            db.session.rollback()
+            return jsonify({"error": "Profile was modified, reload it and retry"}), 412
+
+        bump_user_and_dependents(user_id)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Passport number is already registered"}), 409
+
+    hot_plate_cache.invalidate_user(user_id)  # cached checkpoint results carry traveller names
+
+    db.session.refresh(user)
+    profile_data = profile_dict(user)
+    response = jsonify(profile_data)
+    response.set_etag(profile_etag(profile_data))
+    return response, 200
 
 # Get all travellers (that are not associated with pass/preset) for a user
 @app.route('/api/users/<int:user_id>/travellers', methods=['GET'])
+@read_only
+@conditional_get
+@cached_response
 def get_user_travellers(user_id):
     # Check if the creator user exists
     creator = UserSensitiveInformation.query.get(user_id)
@@ -859,22 +1303,10 @@ def get_user_travellers(user_id):
         .all()
     )
 
-    # Convert traveller data to JSON format
-    traveller_list = [
-        {
-            "traveller_id": t.user_id,
-            "first_name": t.first_name,
-            "middle_name": t.middle_name,
-            "last_name": t.last_name,
-            "passport_number": t.passport_number
-        }
-        for t in travellers
-    ]
-
-    return jsonify({
+    return json_response({
         "creator_user_id": user_id,
-        "travellers": traveller_list
-    }), 200
+        "travellers": USER_TRAVELLER_ROW.render_many(travellers)
+    })
 
 # Add a traveller (that is not associated with pass/preset) for a user
 @app.route('/api/users/<int:user_id>/travellers', methods=['POST'])
@@ -907,6 +1339,7 @@ def add_traveller(user_id):
     # Add to UserTraveller table
     new_traveller = UserTraveller(creator_user_id=user_id, traveller_id=traveller_id)
     db.session.add(new_traveller)
+    bump_user_versions([user_id])
     db.session.commit()
 
     return jsonify({
@@ -925,13 +1358,13 @@ if __name__ == '__main__':
 
     with app.app_context():
 
-        # Drop all tables to start fresh
-        db.drop_all()
+        # Create the database on first start, otherwise apply pending migrations (data is kept across restarts)
+        if create_or_upgrade(db):
 
-        # Create database tables
-        db.create_all() 
+            # Insert mock data into a fresh database
+            insert_mock_data()
 
-        # Insert mock data
-        insert_mock_data()  
+        # Load the persisted plate filter (or build it) before the first car arrives
+        plate_filter.refresh()
 
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,252 @@
+# Async (ASGI) deployment mode for the checkpoint lane path
+#
+# The checkpoint ("/"), vehicular guidance and batch checkpoint POSTs are served natively: the upload is received
+# without blocking, recognition is awaited on the async PlateRecognizer client (hundreds of frames in flight per
+# process), and multipart parsing, hashing/archiving, database work and template rendering are offloaded to a
+# bounded thread pool, so the event loop only moves bytes and awaits. Every other request
+# is handed to the Flask app on the same pool, so this module serves the whole API.
+#
+# Run with: uvicorn asgi_app:application --host 0.0.0.0 --port 5000 [--workers N]
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.wrappers import Request
+
+from app import app, TOKEN, read_upload, checkpoint_page, vehicular_guidance_page, batch_items, batch_results
+from plate_filter import plate_filter
+from plate_recognizer import get_async_client
+from serialization import dumps
+
+# Threads running database work, template rendering and the non-lane Flask routes
+_executor = ThreadPoolExecutor(max_workers=app.config['ASYNC_WORKER_THREADS'], thread_name_prefix="checkpoint-asgi")
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+async def _read_body(receive, limit):
+    chunks = []
+    size = 0
+
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise _BodyTooLarge()
+        chunks.append(chunk)
+
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+# WSGI environ for an ASGI HTTP scope with its (fully received) body
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client")
+
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0] if client else "",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = "HTTP_" + key
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ and key.startswith("HTTP_") else value
+
+    return environ
+
+
+async def _send(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, payload):
+    await _send(send, status, [("Content-Type", "application/json")], dumps(payload))
+
+
+# Run a lane view on the thread pool inside a Flask request context
+# Lane views stay on the primary: a pass consumed or a vehicle linked a moment ago must resolve correctly at the gate
+# Returns (status, headers, body); the app's before_request and after_request handlers (compression, cookies) run as usual
+def _render(environ, view, *args):
+
+    with app.request_context(environ):
+        try:
+            # before_request hooks run as in full_dispatch_request (e.g. the pass archiver start); one may answer instead
+            response = app.preprocess_request()
+            response = app.make_response(view(*args) if response is None else response)
+        except Exception as e:
+            response = app.make_response(app.handle_exception(e))  # logged, answered with a 500
+
+        response = app.process_response(response)
+        return response.status_code, response.headers.to_wsgi_list(), response.get_data()
+
+
+# Any other route: the Flask app on the thread pool
+def _wsgi(environ):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+        return chunks.append
+
+    chunks = []
+    result = app(environ, start_response)
+    try:
+        chunks.extend(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+    return started["status"], started["headers"], b"".join(chunks)
+
+
+async def _offload(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+# Parse the multipart body and read (hash, queue for archiving) the uploaded frame; runs on the pool
+# Returns (image bytes, archived name, lane), or None when no file was uploaded
+def _read_lane_upload(request):
+    file = request.files.get("file")
+    if file is None or file.filename == "":
+        return None
+
+    image_bytes, filename = read_upload(file)
+    return image_bytes, filename, request.form.get("lane")
+
+
+# Frames of a batch read like _read_lane_upload, in item order
+def _read_batch_frames(items):
+    return [read_upload(item["frame"])[0] for item in items]
+
+
+# POST / and POST /vehicular-guidance-system: one frame, recognized without holding a thread
+async def _lane_page(environ, request, page):
+    upload = await _offload(_read_lane_upload, request)
+
+    # Same as the sync routes: reload the page when no file was uploaded
+    if upload is None:
+        return 302, [("Location", request.url)], b""
+
+    image_bytes, filename, lane = upload
+    client = get_async_client(TOKEN, app.config['ASYNC_MAX_IN_FLIGHT'])
+    license_plate = await client.recognize_plate(image_bytes, lane)
+
+    return await _offload(_render, environ, page, filename, license_plate)
+
+
+# POST /api/checkpoint/batch: every frame of the batch recognized concurrently
+async def _batch(environ, request):
+    try:
+        items = await _offload(batch_items, request)
+    except ValueError as e:
+        return 400, [("Content-Type", "application/json")], dumps({"error": str(e)})
+
+    if not items:
+        return 400, [("Content-Type", "application/json")], dumps({"error": "No frames or plates provided"})
+
+    if len(items) > app.config['CHECKPOINT_BATCH_MAX_ITEMS']:
+        error = {"error": f"At most {app.config['CHECKPOINT_BATCH_MAX_ITEMS']} items per batch"}
+        return 413, [("Content-Type", "application/json")], dumps(error)
+
+    frame_items = [item for item in items if "frame" in item]
+    if frame_items:
+        images = await _offload(_read_batch_frames, frame_items)
+        client = get_async_client(TOKEN, app.config['ASYNC_MAX_IN_FLIGHT'])
+        plates = await asyncio.gather(*(
+            client.recognize_plate(image, item["lane"]) for image, item in zip(images, frame_items)
+        ))
+        for item, plate in zip(frame_items, plates):
+            item["plate"] = plate
+
+    return await _offload(_render, environ, batch_results, items)
+
+
+_LANE_ROUTES = {
+    "/": lambda environ, request: _lane_page(environ, request, checkpoint_page),
+    "/vehicular-guidance-system": lambda environ, request: _lane_page(environ, request, vehicular_guidance_page),
+    "/api/checkpoint/batch": _batch,
+}
+
+
+# Failures (e.g. a database not created yet) are retried on the first checkpoint lookup
+def _refresh_plate_filter():
+    with app.app_context():
+        try:
+            plate_filter.refresh()
+        except Exception:
+            app.logger.exception("Could not load the plate filter at startup")
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+
+        if message["type"] == "lifespan.startup":
+            # Load the persisted plate filter (or build it) before the first lane request
+            await _offload(_refresh_plate_filter)
+            await send({"type": "lifespan.startup.complete"})
+
+        elif message["type"] == "lifespan.shutdown":
+            get_async_client(TOKEN, app.config['ASYNC_MAX_IN_FLIGHT']).close()
+            _executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+
+    if scope["type"] != "http":
+        return
+
+    try:
+        body = await _read_body(receive, app.config['ASYNC_MAX_BODY_BYTES'])
+    except _BodyTooLarge:
+        return await _send_json(send, 413, {"error": "Request body too large"})
+
+    if body is None:  # client went away
+        return
+
+    environ = _environ(scope, body)
+    lane_route = _LANE_ROUTES.get(scope["path"]) if scope["method"] == "POST" else None
+
+    if lane_route is None:
+        status, headers, payload = await _offload(_wsgi, environ)
+    else:
+        status, headers, payload = await lane_route(environ, Request(environ))
+
+    await _send(send, status, headers, payload)
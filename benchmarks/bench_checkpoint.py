@@ -0,0 +1,114 @@
+# Benchmark: per-plate latency of the checkpoint resolver on a large synthetic database
+#
+# Usage: python benchmarks/bench_checkpoint.py [--vehicles 1000000] [--passes 10000000] [--lookups 2000]
+# The database is generated once into --db-path and reused on later runs.
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db_instance import db
+from immigration_logic import resolve_checkpoint
+from plate_utils import canonicalize_plate
+import models  # noqa: F401 - registers the tables on db.metadata
+
+
+# Build the plate for a given vehicle number, e.g. 42 -> "SBA0000042X"
+def make_plate(n):
+    return f"SB{chr(65 + n % 26)}{n:07d}{chr(65 + (n // 26) % 26)}"
+
+
+# Fill the database with users, vehicles, passes and one traveller per pass using raw executemany
+def populate(db_path, n_vehicles, n_passes, batch=100_000):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    now = datetime.utcnow()
+    fmt = "%Y-%m-%d %H:%M:%S.%f"
+
+    # One user and one vehicle per index, linked through user_vehicle
+    for start in range(1, n_vehicles + 1, batch):
+        ids = range(start, min(start + batch, n_vehicles + 1))
+        conn.executemany(
+            "INSERT INTO user_sensitive_information VALUES (?, ?, NULL, ?, '1990-01-01', 'Singapore', ?, '2035-01-01')",
+            ((i, f"First{i}", f"Last{i}", f"P{i:09d}") for i in ids),
+        )
+        conn.executemany(
+            "INSERT INTO vehicle (vehicle_id, vehicle_number, canonical_plate) VALUES (?, ?, ?)",
+            ((i, make_plate(i), canonicalize_plate(make_plate(i))) for i in ids),
+        )
+        conn.executemany("INSERT INTO user_vehicle VALUES (?, ?, ?, 'Sedan')", ((i, i, i) for i in ids))
+
+    # Passes spread over the last year, most already expired; every creator also travels on the pass
+    for start in range(1, n_passes + 1, batch):
+        ids = range(start, min(start + batch, n_passes + 1))
+        rows = []
+        for pid in ids:
+            pass_date = now - timedelta(days=random.randint(-1, 365))
+            rows.append((pid, (pid % n_vehicles) + 1, pass_date.strftime(fmt), (pass_date + timedelta(hours=24)).strftime(fmt), 0))
+        conn.executemany("INSERT INTO pass (pass_id, creator_user_id, pass_date, expiry_datetime, pass_utilized) VALUES (?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO pass_traveller VALUES (?, ?, ?)", ((pid, pid, (pid % n_vehicles) + 1) for pid in ids))
+        conn.commit()
+
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, default=1_000_000)
+    parser.add_argument("--passes", type=int, default=10_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--db-path", default=os.path.join("benchmarks", "bench_checkpoint.db"))
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db_path)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    db.init_app(app)
+
+    with app.app_context():
+        if not os.path.exists(db_path):
+            db.create_all()
+            started = time.perf_counter()
+            populate(db_path, args.vehicles, args.passes)
+            print(f"Populated {args.vehicles:,} vehicles / {args.passes:,} passes in {time.perf_counter() - started:.1f}s")
+
+        # Mix of known plates (in lower case, as OCR may return) and unknown plates
+        plates = [make_plate(random.randint(1, args.vehicles)).lower() for _ in range(args.lookups)]
+        plates += [f"ZZ{i:07d}Q" for i in range(args.lookups // 10)]
+        random.shuffle(plates)
+
+        # Warm up the connection and page cache
+        for plate in plates[:50]:
+            resolve_checkpoint(plate)
+
+        timings = []
+        outcomes = {}
+        for plate in plates:
+            started = time.perf_counter()
+            result = resolve_checkpoint(plate)
+            timings.append((time.perf_counter() - started) * 1000)
+            key = result["status"] if result["status"] == "success" else result["message"]
+            outcomes[key] = outcomes.get(key, 0) + 1
+
+        timings.sort()
+        print(f"Lookups: {len(timings)}")
+        print(f"  mean {statistics.mean(timings):.3f} ms | p50 {timings[len(timings) // 2]:.3f} ms | "
+              f"p95 {timings[int(len(timings) * 0.95)]:.3f} ms | p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+        for key, count in sorted(outcomes.items()):
+            print(f"  {count:6d}  {key}")
+
+
+if __name__ == "__main__":
+    main()
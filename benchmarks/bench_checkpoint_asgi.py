@@ -0,0 +1,180 @@
+# Load test: checkpoint lane uploads (POST /) against the sync WSGI mode and the async ASGI mode (asgi_app.py)
+#
+# The PlateRecognizer stub, the server under test and the load generator run as separate processes.
+# Sync mode is the Flask app behind a fixed pool of --sync-workers threads (like N sync workers);
+# async mode is uvicorn with a single worker process. Every frame is unique, so the recognition cache never hits.
+# Usage: python benchmarks/bench_checkpoint_asgi.py [--requests 1000] [--clients 200] [--latency 0.2] [--sync-workers 8]
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+# Server process: the app in sync (pooled WSGI threads) or async (uvicorn) mode
+def serve(mode, port, workers):
+    if mode == "async":
+        import uvicorn
+        uvicorn.run("asgi_app:application", host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+        return
+
+    from werkzeug.serving import BaseWSGIServer
+    from app import app
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 4096
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=workers)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer("127.0.0.1", port, app).serve_forever()
+
+
+def load(url, n_requests, clients, frame_size):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [n_requests]
+    local = threading.local()
+
+    def client():
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+
+            frame = uuid.uuid4().bytes * (frame_size // 16)
+            started = time.perf_counter()
+            try:
+                response = session.post(url, files={"file": ("frame.jpg", frame, "image/jpeg")}, timeout=120)
+                ok = response.status_code == 200 and b"License Plate:" in response.content
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": n_requests / wall,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--sync-workers", type=int, default=8)
+    parser.add_argument("--frame-size", type=int, default=32 * 1024)
+    parser.add_argument("--serve", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.port, args.sync_workers)
+
+    workdir = tempfile.mkdtemp()
+    stub_port = free_port()
+    env = dict(
+        os.environ,
+        PLATE_RECOGNIZER_URL=f"http://127.0.0.1:{stub_port}/v1/plate-reader/",
+        DATABASE_URL="sqlite:///" + os.path.join(workdir, "bench_checkpoint_asgi.db"),
+        RECOGNITION_CACHE_PATH=os.path.join(workdir, "recognition_cache.db"),
+    )
+
+    # Seed the database once with the mock data (the stub always reads SKR9859E, a registered vehicle)
+    subprocess.run(
+        [sys.executable, "-c", "from app import app; from db_instance import db; from migrations import create_or_upgrade; "
+                               "from mock_data import insert_mock_data\nwith app.app_context():\n    create_or_upgrade(db); insert_mock_data()"],
+        cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL
+    )
+
+    stub = subprocess.Popen(
+        [sys.executable, "plate_recognizer_stub.py", "--port", str(stub_port), "--latency", str(args.latency)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL
+    )
+
+    print(f"{args.requests} uploads of {args.frame_size // 1024} KiB from {args.clients} clients, "
+          f"recognition latency {args.latency * 1000:.0f} ms")
+
+    try:
+        for mode in ("sync", "async"):
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port), "--sync-workers", str(args.sync_workers)],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_for(f"http://127.0.0.1:{port}/api/checkpoint/cache-stats")
+                result = load(f"http://127.0.0.1:{port}/", args.requests, args.clients, args.frame_size)
+            finally:
+                server.terminate()
+                server.wait()
+
+            label = f"sync WSGI, {args.sync_workers} workers" if mode == "sync" else "async ASGI, 1 process"
+            print(f"  {label:<26} {result['throughput']:8.1f} req/s  p50 {result['p50']:8.1f} ms  "
+                  f"p99 {result['p99']:8.1f} ms  errors {result['errors']}")
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
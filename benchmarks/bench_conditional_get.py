@@ -0,0 +1,92 @@
+# Benchmark: polling the per-user read endpoints with and without If-None-Match
+#
+# Each endpoint is polled --polls times with a full GET rendered from the database, a full GET served by the
+# response cache, and a GET sending back the ETag of the first response (a mobile client polling unchanged data).
+# Usage: python benchmarks/bench_conditional_get.py [--passes 500] [--travellers 4] [--polls 200]
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_conditional_get.db")
+
+from sqlalchemy import event
+from app import app
+from db_instance import db
+from response_cache import response_cache
+
+ENDPOINTS = ["profile", "passes", "presets_name", "travellers", "vehicles"]
+
+
+def populate(db_path, n_passes, n_travellers):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO user_sensitive_information VALUES (?, ?, NULL, ?, '1990-01-01', 'Singapore', ?, '2035-01-01')",
+        ((i, f"First{i}", f"Last{i}", f"P{i:09d}") for i in range(1, n_travellers + 2)),
+    )
+    conn.executemany("INSERT INTO user_traveller (creator_user_id, traveller_id) VALUES (1, ?)", ((i,) for i in range(2, n_travellers + 2)))
+    conn.executemany("INSERT INTO vehicle (vehicle_id, vehicle_number, canonical_plate) VALUES (?, ?, ?)", ((i, f"SKR{i}", f"SKR{i}") for i in range(1, 4)))
+    conn.executemany("INSERT INTO user_vehicle (user_id, vehicle_id, user_vehicle_model) VALUES (1, ?, 'Car')", ((i,) for i in range(1, 4)))
+    conn.executemany("INSERT INTO preset (preset_id, preset_name, user_id) VALUES (?, ?, 1)", ((i, f"Preset {i}") for i in range(1, 21)))
+    conn.executemany(
+        "INSERT INTO pass (pass_id, creator_user_id, expiry_datetime, pass_date, pass_utilized) VALUES (?, 1, '2030-01-02 00:00:00', '2030-01-01', 0)",
+        ((i,) for i in range(1, n_passes + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO pass_traveller (pass_id, user_id) VALUES (?, ?)",
+        ((p, t) for p in range(1, n_passes + 1) for t in range(2, n_travellers + 2)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--passes", type=int, default=500)
+    parser.add_argument("--travellers", type=int, default=4)
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        populate(db.engine.url.database, args.passes, args.travellers)
+
+        counter = [0]
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", lambda *a: counter.__setitem__(0, counter[0] + 1))
+
+    client = app.test_client()
+    print(f"1 user, {args.passes} passes x {args.travellers} travellers, {args.polls} polls per endpoint")
+    print(f"  {'endpoint':<14} {'uncached':>22} {'response cache':>30} {'If-None-Match':>30}")
+
+    for endpoint in ENDPOINTS:
+        url = f"/api/users/1/{endpoint}"
+        etag = client.get(url).headers["ETag"]
+
+        results = []
+        for headers, use_cache in (({}, False), ({}, True), ({"If-None-Match": etag}, True)):
+            counter[0] = 0
+            size = 0
+            elapsed = 0
+            for _ in range(args.polls):
+                if not use_cache:
+                    response_cache.clear()
+                started = time.perf_counter()
+                response = client.get(url, headers=headers)
+                elapsed += time.perf_counter() - started
+                size += len(response.get_data())
+            results.append((elapsed / args.polls * 1000, counter[0] / args.polls, size / args.polls, response.status_code))
+
+        line = f"  {endpoint:<14}"
+        for ms, queries, size, status in results:
+            line += f"  {status} {ms:6.2f} ms {queries:3.0f} q {size:7.0f} B  ({results[0][0] / ms:4.1f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
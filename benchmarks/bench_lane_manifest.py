@@ -0,0 +1,88 @@
+# Benchmark: build a lane manifest from a large database and time local kiosk lookups against it
+#
+# Builds the bench_checkpoint.py data set in a temporary database with every pass falling in the manifest window,
+# writes the manifest, checks a sample of plates against the live resolver and reports file size and lookup latency.
+# Usage: python benchmarks/bench_lane_manifest.py [--vehicles 100000] [--passes 300000] [--lookups 20000]
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db_instance import db
+from immigration_logic import resolve_checkpoint
+from lane_manifest import build_manifest, LaneManifest, RECORD
+from pass_cache import utc_now
+import models  # noqa: F401 - registers the tables on db.metadata
+
+from bench_checkpoint import make_plate, populate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, default=100_000)
+    parser.add_argument("--passes", type=int, default=300_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--check", type=int, default=500, help="plates compared with the live resolver")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "bench_lane_manifest.db")
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            populate(db_path, args.vehicles, args.passes)
+
+            # bench_checkpoint spreads passes over the past year; a window covering it puts all of them in the manifest
+            # (lookups still only return passes that have not expired)
+            started = time.perf_counter()
+            path = build_manifest(os.path.join(tmp_dir, "manifests"), window=timedelta(days=370), now=utc_now() - timedelta(days=367))
+            build_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            manifest = LaneManifest(path)
+            open_ms = (time.perf_counter() - started) * 1000
+
+            size = os.path.getsize(path)
+            print(f"Manifest: {manifest.record_count:,} records, {size / 1e6:.1f} MB "
+                  f"({size / max(manifest.record_count, 1):.0f} B/record, {RECORD.size} B fixed), built in {build_s:.1f}s, opened in {open_ms:.1f} ms")
+
+            plates = [make_plate(random.randint(1, args.vehicles)) for _ in range(args.lookups)]
+            plates += [f"ZZ{i:07d}Q" for i in range(args.lookups // 10)]
+            random.shuffle(plates)
+
+            mismatches = 0
+            for plate in plates[:args.check]:
+                live = resolve_checkpoint(plate)
+                local = manifest.lookup(plate)
+                if local != (live if live["status"] == "success" else None):
+                    mismatches += 1
+            print(f"Checked {min(args.check, len(plates))} plates against the resolver: {mismatches} mismatches")
+
+            timings = []
+            for plate in plates:
+                started = time.perf_counter()
+                manifest.lookup(plate)
+                timings.append((time.perf_counter() - started) * 1e6)
+            timings.sort()
+            print(f"Lookups: {len(timings):,}  p50 {timings[len(timings) // 2]:.1f} us | p99 {timings[int(len(timings) * 0.99)]:.1f} us | "
+                  f"max {timings[-1]:.1f} us")
+
+            manifest.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Benchmark: checkpoint lookups and the hot-plate warm-up before and after archiving expired passes
+#
+# Builds the bench_checkpoint.py data set (most passes already expired) in a temporary database, times the resolver
+# and HotPlateCache.warm, runs the archive sweep, times them again and reports the sweep throughput and table sizes.
+# Usage: python benchmarks/bench_pass_archive.py [--vehicles 100000] [--passes 1000000] [--lookups 2000]
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db_instance import db
+from immigration_logic import resolve_checkpoint
+from pass_archive import PassArchiver
+from pass_cache import HotPlateCache
+import models  # noqa: F401 - registers the tables on db.metadata
+
+from bench_checkpoint import make_plate, populate
+
+
+def measure(plates):
+    timings = []
+    for plate in plates:
+        started = time.perf_counter()
+        resolve_checkpoint(plate)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    started = time.perf_counter()
+    HotPlateCache().warm()
+    warm_ms = (time.perf_counter() - started) * 1000
+
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99)], warm_ms
+
+
+def table_sizes(db_path):
+    conn = sqlite3.connect(db_path)
+    sizes = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+             for table in ("pass", "pass_traveller", "pass_archive", "pass_traveller_archive")}
+    conn.close()
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, default=100_000)
+    parser.add_argument("--passes", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "bench_pass_archive.db")
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            populate(db_path, args.vehicles, args.passes)
+            print(f"Populated {args.vehicles:,} vehicles / {args.passes:,} passes in {time.perf_counter() - started:.1f}s")
+
+            plates = [make_plate(random.randint(1, args.vehicles)) for _ in range(args.lookups)]
+            measure(plates[:50])  # warm up the connection and page cache
+
+            before = measure(plates)
+            print(f"Before: {table_sizes(db_path)}")
+
+            started = time.perf_counter()
+            moved = PassArchiver(batch_size=5000).sweep()
+            elapsed = time.perf_counter() - started
+            db.session.execute(db.text("ANALYZE"))
+            print(f"Archived {moved:,} passes in {elapsed:.1f}s ({moved / elapsed:,.0f} passes/s)")
+            print(f"After:  {table_sizes(db_path)}")
+
+            measure(plates[:50])
+            after = measure(plates)
+
+        print(f"\n{'':8}{'lookup p50':>12}{'lookup p99':>12}{'warm':>12}")
+        for label, (p50, p99, warm_ms) in (("before", before), ("after", after)):
+            print(f"{label:8}{p50:10.3f}ms{p99:10.3f}ms{warm_ms:10.1f}ms")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
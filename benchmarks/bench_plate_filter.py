@@ -0,0 +1,71 @@
+# Benchmark: false-positive rate, memory and speed of the registered-plate Bloom filter
+#
+# Fills a filter sized for --plates registered plates, then probes it with plates that were never added.
+# Usage: python benchmarks/bench_plate_filter.py [--plates 10000000] [--probes 1000000] [--error-rate 0.001]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plate_filter import BloomFilter
+from plate_utils import canonicalize_plate
+
+from bench_checkpoint import make_plate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plates", type=int, default=10_000_000)
+    parser.add_argument("--probes", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    bloom = BloomFilter(args.plates, args.error_rate)
+
+    started = time.perf_counter()
+    for i in range(1, args.plates + 1):
+        bloom.add(canonicalize_plate(make_plate(i)))
+    build_s = time.perf_counter() - started
+
+    # Size of the same plates held in a Python set, extrapolated from a sample
+    sample = {canonicalize_plate(make_plate(i)) for i in range(1, 100_001)}
+    set_bytes = (sys.getsizeof(sample) + sum(sys.getsizeof(p) for p in sample)) * args.plates / len(sample)
+
+    # Unknown plates ("ZZ" prefix never produced by make_plate)
+    started = time.perf_counter()
+    false_positives = sum(1 for i in range(args.probes) if f"ZZ{i:08d}Q" in bloom)
+    miss_us = (time.perf_counter() - started) / args.probes * 1e6
+
+    started = time.perf_counter()
+    missed = sum(1 for i in range(1, args.probes + 1) if canonicalize_plate(make_plate(i)) not in bloom)
+    hit_us = (time.perf_counter() - started) / args.probes * 1e6
+
+    path = os.path.join(tempfile.mkdtemp(), "plate_filter.bin")
+    started = time.perf_counter()
+    with open(path, "wb") as fp:
+        fp.write(bloom.to_bytes())
+    save_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    with open(path, "rb") as fp:
+        BloomFilter.from_bytes(fp.read())
+    load_ms = (time.perf_counter() - started) * 1000
+    file_bytes = os.path.getsize(path)
+    os.remove(path)
+
+    print(f"{args.plates:,} plates, target error rate {args.error_rate}: {bloom.bits:,} bits, {bloom.hashes} hashes")
+    print(f"  memory        {len(bloom.data) / 2**20:.1f} MiB ({bloom.bits / args.plates:.1f} bits/plate), "
+          f"a set of the plates would take ~{set_bytes / 2**20:,.0f} MiB")
+    print(f"  false pos.    {false_positives:,} / {args.probes:,} unknown plates = {false_positives / args.probes:.5f} "
+          f"(expected {bloom.expected_error_rate():.5f})")
+    print(f"  false neg.    {missed} / {args.probes:,} registered plates")
+    print(f"  lookup        {miss_us:.2f} us unknown, {hit_us:.2f} us registered (including canonicalization)")
+    print(f"  build         {build_s:.1f}s ({args.plates / build_s:,.0f} plates/s)")
+    print(f"  persisted     {file_bytes / 2**20:.1f} MiB, saved in {save_ms:.0f} ms, loaded in {load_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
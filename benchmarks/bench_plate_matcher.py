@@ -0,0 +1,120 @@
+# Benchmark: accuracy and latency of OCR-tolerant plate matching over a large vehicle table
+#
+# Registers --vehicles plates, builds the fuzzy plate index with the migration backfill, then matches simulated
+# misreads of registered plates (confusion swaps like 8/B, a dropped or extra character, an arbitrary substitution)
+# and never-registered plates, reporting recall, auto-accept precision and match latency.
+# Usage: python benchmarks/bench_plate_matcher.py [--vehicles 1000000] [--reads 2000]
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db_instance import db
+from migrations import add_plate_fuzzy_index
+from plate_matcher import PlateMatcher
+from plate_utils import canonicalize_plate, CONFUSION_CLASSES
+import models  # noqa: F401 - registers the tables on db.metadata
+
+from bench_checkpoint import make_plate
+
+CONFUSABLE = {c: group for group in CONFUSION_CLASSES for c in group}
+ALPHABET = string.ascii_uppercase + string.digits
+
+
+# Misread a plate the way an OCR engine might
+def misread(plate, kind):
+    chars = list(plate)
+
+    if kind == "confusion":
+        positions = [i for i, c in enumerate(chars) if c in CONFUSABLE]
+        for i in random.sample(positions, min(len(positions), random.choice((1, 2)))):
+            chars[i] = random.choice([c for c in CONFUSABLE[chars[i]] if c != chars[i]])
+    elif kind == "dropped":
+        del chars[random.randrange(len(chars))]
+    elif kind == "extra":
+        chars.insert(random.randrange(len(chars) + 1), random.choice(ALPHABET))
+    elif kind == "substitution":
+        i = random.randrange(len(chars))
+        chars[i] = random.choice([c for c in ALPHABET if c != chars[i]])
+
+    return "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vehicles", type=int, default=1_000_000)
+    parser.add_argument("--reads", type=int, default=2000, help="simulated reads per kind of error")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "bench_plate_matcher.db")
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+
+            conn = sqlite3.connect(db_path)
+            conn.executemany(
+                "INSERT INTO vehicle (vehicle_id, vehicle_number, canonical_plate) VALUES (?, ?, ?)",
+                ((i, make_plate(i), canonicalize_plate(make_plate(i))) for i in range(1, args.vehicles + 1)),
+            )
+            conn.commit()
+            conn.close()
+
+            started = time.perf_counter()
+            with db.engine.begin() as connection:
+                add_plate_fuzzy_index(connection)
+            build_s = time.perf_counter() - started
+
+            keys = db.session.execute(db.text("SELECT COUNT(*) FROM plate_fuzzy_key")).scalar()
+            print(f"Indexed {args.vehicles:,} vehicles in {build_s:.1f}s: {keys:,} keys ({keys / args.vehicles:.1f}/vehicle), "
+                  f"database {os.path.getsize(db_path) / 2**20:.0f} MiB")
+
+            matcher = PlateMatcher(budget_ms=1000)  # generous budget here, latency is reported below
+            print(f"\n{'error':<14}{'top-1':>8}{'top-5':>8}{'accepted':>10}{'acc. wrong':>12}{'p50 ms':>9}{'p99 ms':>9}")
+
+            for kind in ("confusion", "dropped", "extra", "substitution", "unregistered"):
+                top1 = top5 = accepted = wrong = 0
+                timings = []
+
+                for _ in range(args.reads):
+                    if kind == "unregistered":
+                        truth, read = None, f"ZZ{random.randrange(10**7):07d}Q"
+                    else:
+                        truth = canonicalize_plate(make_plate(random.randint(1, args.vehicles)))
+                        read = misread(truth, kind)
+
+                    started = time.perf_counter()
+                    ranked, _ = matcher.match([(read, 0.9)])
+                    best = matcher.clear_match(ranked)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                    plates = [m["canonical_plate"] for m in ranked]
+                    top1 += bool(plates) and plates[0] == truth
+                    top5 += truth in plates
+                    if best is not None:
+                        accepted += 1
+                        wrong += best["canonical_plate"] != truth
+
+                timings.sort()
+                n = args.reads
+                print(f"{kind:<14}{top1 / n:8.1%}{top5 / n:8.1%}{accepted / n:10.1%}{wrong / n:12.1%}"
+                      f"{timings[n // 2]:9.2f}{timings[int(n * 0.99)]:9.2f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
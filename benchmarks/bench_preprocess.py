@@ -0,0 +1,66 @@
+# Benchmark: payload size and recognition latency with and without preprocessing
+#
+# Sends every sample frame in uploads/ to the stub server over a simulated uplink.
+# Usage: python benchmarks/bench_preprocess.py [--bandwidth 2000000] [--max-side 1280]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_preprocess import ImagePreprocessor
+from plate_recognizer import PlateRecognizerClient
+from plate_recognizer_stub import start_stub_server
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bandwidth", type=float, default=2_000_000, help="simulated uplink in bytes/s")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-side", type=int, default=1280)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency, bandwidth=args.bandwidth)
+    frames = []
+    for name in sorted(os.listdir(UPLOADS)):
+        path = os.path.join(UPLOADS, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as fp:
+                frames.append((name, fp.read()))
+
+    plain = PlateRecognizerClient("bench", api_url=url)
+    preprocessor = ImagePreprocessor(max_side=args.max_side)
+    processed = PlateRecognizerClient("bench", api_url=url, preprocessor=preprocessor)
+    preprocessor.process(frames[0][1])  # start the process pool outside the measurement
+
+    print(f"{'frame':<34} {'original':>10} {'sent':>10} {'plain ms':>9} {'prep ms':>9}")
+    total_plain = total_prep = 0.0
+    for name, data in frames:
+        started = time.perf_counter()
+        plain.recognize(data)
+        plain_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        processed.recognize(data)
+        prep_ms = (time.perf_counter() - started) * 1000
+
+        total_plain += plain_ms
+        total_prep += prep_ms
+        sent = len(preprocessor.process(data))
+        print(f"{name:<34} {len(data) / 1024:9.0f}K {sent / 1024:9.0f}K {plain_ms:9.1f} {prep_ms:9.1f}")
+
+    stats = preprocessor.stats()
+    print(f"bytes saved: {stats['bytes_saved'] / 2 / 1024:.0f} KiB per pass ({(1 - stats['size_ratio']) * 100:.1f}%), "
+          f"avg preprocess {stats['avg_preprocess_ms']} ms")
+    print(f"mean latency: {total_plain / len(frames):.1f} ms -> {total_prep / len(frames):.1f} ms")
+
+    preprocessor.shutdown()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Benchmark: preset endpoints before (one query per preset) and after (shared bulk loaders)
+#
+# Usage: python benchmarks/bench_presets.py [--users 20] [--presets 300] [--travellers 4]
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+from db_instance import db
+from models import UserSensitiveInformation, Preset, PresetTraveller
+from loaders import load_user_presets_with_counts, load_user_presets_with_members
+
+
+# The original per-preset implementations, kept here for comparison
+def legacy_presets_with_counts(user_id):
+    presets = Preset.query.filter_by(user_id=user_id).all()
+    return [
+        (p.preset_id, p.preset_name, db.session.query(PresetTraveller).filter_by(preset_id=p.preset_id).count())
+        for p in presets
+    ]
+
+
+def legacy_presets_with_members(user_id):
+    presets = db.session.query(Preset.preset_id, Preset.preset_name).filter(Preset.user_id == user_id).all()
+    result = []
+    for preset_id, preset_name in presets:
+        users = (
+            db.session.query(UserSensitiveInformation.user_id, UserSensitiveInformation.first_name)
+            .join(PresetTraveller, UserSensitiveInformation.user_id == PresetTraveller.user_id)
+            .filter(PresetTraveller.preset_id == preset_id)
+            .all()
+        )
+        result.append((preset_id, preset_name, users))
+    return result
+
+
+def populate(db_path, n_users, n_presets, n_travellers):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO user_sensitive_information VALUES (?, ?, NULL, ?, '1990-01-01', 'Singapore', ?, '2035-01-01')",
+        ((i, f"First{i}", f"Last{i}", f"P{i:09d}") for i in range(1, n_users + 1)),
+    )
+    preset_id = 0
+    for user_id in range(1, n_users + 1):
+        for p in range(n_presets):
+            preset_id += 1
+            conn.execute("INSERT INTO preset VALUES (?, ?, ?)", (preset_id, f"Preset {p}", user_id))
+            conn.executemany(
+                "INSERT INTO preset_traveller (preset_id, user_id) VALUES (?, ?)",
+                ((preset_id, (user_id + t) % n_users + 1) for t in range(n_travellers)),
+            )
+    conn.commit()
+    conn.close()
+
+
+def measure(name, fn, users, counter):
+    counter[0] = 0
+    started = time.perf_counter()
+    for user_id in users:
+        fn(user_id)
+    elapsed = (time.perf_counter() - started) / len(users) * 1000
+    print(f"  {name:<36} {elapsed:8.2f} ms/request  {counter[0] / len(users):7.1f} queries/request")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--presets", type=int, default=300)
+    parser.add_argument("--travellers", type=int, default=4)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_presets.db")
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        populate(db_path, args.users, args.presets, args.travellers)
+
+        counter = [0]
+        event.listen(db.engine, "before_cursor_execute", lambda *a: counter.__setitem__(0, counter[0] + 1))
+        users = list(range(1, args.users + 1))
+
+        print(f"{args.users} users x {args.presets} presets x {args.travellers} travellers")
+        print("presets_name")
+        measure("before: count() per preset", legacy_presets_with_counts, users, counter)
+        measure("after: GROUP BY", load_user_presets_with_counts, users, counter)
+        print("created-presets-with-users")
+        measure("before: join per preset", legacy_presets_with_members, users, counter)
+        measure("after: single join", load_user_presets_with_members, users, counter)
+
+
+if __name__ == "__main__":
+    main()
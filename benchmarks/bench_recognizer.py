@@ -0,0 +1,64 @@
+# Benchmark: PlateRecognizer client throughput against the local stub server
+#
+# Compares the old per-call requests.post, the pooled sync client, and the asyncio client.
+# Usage: python benchmarks/bench_recognizer.py [--calls 200] [--latency 0.05] [--in-flight 64]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from plate_recognizer import PlateRecognizerClient, AsyncPlateRecognizerClient
+from plate_recognizer_stub import start_stub_server
+
+IMAGE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "Bright_car.jpg")
+
+
+def report(name, calls, elapsed):
+    print(f"  {name:<28} {elapsed:7.2f}s  {calls / elapsed:8.1f} req/s  {elapsed / calls * 1000:7.2f} ms/req")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--in-flight", type=int, default=64)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency)
+    with open(IMAGE_PATH, "rb") as fp:
+        image = fp.read()
+
+    print(f"{args.calls} recognitions, stub latency {args.latency * 1000:.0f} ms, image {len(image) / 1024:.0f} KiB")
+
+    # Baseline: a new connection per call, as the original recognize_license_plate did
+    started = time.perf_counter()
+    for _ in range(args.calls):
+        requests.post(url, headers={"Authorization": "Token bench"}, files={"upload": image})
+    report("requests.post (no session)", args.calls, time.perf_counter() - started)
+
+    # Pooled sync client, one call at a time (as a single Flask worker would)
+    client = PlateRecognizerClient("bench", api_url=url)
+    started = time.perf_counter()
+    for _ in range(args.calls):
+        client.recognize_plate(image)
+    report("PlateRecognizerClient", args.calls, time.perf_counter() - started)
+    client.close()
+
+    # asyncio client with many recognitions in flight
+    async_client = AsyncPlateRecognizerClient("bench", api_url=url, max_in_flight=args.in_flight)
+    started = time.perf_counter()
+    results = asyncio.run(async_client.recognize_many([image] * args.calls))
+    report(f"AsyncPlateRecognizerClient x{args.in_flight}", args.calls, time.perf_counter() - started)
+    async_client.close()
+
+    assert all(plate == results[0] for plate in results), "unexpected recognition result"
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Microbenchmark: response serialization per read endpoint, before (dicts + strftime + jsonify) and after
+# (precompiled row templates + orjson), plus the cost and size of gzip/brotli for each body
+#
+# Rows come from real queries against a temporary database; only serialization is timed.
+# Usage: python benchmarks/bench_serialization.py [--passes 2000] [--travellers 4] [--repeat 20]
+
+import argparse
+import gzip
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_serialization.db")
+
+from flask import jsonify
+from app import app
+from db_instance import db
+from models import UserSensitiveInformation, UserTraveller, UserVehicle, Vehicle, PassTraveller
+from loaders import load_user_passes, load_user_presets_with_counts
+from serialization import (json_response, brotli, PASS_ROW, UTILIZED_PASS_ROW, VEHICLE_ROW, PRESET_COUNT_ROW,
+                           USER_TRAVELLER_ROW, TRAVELLER_ROW)
+
+
+def populate(db_path, n_passes, n_travellers):
+    conn = sqlite3.connect(db_path)
+    n_users = max(n_travellers + 1, 200)
+    conn.executemany(
+        "INSERT INTO user_sensitive_information VALUES (?, ?, NULL, ?, '1990-01-01', 'Singapore', ?, '2035-01-01')",
+        ((i, f"First{i}", f"Last{i}", f"P{i:09d}") for i in range(1, n_users + 1)),
+    )
+    conn.executemany("INSERT INTO user_traveller (creator_user_id, traveller_id) VALUES (1, ?)", ((i,) for i in range(2, n_users + 1)))
+    conn.executemany("INSERT INTO vehicle (vehicle_id, vehicle_number, canonical_plate) VALUES (?, ?, ?)", ((i, f"SKR{i}", f"SKR{i}") for i in range(1, 51)))
+    conn.executemany("INSERT INTO user_vehicle (user_id, vehicle_id, user_vehicle_model) VALUES (1, ?, 'Car')", ((i,) for i in range(1, 51)))
+    conn.executemany("INSERT INTO preset (preset_id, preset_name, user_id) VALUES (?, ?, 1)", ((i, f"Preset {i}") for i in range(1, 201)))
+    conn.executemany(
+        "INSERT INTO pass (pass_id, creator_user_id, expiry_datetime, pass_date, pass_utilized) VALUES (?, 1, '2030-01-02 00:00:00', '2030-01-01 00:00:00', 1)",
+        ((i,) for i in range(1, n_passes + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO pass_traveller (pass_id, user_id) VALUES (?, ?)",
+        ((p, t) for p in range(1, n_passes + 1) for t in range(2, n_travellers + 2)),
+    )
+    conn.commit()
+    conn.close()
+
+
+# The serialization the endpoints used before, kept here for comparison
+def legacy_traveller(t):
+    return {"user_id": t.user_id, "first_name": t.first_name, "middle_name": t.middle_name,
+            "last_name": t.last_name, "passport_number": t.passport_number}
+
+
+def legacy_passes(rows, traveller_rows):
+    travellers = {}
+    for t in traveller_rows:
+        travellers.setdefault(t.pass_id, []).append(legacy_traveller(t))
+    return jsonify({"user_id": 1, "next_cursor": None, "passes": [{
+        "pass_id": p.pass_id,
+        "expiry_datetime": p.expiry_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+        "pass_date": p.pass_date.strftime("%Y-%m-%d %H:%M:%S"),
+        "pass_utilized": p.pass_utilized,
+        "travellers": travellers.get(p.pass_id, [])
+    } for p in rows]})
+
+
+def new_passes(rows, traveller_rows):
+    travellers = {}
+    render = TRAVELLER_ROW.renderer(traveller_rows[0])
+    for t in traveller_rows:
+        travellers.setdefault(t.pass_id, []).append(render(t))
+    return json_response({"user_id": 1, "next_cursor": None, "passes": PASS_ROW.render_many(rows, travellers=travellers)})
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--passes", type=int, default=2000)
+    parser.add_argument("--travellers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.test_request_context():
+        db.create_all()
+        populate(db.engine.url.database, args.passes, args.travellers)
+
+        passes, _ = load_user_passes(1, limit=args.passes)
+        traveller_rows = (
+            db.session.query(PassTraveller.pass_id, UserSensitiveInformation.user_id,
+                             UserSensitiveInformation.first_name, UserSensitiveInformation.middle_name,
+                             UserSensitiveInformation.last_name, UserSensitiveInformation.passport_number)
+            .join(UserSensitiveInformation, UserSensitiveInformation.user_id == PassTraveller.user_id)
+            .all()
+        )
+        vehicles = (
+            db.session.query(UserVehicle.user_vehicle_id, UserVehicle.user_vehicle_model, Vehicle.vehicle_id, Vehicle.vehicle_number)
+            .join(Vehicle, UserVehicle.vehicle_id == Vehicle.vehicle_id).filter(UserVehicle.user_id == 1).all()
+        )
+        presets = load_user_presets_with_counts(1)
+        travellers = (
+            db.session.query(UserSensitiveInformation.user_id, UserSensitiveInformation.first_name, UserSensitiveInformation.middle_name,
+                             UserSensitiveInformation.last_name, UserSensitiveInformation.passport_number)
+            .join(UserTraveller, UserSensitiveInformation.user_id == UserTraveller.traveller_id)
+            .filter(UserTraveller.creator_user_id == 1).all()
+        )
+
+        cases = [
+            ("passes", lambda: legacy_passes(passes, traveller_rows), lambda: new_passes(passes, traveller_rows)),
+            ("passes/history",
+             lambda: jsonify({"user_id": 1, "next_cursor": None, "passes_utilized": [{
+                 "pass_id": p.pass_id,
+                 "expiry_datetime": p.expiry_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+                 "pass_date": p.pass_date.strftime("%Y-%m-%d %H:%M:%S")} for p in passes]}),
+             lambda: json_response({"user_id": 1, "next_cursor": None, "passes_utilized": UTILIZED_PASS_ROW.render_many(passes)})),
+            ("travellers",
+             lambda: jsonify({"creator_user_id": 1, "travellers": [{
+                 "traveller_id": t.user_id, "first_name": t.first_name, "middle_name": t.middle_name,
+                 "last_name": t.last_name, "passport_number": t.passport_number} for t in travellers]}),
+             lambda: json_response({"creator_user_id": 1, "travellers": USER_TRAVELLER_ROW.render_many(travellers)})),
+            ("vehicles",
+             lambda: jsonify({"vehicles": [{
+                 "user_vehicle_id": v.user_vehicle_id, "user_vehicle_model": v.user_vehicle_model,
+                 "vehicle_id": v.vehicle_id, "vehicle_number": v.vehicle_number} for v in vehicles]}),
+             lambda: json_response({"vehicles": VEHICLE_ROW.render_many(vehicles)})),
+            ("presets_name",
+             lambda: jsonify({"user_id": 1, "presets": [{
+                 "preset_id": p.preset_id, "preset_name": p.preset_name, "passenger_count": p.passenger_count} for p in presets]}),
+             lambda: json_response({"user_id": 1, "presets": PRESET_COUNT_ROW.render_many(presets)})),
+        ]
+
+        print(f"{args.passes} passes x {args.travellers} travellers, {len(travellers)} travellers, {len(vehicles)} vehicles, "
+              f"{len(presets)} presets; mean of {args.repeat} runs")
+        print(f"  {'endpoint':<15} {'jsonify':>10} {'template+orjson':>16} {'speedup':>8} {'bytes':>9} "
+              f"{'gzip':>18} {'brotli':>18}")
+
+        for name, legacy, new in cases:
+            legacy_ms, legacy_response = timed(legacy, args.repeat)
+            new_ms, new_response = timed(new, args.repeat)
+            body = new_response.get_data()
+            assert body == legacy_response.get_data(), f"{name}: output differs"
+
+            gzip_ms, gzipped = timed(lambda: gzip.compress(body, compresslevel=6, mtime=0), args.repeat)
+            line = (f"  {name:<15} {legacy_ms:7.2f} ms {new_ms:13.2f} ms {legacy_ms / new_ms:7.1f}x {len(body):9d} "
+                    f"{gzip_ms:6.2f} ms {len(gzipped):8d} B")
+            if brotli is not None:
+                br_ms, compressed = timed(lambda: brotli.compress(body, quality=4), args.repeat)
+                line += f" {br_ms:6.2f} ms {len(compressed):8d} B"
+            else:
+                line += f" {'(not installed)':>18}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
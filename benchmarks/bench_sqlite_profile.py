@@ -0,0 +1,114 @@
+# Benchmark: read/write throughput under mixed load for each SQLite database profile
+#
+# Reader threads run the checkpoint resolver query, writer threads mark passes utilized (one transaction each),
+# all against the same database file, for --seconds per profile.
+# Usage: python benchmarks/bench_sqlite_profile.py [--readers 8] [--writers 4] [--seconds 5]
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from db_config import DATABASE_PROFILES, engine_options, attach_pragmas
+
+READ_SQL = text(
+    "SELECT v.vehicle_id, p.pass_id, pt.user_id FROM vehicle v "
+    "JOIN user_vehicle uv ON uv.vehicle_id = v.vehicle_id "
+    "JOIN pass p ON p.creator_user_id = uv.user_id "
+    "LEFT JOIN pass_traveller pt ON pt.pass_id = p.pass_id "
+    "WHERE v.canonical_plate = :plate"
+)
+WRITE_SQL = text("UPDATE pass SET pass_utilized = 1 WHERE pass_id = :pass_id")
+
+
+def build_database(path, n_users):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE vehicle (vehicle_id INTEGER PRIMARY KEY, canonical_plate VARCHAR(20) UNIQUE)")
+        connection.exec_driver_sql("CREATE TABLE user_vehicle (user_vehicle_id INTEGER PRIMARY KEY, user_id INTEGER, vehicle_id INTEGER)")
+        connection.exec_driver_sql("CREATE INDEX ix_uv ON user_vehicle (vehicle_id, user_id)")
+        connection.exec_driver_sql("CREATE TABLE pass (pass_id INTEGER PRIMARY KEY, creator_user_id INTEGER, pass_utilized BOOLEAN)")
+        connection.exec_driver_sql("CREATE INDEX ix_pass ON pass (creator_user_id)")
+        connection.exec_driver_sql("CREATE TABLE pass_traveller (pass_traveller_id INTEGER PRIMARY KEY, pass_id INTEGER, user_id INTEGER)")
+        connection.exec_driver_sql("CREATE INDEX ix_pt ON pass_traveller (pass_id, user_id)")
+        connection.execute(text("INSERT INTO vehicle VALUES (:i, :plate)"), [{"i": i, "plate": f"P{i}"} for i in range(1, n_users + 1)])
+        connection.execute(text("INSERT INTO user_vehicle VALUES (:i, :i, :i)"), [{"i": i} for i in range(1, n_users + 1)])
+        connection.execute(text("INSERT INTO pass VALUES (:i, :i, 0)"), [{"i": i} for i in range(1, n_users + 1)])
+        connection.execute(text("INSERT INTO pass_traveller VALUES (:i, :i, :i)"), [{"i": i} for i in range(1, n_users + 1)])
+    engine.dispose()
+
+
+def run_profile(profile, path, n_users, readers, writers, seconds):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, **engine_options(profile, url))
+    attach_pragmas(engine, profile)
+
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def reader():
+        done = 0
+        while time.perf_counter() < stop:
+            with engine.connect() as connection:
+                connection.execute(READ_SQL, {"plate": f"P{random.randint(1, n_users)}"}).all()
+            done += 1
+        with lock:
+            counts["reads"] += done
+
+    def writer():
+        done = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(WRITE_SQL, {"pass_id": random.randint(1, n_users)})
+                done += 1
+            except OperationalError:
+                errors += 1  # "database is locked"
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    print(f"  {profile:<12} reads {counts['reads'] / seconds:9.0f}/s   writes {counts['writes'] / seconds:7.0f}/s   "
+          f"lock errors {counts['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    template = os.path.join(workdir, "template.db")
+    build_database(template, args.users)
+
+    print(f"{args.readers} readers + {args.writers} writers, {args.seconds:.0f}s per profile")
+    for profile in DATABASE_PROFILES:
+        # Every profile starts from an identical copy (journal mode is persistent in the file)
+        path = os.path.join(workdir, f"{profile}.db")
+        shutil.copy(template, path)
+        run_profile(profile, path, args.users, args.readers, args.writers, args.seconds)
+
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Query-plan regression check: every SELECT issued by the lookup endpoints must use an index
+#
+# Runs each endpoint against a fresh database, captures the SQL it executes and fails (exit code 1)
+# if SQLite's EXPLAIN QUERY PLAN reports a full table scan.
+# Usage: python benchmarks/check_query_plans.py
+
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "query_plans.db")
+
+from sqlalchemy import event, text
+from app import app
+from db_instance import db
+from migrations import create_or_upgrade
+from mock_data import insert_mock_data
+from pass_cache import hot_plate_cache
+from plate_filter import plate_filter
+
+# (method, url, json body) for every endpoint whose queries are checked
+ENDPOINTS = [
+    ("GET", "/api/users/1/vehicles", None),
+    ("GET", "/api/users/1/presets_name", None),
+    ("GET", "/api/presets/1/users", None),
+    ("GET", "/api/users/1/created-presets-with-users", None),
+    ("GET", "/api/users/1/passes", None),
+    ("GET", "/api/users/1/passes?after=1&limit=2", None),
+    ("GET", "/api/users/1/passes/history", None),
+    ("GET", "/api/users/1/profile", None),
+    ("GET", "/api/users/1/travellers", None),
+    ("PATCH", "/api/users/2/profile", {"first_name": "Robert"}),
+    ("POST", "/api/users/1/travellers", {"passport_number": "AU11223344"}),
+    ("POST", "/api/users/3/vehicles", {"vehicle_number": "skr 9859e", "user_vehicle_model": "Sedan"}),
+    ("POST", "/api/passes/create", {"vehicle_number": "SKR9859E", "creator_user_id": 1, "pass_date": "2030-01-01 00:00:00",
+                                    "traveller_passport_numbers": ["A12345678", "C98765432"]}),
+    ("POST", "/api/presets/create", {"preset_name": "Plan", "user_id": 1, "travellers": [{"passport_number": "A12345678"}]}),
+    ("POST", "/api/passes/1/consume", {"lane": "A1", "request_id": "lane-a1-0001"}),
+    ("POST", "/api/checkpoint/match", {"plate": "SKR9B59E", "candidates": [{"plate": "SKR9859F", "score": 0.6}]}),
+    ("POST", "/api/checkpoint/batch", {"items": [{"plate": "SKR9859E"}, {"plate": "sgb267d"}, {"plate": "UNKNOWN1"}]}),
+]
+
+# "SCAN t" and "SCAN t USING [COVERING] INDEX i" both visit every row; "SEARCH t USING ..." is an index seek
+FULL_SCAN = re.compile(r"^SCAN \w+")
+
+
+def main():
+    failures = []
+
+    with app.app_context():
+        create_or_upgrade(db)
+        insert_mock_data()
+
+        # The plate filter is built once with a full scan of vehicle; requests only run its catch-up query
+        plate_filter.configure(path=os.path.join(os.path.dirname(db.engine.url.database), "plate_filter.bin"))
+        plate_filter.refresh()
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and not executemany:
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, "before_cursor_execute", capture)
+        client = app.test_client()
+
+        for method, url, body in ENDPOINTS:
+            statements.clear()
+            hot_plate_cache.clear()  # make checkpoint lookups reach the database
+            response = client.open(url, method=method, json=body)
+            captured = list(statements)
+
+            for statement, parameters in captured:
+                with db.engine.connect() as connection:
+                    plan = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+
+                for row in plan:
+                    detail = row[-1]
+                    if FULL_SCAN.match(detail):
+                        failures.append((method, url, detail, statement))
+
+            print(f"{method:<5} {url:<48} {response.status_code}  {len(captured)} queries")
+
+    if failures:
+        print("\nFull table scans found:")
+        for method, url, detail, statement in failures:
+            print(f"  {method} {url}: {detail}\n    {' '.join(statement.split())[:200]}")
+        sys.exit(1)
+
+    print("\nAll endpoint queries use indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Stress test: many checkpoint lanes consuming the same passes at once through POST /api/passes/<id>/consume
+#
+# Every lane tries every pass (in its own random order) with a unique request id, and sometimes immediately retries
+# with the same request id. Fails (exit code 1) unless each pass was consumed exactly once, retries were idempotent
+# and no request errored; reports consume latency under contention.
+# Usage: python benchmarks/stress_consume.py [--lanes 16] [--passes 300] [--retry-rate 0.1]
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "stress_consume.db")
+
+from app import app
+from db_instance import db
+from migrations import create_or_upgrade
+
+
+def populate(db_path, n_passes):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO user_sensitive_information VALUES (1, 'Lane', NULL, 'Tester', '1990-01-01', 'Singapore', 'P000000001', '2035-01-01')")
+    conn.executemany(
+        "INSERT INTO pass (pass_id, creator_user_id, expiry_datetime, pass_date, pass_utilized) VALUES (?, 1, '2099-01-02 00:00:00', '2099-01-01 00:00:00', 0)",
+        ((i,) for i in range(1, n_passes + 1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lanes", type=int, default=16)
+    parser.add_argument("--passes", type=int, default=300)
+    parser.add_argument("--retry-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with app.app_context():
+        create_or_upgrade(db)
+        db_path = db.engine.url.database
+    populate(db_path, args.passes)
+
+    wins = Counter()  # pass_id -> lanes that consumed it (first attempt, not a replay)
+    winner = {}
+    statuses = Counter()
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.lanes)
+
+    def lane(name):
+        client = app.test_client()
+        passes = list(range(1, args.passes + 1))
+        random.shuffle(passes)
+        barrier.wait()
+
+        for pass_id in passes:
+            request_id = f"{name}-{pass_id}"
+            attempts = 2 if random.random() < args.retry_rate else 1
+            first = None
+
+            for attempt in range(attempts):
+                started = time.perf_counter()
+                response = client.post(f"/api/passes/{pass_id}/consume", json={"lane": name, "request_id": request_id})
+                elapsed = time.perf_counter() - started
+                body = response.get_json(silent=True) or {}
+
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[response.status_code] += 1
+
+                    if response.status_code >= 500:
+                        failures.append(f"{name} pass {pass_id}: HTTP {response.status_code}")
+                    elif attempt == 0:
+                        first = (response.status_code, body.get("replayed"))
+                        if response.status_code == 200:
+                            wins[pass_id] += 1
+                            winner[pass_id] = name
+                    elif first[0] == 200 and not (response.status_code == 200 and body.get("replayed")):
+                        failures.append(f"{name} pass {pass_id}: retry after success returned {response.status_code}")
+                    elif first[0] == 409 and response.status_code != 409:
+                        failures.append(f"{name} pass {pass_id}: retry after 409 returned {response.status_code}")
+
+    threads = [threading.Thread(target=lane, args=(f"lane-{i}",)) for i in range(args.lanes)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    # Every pass consumed exactly once, by the lane recorded in the database
+    double_use = [pass_id for pass_id, count in wins.items() if count > 1]
+    never_used = [pass_id for pass_id in range(1, args.passes + 1) if wins[pass_id] == 0]
+
+    conn = sqlite3.connect(db_path)
+    utilized = conn.execute("SELECT COUNT(*) FROM pass WHERE pass_utilized = 1").fetchone()[0]
+    recorded = dict(conn.execute("SELECT pass_id, lane FROM pass_consumption").fetchall())
+    conn.close()
+
+    mismatched = [pass_id for pass_id, name in winner.items() if recorded.get(pass_id) != name]
+
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(f"{args.lanes} lanes x {args.passes} passes, retry rate {args.retry_rate}: {len(latencies)} consume calls in {wall:.2f}s "
+          f"({len(latencies) / wall:.0f}/s)")
+    print(f"  status codes: {dict(sorted(statuses.items()))}")
+    print(f"  latency ms: p50 {pct(0.5):.2f}  p95 {pct(0.95):.2f}  p99 {pct(0.99):.2f}  max {latencies[-1] * 1000:.2f}")
+    print(f"  passes consumed: {len(wins)}/{args.passes}, utilized in db: {utilized}, consumption rows: {len(recorded)}")
+
+    problems = failures[:10]
+    if double_use:
+        problems.append(f"passes consumed more than once: {double_use[:10]}")
+    if never_used:
+        problems.append(f"passes never consumed: {never_used[:10]}")
+    if mismatched or utilized != args.passes or len(recorded) != args.passes:
+        problems.append(f"database disagrees with responses (mismatched lanes: {mismatched[:10]})")
+
+    if problems:
+        print("FAILED")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+
+    print("OK: no double use, retries idempotent")
+
+
+if __name__ == "__main__":
+    main()
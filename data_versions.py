@@ -0,0 +1,122 @@
+import functools
+import hashlib
+
+from flask import g, request, make_response, current_app
+from sqlalchemy import select, union, update, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db_instance import db
+from models import UserDataVersion, Pass, PassTraveller, ArchivedPass, ArchivedPassTraveller, Preset, PresetTraveller, UserTraveller
+from response_cache import response_cache
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Clients must revalidate on every poll, which costs one primary-key lookup when nothing changed
+CACHE_CONTROL = "private, no-cache"
+
+
+# Current data version of a user (0 until the first write)
+def get_user_version(user_id):
+    version = db.session.execute(
+        select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+
+# Bump the data version of the given users; call before the commit of the write
+def bump_user_versions(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    # Cached responses carry the version they were rendered at, so dropping them before the commit is safe
+    response_cache.invalidate_users(user_ids)
+
+    rows = [{"user_id": user_id, "version": 1} for user_id in sorted(user_ids)]
+    upsert_insert = _UPSERT_INSERTS.get(db.session.get_bind(UserDataVersion).dialect.name)
+
+    if upsert_insert is not None:
+        statement = upsert_insert(UserDataVersion).values(rows)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[UserDataVersion.user_id],
+            set_={"version": UserDataVersion.version + 1}
+        ))
+        return
+
+    # Other backends: increment existing rows, insert the missing ones
+    for row in rows:
+        result = db.session.execute(
+            update(UserDataVersion).where(UserDataVersion.user_id == row["user_id"]).values(version=UserDataVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(UserDataVersion).values(row))
+
+
+# Users whose read endpoints show this user's details (traveller names on passes, presets and traveller lists)
+def dependent_user_ids(user_id):
+    query = union(
+        select(UserTraveller.creator_user_id).where(UserTraveller.traveller_id == user_id),
+        select(Pass.creator_user_id).join(PassTraveller, PassTraveller.pass_id == Pass.pass_id).where(PassTraveller.user_id == user_id),
+        select(ArchivedPass.creator_user_id).join(ArchivedPassTraveller, ArchivedPassTraveller.pass_id == ArchivedPass.pass_id).where(ArchivedPassTraveller.user_id == user_id),
+        select(Preset.user_id).join(PresetTraveller, PresetTraveller.preset_id == Preset.preset_id).where(PresetTraveller.user_id == user_id),
+    )
+    return set(db.session.execute(query).scalars())
+
+
+# Bump a user whose own details changed, together with every user that displays them
+def bump_user_and_dependents(user_id):
+    bump_user_versions({user_id} | dependent_user_ids(user_id))
+
+
+# ETag of one endpoint's response for a user at a data version (query arguments such as pagination included)
+def version_etag(endpoint, user_id, version, query_string=b""):
+    key = f"{endpoint}:{user_id}:{version}:".encode("utf-8") + query_string
+    return hashlib.sha1(key).hexdigest()
+
+
+# Conditional GET for per-user read endpoints: answers If-None-Match with 304 from the user's data version alone,
+# without running the view; successful responses carry the ETag and Cache-Control
+def conditional_get(view):
+
+    @functools.wraps(view)
+    def wrapper(user_id, *args, **kwargs):
+        g.user_data_version = get_user_version(user_id)
+        etag = version_etag(request.endpoint, user_id, g.user_data_version, request.query_string)
+
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(view(user_id, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
+
+    return wrapper
+
+
+# Serve a per-user read endpoint from the response cache while the user's data version is unchanged
+# Goes below conditional_get, whose version lookup it reuses
+def cached_response(view):
+
+    @functools.wraps(view)
+    def wrapper(user_id, *args, **kwargs):
+        version = g.get("user_data_version")
+        if version is None:
+            version = get_user_version(user_id)
+
+        key = (request.endpoint, user_id, request.query_string)
+        cached = response_cache.get(key, version)
+        if cached is not None:
+            mimetype, body = cached
+            return current_app.response_class(body, status=200, mimetype=mimetype)
+
+        response = make_response(view(user_id, *args, **kwargs))
+        if response.status_code == 200:
+            response_cache.put(key, version, response.mimetype, response.get_data())
+        return response
+
+    return wrapper
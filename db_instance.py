@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
\ No newline at end of file
+# Reads of read-only endpoints go to replicas (SQLALCHEMY_BINDS "replica_*"), everything else to the primary
+db = SQLAlchemy(session_options={"class_": RoutingSession})
@@ -0,0 +1,94 @@
+import functools
+import random
+import time
+
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Bind keys of read replicas in SQLALCHEMY_BINDS ("replica_0", "replica_1", ...)
+REPLICA_BIND_PREFIX = "replica_"
+
+# Cookie carrying the time until which this client's reads stay on the primary (read-your-writes)
+STICKY_COOKIE = "db_primary_until"
+
+
+# Replica bind entries for SQLALCHEMY_BINDS from a list of database URIs
+def replica_binds(urls):
+    return {f"{REPLICA_BIND_PREFIX}{i}": url for i, url in enumerate(urls)}
+
+
+# Session that sends reads of read-only endpoints to a replica and everything else to the primary
+# A request stays on the primary once its session has written anything, or while the client is sticky
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica():
+            engine = self._replica_engine()
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self):
+        if not has_request_context() or not g.get("db_read_only"):
+            return False
+
+        return not (self._flushing or self.info.get("wrote") or self.new or self.dirty or self.deleted)
+
+    # One replica per request, so a request sees a single consistent snapshot
+    def _replica_engine(self):
+        if "db_replica_key" not in g:
+            keys = [key for key in self._db.engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+            g.db_replica_key = random.choice(keys) if keys else None
+
+        if g.db_replica_key is None:
+            return None
+        return self._db.engines[g.db_replica_key]
+
+
+# Remember that this session wrote, for stickiness and so later reads in the request see the write
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_session_wrote(session, flush_context):
+    session.info["wrote"] = True
+    if has_request_context():
+        g.db_wrote = True
+
+
+# Core (non-ORM) statements such as bulk INSERT/UPDATE also count as writes
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+        if has_request_context():
+            g.db_wrote = True
+
+
+# Mark an endpoint as read-only so its queries can be served by a replica
+# Only for GET list and profile endpoints: the checkpoint lane must see passes and vehicles as of the primary
+def read_only(view):
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = not _client_is_sticky()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _client_is_sticky():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# After a request that wrote, keep this client's reads on the primary for READ_YOUR_WRITES_SECONDS
+def init_db_routing(app):
+
+    @app.after_request
+    def set_read_your_writes_cookie(response):
+        if g.get("db_wrote"):
+            window = app.config.get("READ_YOUR_WRITES_SECONDS", 5)
+            response.set_cookie(STICKY_COOKIE, f"{time.time() + window:.3f}", max_age=int(window) + 1, httponly=True)
+        return response
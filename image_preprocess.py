@@ -0,0 +1,119 @@
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+
+# Decode, optionally crop to a region of interest, downscale and re-encode a frame as JPEG
+# region is (left, top, right, bottom) as fractions of the image, e.g. (0.0, 0.4, 1.0, 1.0) for the lower 60%
+# Runs inside a worker process, so it only takes and returns plain bytes/tuples
+# Frames Pillow cannot decode are returned unchanged, PlateRecognizer then reports the error as before
+def preprocess_image(image_bytes, max_side=1280, quality=85, region=None):
+    try:
+        return _preprocess(image_bytes, max_side, quality, region)
+    except (OSError, Image.DecompressionBombError):
+        return image_bytes
+
+
+def _preprocess(image_bytes, max_side, quality, region):
+    image = Image.open(io.BytesIO(image_bytes))
+
+    # Let the JPEG decoder downscale by a power of two while decoding (much cheaper than a full decode)
+    if image.format == "JPEG":
+        width_fraction = (region[2] - region[0]) if region else 1.0
+        height_fraction = (region[3] - region[1]) if region else 1.0
+        image.draft("RGB", (int(max_side / width_fraction), int(max_side / height_fraction)))
+
+    # Phone cameras store rotation in EXIF, apply it before cropping
+    image = ImageOps.exif_transpose(image)
+
+    if region:
+        width, height = image.size
+        image = image.crop((int(region[0] * width), int(region[1] * height), int(region[2] * width), int(region[3] * height)))
+
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="JPEG", quality=quality, optimize=True)
+    processed = output.getvalue()
+
+    # Never send more bytes than the original
+    if len(processed) >= len(image_bytes) and not region:
+        return image_bytes
+    return processed
+
+
+# Runs preprocess_image on a process pool so JPEG decoding does not hold the GIL in web workers
+# Frames smaller than min_bytes are sent as-is, the pool round trip would cost more than it saves
+class ImagePreprocessor:
+
+    def __init__(self, max_side=1280, quality=85, lane_regions=None, min_bytes=256 * 1024, workers=None, enabled=True):
+        self.max_side = max_side
+        self.quality = quality
+        self.lane_regions = lane_regions or {}
+        self.min_bytes = min_bytes
+        self.workers = workers
+        self.enabled = enabled
+        self._executor = None
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def configure(self, **options):
+        for key, value in options.items():
+            setattr(self, key, value)
+
+    # Created lazily, the first frame pays for starting the pool
+    # Workers are started from a fork server (spawned where there is none), never forked from the app process:
+    # a fork would copy its threads' locks (SQLAlchemy pool, archiver, recognition workers) in whatever state they are
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    # Preprocess a frame for the given lane (lane regions come from the LANE_REGIONS config)
+    def process(self, image_bytes, lane=None):
+        region = self.lane_regions.get(lane) if lane is not None else None
+
+        if not self.enabled or (len(image_bytes) < self.min_bytes and region is None):
+            return image_bytes
+
+        started = time.perf_counter()
+        processed = self._pool().submit(preprocess_image, image_bytes, self.max_side, self.quality, region).result()
+
+        with self._lock:
+            self.frames += 1
+            self.bytes_in += len(image_bytes)
+            self.bytes_out += len(processed)
+            self.seconds += time.perf_counter() - started
+
+        return processed
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    # Counters exposed through /api/recognition/preprocess-stats
+    def stats(self):
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "size_ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+                "avg_preprocess_ms": round(self.seconds / self.frames * 1000, 2) if self.frames else None
+            }
+
+
+# Shared instance used by the default PlateRecognizer client, configured from app.config in app.py
+image_preprocessor = ImagePreprocessor()
@@ -1,68 +1,269 @@
-from datetime import datetime, timezone
+from flask import current_app
 from db_instance import db
-from sqlalchemy import func
-from models import Vehicle, Pass, UserVehicle, PassTraveller, UserSensitiveInformation  # Import relevant models
+from sqlalchemy import exists, select, update, insert
+from models import Vehicle, Pass, UserVehicle, PassTraveller, UserSensitiveInformation, PassConsumption, ArchivedPass  # Import relevant models
+from plate_utils import canonicalize_plate
+from pass_cache import hot_plate_cache, utc_now
+from plate_filter import plate_filter
+from plate_matcher import plate_matcher
 
-# Immigration Checkpoint Workflow Logic
-def immigration_walkthrough(license_plate):
+VEHICLE_NOT_FOUND = "Vehicle not found in the system. Please register the vehicle."
+
+
+# Resolve many license plates at once into {canonical plate: (result, pass expiry, user ids involved in the pass)}
+# using a single set-based query. The expiry and user ids are only set on success and let callers cache the result.
+def resolve_checkpoint_entries(license_plates, now=None):
+
+    # Expiry is stored as naive UTC, so compare against naive UTC "now" inside SQL
+    if now is None:
+        now = utc_now()
+
+    canonical_plates = {canonicalize_plate(plate) for plate in license_plates}
+
+    # The earliest-expiring unused pass valid right now (pass_date <= now < expiry) created by any user linked to the vehicle
+    valid_pass_id = (
+        select(Pass.pass_id)
+        .join(UserVehicle, Pass.creator_user_id == UserVehicle.user_id)
+        .where(UserVehicle.vehicle_id == Vehicle.vehicle_id, Pass.pass_date <= now, Pass.expiry_datetime > now, Pass.pass_utilized == False)
+        .order_by(Pass.expiry_datetime, Pass.pass_id)
+        .limit(1)
+        .correlate(Vehicle)
+        .scalar_subquery()
+    )
 
-    # Check if the vehicle exists in the database
-    vehicle = Vehicle.query.filter(func.lower(Vehicle.vehicle_number) == license_plate.lower()).first()
-    
-    if not vehicle:
-        return {"status": "failure", "message": "Vehicle not found in the system. Please register the vehicle."}
+    # Whether any user has registered the vehicle at all (used only for the failure message)
+    has_users = exists().where(UserVehicle.vehicle_id == Vehicle.vehicle_id)
 
-    # Get all users linked to the vehicle from UserVehicle table
-    user_vehicles = UserVehicle.query.filter_by(vehicle_id=vehicle.vehicle_id).all()
+    # One round trip: vehicle -> valid pass -> travellers, one row per traveller
+    rows = (
+        db.session.query(
+            Vehicle.canonical_plate,
+            has_users.label("has_users"),
+            Pass.pass_id,
+            Pass.creator_user_id,
+            Pass.expiry_datetime,
+            PassTraveller.user_id,
+            UserSensitiveInformation.first_name,
+            UserSensitiveInformation.last_name
+        )
+        .select_from(Vehicle)
+        .outerjoin(Pass, Pass.pass_id == valid_pass_id)
+        .outerjoin(PassTraveller, PassTraveller.pass_id == Pass.pass_id)
+        .outerjoin(UserSensitiveInformation, UserSensitiveInformation.user_id == PassTraveller.user_id)
+        .filter(Vehicle.canonical_plate.in_(canonical_plates))  # index seeks on the canonical plate
+        .order_by(PassTraveller.pass_traveller_id)
+        .all()
+    )
 
-    if not user_vehicles:
-        return {"status": "failure", "message": "No users found linked to this vehicle."} 
+    # Group the rows by plate
+    rows_by_plate = {}
+    for r in rows:
+        rows_by_plate.setdefault(r.canonical_plate, []).append(r)
 
-    # Store a list of all user_ids - Those users have registered the vehicle
-    user_ids = [uv.user_id for uv in user_vehicles]
+    entries = {}
+    for plate in canonical_plates:
+        plate_rows = rows_by_plate.get(plate)
 
-    valid_pass = None
-    
-    for user_id in user_ids:
+        if not plate_rows:
+            entries[plate] = ({"status": "failure", "message": VEHICLE_NOT_FOUND}, None, None)
+            continue
 
-        # Retrieve the user's pass from the Pass table
-        passes = Pass.query.filter_by(vehicle_id=vehicle.vehicle_id, creator_user_id=user_id).all()
+        first = plate_rows[0]
 
-        #TODO - Incorporate logic for querying next pass if current pass in invalid
+        if not first.has_users:
+            entries[plate] = ({"status": "failure", "message": "No users found linked to this vehicle."}, None, None)
+            continue
 
-        # Apply additional filtering to the passes - only select those passes 
-        for p in passes:
+        if first.pass_id is None:
+            entries[plate] = ({"status": "failure", "message": "No valid pass found for today."}, None, None)
+            continue
 
-            # Make expiry_datetime aware of UTC timezone if it doesn't already have one
-            if p.expiry_datetime.tzinfo is None:
-                expiry_datetime_aware = p.expiry_datetime.replace(tzinfo=timezone.utc)
-            else:
-                expiry_datetime_aware = p.expiry_datetime
+        # Get the first and last name for the travellers (a pass without travellers yields one empty row)
+        traveller_info = [
+            {"first_name": r.first_name, "last_name": r.last_name}
+            for r in plate_rows if r.first_name is not None
+        ]
 
-            if expiry_datetime_aware > datetime.now(timezone.utc):
-                valid_pass = p
-                break
-        
-        if valid_pass:
-            break
+        user_ids = {first.creator_user_id} | {r.user_id for r in plate_rows if r.user_id is not None}
 
-    if not valid_pass:
-        return {"status": "failure", "message": "No valid pass found for today."}
-    
+        entries[plate] = ({"status": "success", "pass_id": first.pass_id, "travellers": traveller_info}, first.expiry_datetime, user_ids)
 
-    # Select those rows in PassTraveller which has valid pass id
-    pass_travellers = PassTraveller.query.filter_by(pass_id=valid_pass.pass_id).all()
+    return entries
 
-    # Get all the user ids of the travellers in the group for that particular valid pass
-    traveller_ids = [pt.user_id for pt in pass_travellers]
 
-    # Select those rows in User table if the User id falls under traveller_ids list
-    travellers = UserSensitiveInformation.query.filter(UserSensitiveInformation.user_id.in_(traveller_ids)).all()
+# Resolve a single license plate into (result, pass expiry, user ids involved in the pass)
+def resolve_checkpoint_entry(license_plate, now=None):
+    return resolve_checkpoint_entries([license_plate], now)[canonicalize_plate(license_plate)]
+
+
+# Resolve a license plate into its valid pass and travellers using a single query
+def resolve_checkpoint(license_plate, now=None):
+    result, _, _ = resolve_checkpoint_entry(license_plate, now)
+    return result
+
+
+# Immigration Checkpoint Workflow Logic
+def immigration_walkthrough(license_plate):
+
+    now = utc_now()
 
-    # Get the first and last name for the travellers
-    traveller_info = [{"first_name": trav.first_name, "last_name": trav.last_name} for trav in travellers]
+    # Rebuild the in-memory map of today's passes in the background when it is stale
+    if hot_plate_cache.needs_refresh(now):
+        hot_plate_cache.refresh_in_background(current_app._get_current_object(), now)
+
+    if plate_filter.needs_refresh(now):
+        plate_filter.refresh_in_background(current_app._get_current_object(), now)
+
+    # Most plates at the gate hold a pass for today and are answered from memory
+    result = hot_plate_cache.get(license_plate, now)
+
+    # Plates of unregistered vehicles are rejected by the Bloom filter without a query
+    if result is None and not plate_filter.might_contain(license_plate):
+        result = {"status": "failure", "message": VEHICLE_NOT_FOUND}
+
+    if result is None:
+        generation = hot_plate_cache.generation
+
+        # Vehicle, linked users, valid pass and travellers are all resolved in one query
+        result, expires_at, user_ids = resolve_checkpoint_entry(license_plate, now)
+
+        if expires_at is not None:
+            hot_plate_cache.put(license_plate, result, expires_at, user_ids, generation)
 
     #TODO - Need to incorporate logic of communicating with kiosk here to check if the pass retrieved is valid
 
     # If a valid pass is found, provide a success message including traveller names
-    return {"status": "success", "travellers": traveller_info}
+    return result
+
+
+# Batch variant of immigration_walkthrough for multi-lane submissions
+# Cached plates are answered from memory, all the others are resolved together in one query
+def immigration_walkthrough_batch(license_plates):
+
+    now = utc_now()
+
+    if hot_plate_cache.needs_refresh(now):
+        hot_plate_cache.refresh_in_background(current_app._get_current_object(), now)
+
+    if plate_filter.needs_refresh(now):
+        plate_filter.refresh_in_background(current_app._get_current_object(), now)
+
+    results = {}
+    missing = []
+    for plate in license_plates:
+        result = hot_plate_cache.get(plate, now)
+        if result is None and not plate_filter.might_contain(plate):
+            result = {"status": "failure", "message": VEHICLE_NOT_FOUND}
+
+        if result is None:
+            missing.append(plate)
+        else:
+            results[plate] = result
+
+    if missing:
+        generation = hot_plate_cache.generation
+        entries = resolve_checkpoint_entries(missing, now)
+
+        for plate in missing:
+            result, expires_at, user_ids = entries[canonicalize_plate(plate)]
+            results[plate] = result
+
+            if expires_at is not None:
+                hot_plate_cache.put(plate, result, expires_at, user_ids, generation)
+
+    # Results in the order the plates were given
+    return [results[plate] for plate in license_plates]
+
+
+# immigration_walkthrough for a frame with several possible readings: [(plate, recognizer score)], reported plate first
+# When the reported plate is not a registered vehicle, the readings are matched against registered plates tolerating
+# OCR misreads. The failure then carries the ranked "suggestions" and "requires_confirmation" for the officer; only
+# with FUZZY_MATCH_AUTO_ACCEPT is a clear, cheap match resolved as that vehicle ("matched_plate", "match_cost" added).
+def immigration_walkthrough_fuzzy(candidates):
+
+    result = immigration_walkthrough(candidates[0][0])
+    if result["status"] == "success" or result.get("message") != VEHICLE_NOT_FOUND:
+        return result
+
+    ranked, _ = plate_matcher.match(candidates)
+    accepted = plate_matcher.accept(ranked)
+
+    if accepted is not None:
+        result = dict(immigration_walkthrough(accepted["canonical_plate"]))
+        result["matched_plate"] = accepted["vehicle_number"]
+        result["match_cost"] = accepted["cost"]
+        return result
+
+    return {**result, "suggestions": ranked, "requires_confirmation": bool(ranked)}
+
+
+def _consumption_dict(consumption):
+    return {
+        "pass_id": consumption.pass_id,
+        "request_id": consumption.request_id,
+        "lane": consumption.lane,
+        "consumed_at": consumption.consumed_at.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+# Mark a pass utilized at a checkpoint lane, at most once, in the caller's transaction (the caller commits)
+# A single conditional UPDATE claims the pass, so concurrent lanes can never both consume it; retrying with the
+# same request id returns the original outcome. Returns (outcome, consumption dict or None, creator user id or None)
+# with outcome one of "consumed", "replayed", "not_found", "already_used", "not_yet_valid", "expired", "request_id_conflict".
+def consume_pass(pass_id, request_id, lane=None, now=None):
+
+    if now is None:
+        now = utc_now()
+
+    # The claim is the transaction's first statement, so it takes the write lock before reading anything
+    creator_user_id = db.session.execute(
+        update(Pass)
+        .where(Pass.pass_id == pass_id, Pass.pass_utilized == False, Pass.pass_date <= now, Pass.expiry_datetime > now)
+        .values(pass_utilized=True)
+        .returning(Pass.creator_user_id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+    if creator_user_id is not None:
+        # A request id already used for another pass (primary key), or a pass with a consumption left behind
+        # (unique pass_id), fails here with an IntegrityError; see classify_consume_conflict
+        db.session.execute(insert(PassConsumption).values(request_id=request_id, pass_id=pass_id, lane=lane, consumed_at=now))
+        consumption = {"pass_id": pass_id, "request_id": request_id, "lane": lane, "consumed_at": now.strftime("%Y-%m-%d %H:%M:%S")}
+        return "consumed", consumption, creator_user_id
+
+    # Nothing claimed: a retry of a consume that already succeeded, or a pass that can't be used
+    previous = db.session.get(PassConsumption, request_id)
+    if previous is not None:
+        outcome = "replayed" if previous.pass_id == pass_id else "request_id_conflict"
+        return outcome, _consumption_dict(previous), None
+
+    utilized = db.session.execute(select(Pass.pass_utilized, Pass.pass_date).where(Pass.pass_id == pass_id)).first()
+    if utilized is None:
+        # Passes moved to the archive expired long ago
+        archived = db.session.execute(select(ArchivedPass.pass_id).where(ArchivedPass.pass_id == pass_id)).first()
+        return ("expired" if archived else "not_found"), None, None
+
+    if utilized.pass_utilized:
+        consumption = db.session.execute(select(PassConsumption).where(PassConsumption.pass_id == pass_id)).scalar()
+        return "already_used", _consumption_dict(consumption) if consumption else None, None
+
+    if utilized.pass_date > now:
+        return "not_yet_valid", None, None
+
+    return "expired", None, None
+
+
+# Outcome of a consume whose PassConsumption insert failed, looked up after the caller rolled back
+# Returns (outcome, consumption dict) like consume_pass, or None when neither the request id nor the pass explains it
+def classify_consume_conflict(pass_id, request_id):
+    previous = db.session.get(PassConsumption, request_id)
+    if previous is not None:
+        # A concurrent retry with the same request id committed first
+        outcome = "replayed" if previous.pass_id == pass_id else "request_id_conflict"
+        return outcome, _consumption_dict(previous)
+
+    consumption = db.session.execute(select(PassConsumption).where(PassConsumption.pass_id == pass_id)).scalar()
+    if consumption is not None:
+        return "already_used", _consumption_dict(consumption)
+
+    return None
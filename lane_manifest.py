@@ -0,0 +1,342 @@
+import calendar
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from db_instance import db
+from models import Vehicle, UserVehicle, Pass, PassTraveller, PassConsumption, UserSensitiveInformation
+from plate_utils import canonicalize_plate
+from pass_cache import utc_now
+
+# Lane manifests let a kiosk validate plates locally, without a database round trip and through backend outages.
+#
+# A manifest is one file listing every unused pass valid at some point of a time window, with its canonical plate and
+# traveller names, in a fixed-width layout that is read straight from a memory map:
+#
+#   header   HEADER (magic, format, kind, version, sequence, times, high-water pass id, counts, crc32 of the rest)
+#   records  record_count x RECORD, sorted by (plate, expiry, pass id), binary-searched in place
+#   removed  removed_count x uint64 pass ids (deltas only: passes consumed since the previous file)
+#   names    "first\x1flast\x1e..." UTF-8 blocks, one per record, decoded only on a hit
+#
+# Delta files share the layout. Delta n of manifest v carries the passes created since delta n - 1 (pass ids above
+# its high-water mark) and the passes consumed since then; kiosks apply them in sequence on top of the manifest.
+# Other changes (a vehicle linked to another user, edited names) reach kiosks with the next full manifest.
+# A plate missing from the manifest is not a refusal: the kiosk asks the backend when it can reach it.
+
+MAGIC = b"LMAN"
+FORMAT_VERSION = 1
+KIND_FULL = 0
+KIND_DELTA = 1
+
+PLATE_BYTES = 20  # Vehicle.canonical_plate is at most 20 characters
+
+HEADER = struct.Struct("<4sHHQIqqqQIII")
+RECORD = struct.Struct(f"<{PLATE_BYTES}sQqqII")  # plate, pass id, valid from, expires (epoch s), names offset, names length
+REMOVED = struct.Struct("<Q")
+
+FIELD_SEP = "\x1f"
+TRAVELLER_SEP = "\x1e"
+
+# Consumptions committed just before the previous delta was cut may carry an earlier consumed_at, so each delta
+# looks back this far; removing a pass twice is harmless
+CONSUMPTION_OVERLAP = timedelta(minutes=1)
+
+
+class ManifestError(Exception):
+    pass
+
+
+def _epoch(value):
+    return calendar.timegm(value.utctimetuple())
+
+
+def manifest_name(version):
+    return f"lane-manifest-{version}.bin"
+
+
+def delta_name(version, sequence):
+    return f"lane-manifest-{version}-delta-{sequence:06d}.bin"
+
+
+# Versions of the full manifests in folder
+def _versions(folder):
+    if not os.path.isdir(folder):
+        return set()
+    return {int(name[len("lane-manifest-"):-len(".bin")]) for name in os.listdir(folder)
+            if name.startswith("lane-manifest-") and name.endswith(".bin") and "-delta-" not in name}
+
+
+# Version of the newest manifest in folder, or None
+def latest_version(folder):
+    return max(_versions(folder), default=None)
+
+
+# Highest delta sequence written for a manifest version (0 when there is none)
+def latest_sequence(folder, version):
+    prefix = f"lane-manifest-{version}-delta-"
+    sequences = [int(name[len(prefix):-len(".bin")]) for name in os.listdir(folder) if name.startswith(prefix)]
+    return max(sequences, default=0)
+
+
+def read_header(path):
+    with open(path, "rb") as fp:
+        return _unpack_header(fp.read(HEADER.size))
+
+
+def _unpack_header(data):
+    if len(data) < HEADER.size:
+        raise ManifestError("Truncated manifest header")
+
+    (magic, format_version, kind, version, sequence, generated_at, window_start, window_end,
+     max_pass_id, record_count, removed_count, checksum) = HEADER.unpack_from(data)
+
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ManifestError(f"Not a lane manifest (format {format_version})")
+
+    return {
+        "kind": kind, "version": version, "sequence": sequence, "generated_at": generated_at,
+        "window_start": window_start, "window_end": window_end, "max_pass_id": max_pass_id,
+        "record_count": record_count, "removed_count": removed_count, "checksum": checksum
+    }
+
+
+# --- Generation (backend side) ---------------------------------------------------------------------------------------
+
+# Unused passes valid at some point in [window_start, window_end) with their plates and travellers, in one query
+# Returns sorted (plate bytes, pass id, valid from, expires, names) tuples and the highest pass id considered
+def _load_entries(window_start, window_end, after_pass_id=None):
+
+    # High-water mark taken first: passes created while the file is written are left to the next delta
+    max_pass_id = db.session.query(db.func.max(Pass.pass_id)).scalar() or 0
+
+    query = (
+        db.session.query(
+            Vehicle.canonical_plate,
+            Pass.pass_id,
+            Pass.pass_date,
+            Pass.expiry_datetime,
+            UserSensitiveInformation.first_name,
+            UserSensitiveInformation.last_name
+        )
+        .join(UserVehicle, UserVehicle.vehicle_id == Vehicle.vehicle_id)
+        .join(Pass, Pass.creator_user_id == UserVehicle.user_id)
+        .outerjoin(PassTraveller, PassTraveller.pass_id == Pass.pass_id)
+        .outerjoin(UserSensitiveInformation, UserSensitiveInformation.user_id == PassTraveller.user_id)
+        .filter(Pass.expiry_datetime > window_start, Pass.pass_date < window_end, Pass.pass_utilized == False)
+        .filter(Pass.pass_id <= max_pass_id)
+    )
+
+    if after_pass_id is not None:
+        query = query.filter(Pass.pass_id > after_pass_id)
+
+    entries = {}
+    for r in query.order_by(PassTraveller.pass_traveller_id).all():
+        key = (r.canonical_plate, r.pass_id)
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = (r.canonical_plate.encode("ascii"), r.pass_id, _epoch(r.pass_date), _epoch(r.expiry_datetime), [])
+        if r.first_name is not None:
+            entry[4].append(f"{r.first_name}{FIELD_SEP}{r.last_name}")
+
+    return sorted(entries.values(), key=lambda e: (e[0], e[3], e[1])), max_pass_id
+
+
+def _write(path, kind, version, sequence, generated_at, window_start, window_end, max_pass_id, entries, removed=()):
+    records = bytearray()
+    names = bytearray()
+
+    for plate, pass_id, valid_from, expires, travellers in entries:
+        blob = TRAVELLER_SEP.join(travellers).encode("utf-8")
+        records += RECORD.pack(plate, pass_id, valid_from, expires, len(names), len(blob))
+        names += blob
+
+    body = bytes(records) + b"".join(REMOVED.pack(pass_id) for pass_id in sorted(removed)) + bytes(names)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, kind, version, sequence, generated_at, window_start, window_end,
+                         max_pass_id, len(entries), len(removed), zlib.crc32(body))
+
+    # Written via a temporary file so kiosks downloading it never see a partial manifest
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(header)
+        fp.write(body)
+    os.replace(tmp_path, path)
+
+
+# Write a new full manifest for passes valid in [now, now + window); returns its path
+# Older manifests (and their deltas) are removed, except the previous one so kiosks mid-download can finish
+def build_manifest(folder, window=timedelta(hours=24), now=None):
+    now = now or utc_now()
+    window_end = now + window
+
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    entries, max_pass_id = _load_entries(now, window_end)
+
+    # Versions are the generation time in ms, so they only ever increase
+    version = max(int(time.time() * 1000), (latest_version(folder) or 0) + 1)
+    path = os.path.join(folder, manifest_name(version))
+    _write(path, KIND_FULL, version, 0, _epoch(now), _epoch(now), _epoch(window_end), max_pass_id, entries)
+
+    previous = sorted(v for v in _versions(folder) if v != version)
+    for old in previous[:-1]:
+        for name in os.listdir(folder):
+            if name in (manifest_name(old), f"{manifest_name(old)}.tmp") or name.startswith(f"lane-manifest-{old}-delta-"):
+                os.remove(os.path.join(folder, name))
+
+    return path
+
+
+# Write the next delta of the newest manifest: passes created and passes consumed since the last file
+# Returns the delta path, or None when nothing changed (or there is no manifest yet)
+def build_delta(folder, now=None):
+    now = now or utc_now()
+    version = latest_version(folder)
+    if version is None:
+        return None
+
+    base = read_header(os.path.join(folder, manifest_name(version)))
+    sequence = latest_sequence(folder, version)
+    previous = read_header(os.path.join(folder, delta_name(version, sequence))) if sequence else base
+
+    window_start = datetime.utcfromtimestamp(base["window_start"])
+    window_end = datetime.utcfromtimestamp(base["window_end"])
+    since = datetime.utcfromtimestamp(previous["generated_at"]) - CONSUMPTION_OVERLAP
+
+    entries, max_pass_id = _load_entries(window_start, window_end, after_pass_id=previous["max_pass_id"])
+    removed = {pass_id for (pass_id,) in db.session.query(PassConsumption.pass_id).filter(PassConsumption.consumed_at >= since)}
+
+    if not entries and not removed and max_pass_id == previous["max_pass_id"]:
+        return None
+
+    path = os.path.join(folder, delta_name(version, sequence + 1))
+    _write(path, KIND_DELTA, version, sequence + 1, _epoch(now), base["window_start"], base["window_end"],
+           max(max_pass_id, previous["max_pass_id"]), entries, removed)
+    return path
+
+
+# --- Lookup (kiosk side) ---------------------------------------------------------------------------------------------
+
+# A manifest opened from disk, memory-mapped and binary-searched in place, with its deltas applied on top in memory
+class LaneManifest:
+
+    def __init__(self, path, verify=True):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _unpack_header(self._map[:HEADER.size])
+
+        if header["kind"] != KIND_FULL:
+            raise ManifestError("Expected a full manifest, got a delta")
+        if verify:
+            with memoryview(self._map) as view:
+                checksum = zlib.crc32(view[HEADER.size:])
+            if checksum != header["checksum"]:
+                raise ManifestError("Manifest checksum mismatch")
+
+        self.version = header["version"]
+        self.sequence = 0
+        self.generated_at = header["generated_at"]
+        self.window_start = header["window_start"]
+        self.window_end = header["window_end"]
+        self.record_count = header["record_count"]
+        self._records_at = HEADER.size
+        self._names_at = HEADER.size + self.record_count * RECORD.size + header["removed_count"] * REMOVED.size
+
+        self._added = {}  # plate bytes -> [(pass id, valid from, expires, names)] from deltas
+        self._removed = set()  # pass ids consumed since the manifest was cut
+
+    # Apply the next delta file; deltas must be applied in sequence
+    def apply_delta(self, path):
+        with open(path, "rb") as fp:
+            data = fp.read()
+
+        header = _unpack_header(data)
+        if header["kind"] != KIND_DELTA or header["version"] != self.version:
+            raise ManifestError(f"Delta does not belong to manifest {self.version}")
+        if header["sequence"] != self.sequence + 1:
+            raise ManifestError(f"Expected delta {self.sequence + 1}, got {header['sequence']}")
+        if zlib.crc32(data[HEADER.size:]) != header["checksum"]:
+            raise ManifestError("Delta checksum mismatch")
+
+        removed_at = HEADER.size + header["record_count"] * RECORD.size
+        names_at = removed_at + header["removed_count"] * REMOVED.size
+
+        for i in range(header["record_count"]):
+            plate, pass_id, valid_from, expires, offset, length = RECORD.unpack_from(data, HEADER.size + i * RECORD.size)
+            names = data[names_at + offset:names_at + offset + length]
+            self._added.setdefault(plate, []).append((pass_id, valid_from, expires, names))
+
+        for i in range(header["removed_count"]):
+            self._removed.add(REMOVED.unpack_from(data, removed_at + i * REMOVED.size)[0])
+
+        self.sequence = header["sequence"]
+        self.generated_at = header["generated_at"]
+
+    # The earliest-expiring pass of a plate valid at now (epoch seconds, default: current time; valid_from <= now < expires),
+    # as the checkpoint resolver returns it, or None when the manifest has no such pass (ask the backend if reachable)
+    def lookup(self, plate, now=None):
+        now = time.time() if now is None else now
+        key = canonicalize_plate(plate).encode("ascii").ljust(PLATE_BYTES, b"\0")
+
+        best = None
+        i = self._first_record(key)
+        while i < self.record_count:
+            plate, pass_id, valid_from, expires, offset, length = RECORD.unpack_from(self._map, self._records_at + i * RECORD.size)
+            if plate != key:
+                break
+            i += 1
+            if valid_from <= now < expires and pass_id not in self._removed:
+                best = (expires, pass_id, self._map[self._names_at + offset:self._names_at + offset + length])
+                break  # records of a plate are sorted by expiry
+
+        for pass_id, valid_from, expires, names in self._added.get(key, ()):
+            if valid_from <= now < expires and pass_id not in self._removed and (best is None or (expires, pass_id) < best[:2]):
+                best = (expires, pass_id, names)
+
+        if best is None:
+            return None
+
+        travellers = []
+        if best[2]:
+            for traveller in best[2].decode("utf-8").split(TRAVELLER_SEP):
+                first_name, last_name = traveller.split(FIELD_SEP)
+                travellers.append({"first_name": first_name, "last_name": last_name})
+
+        return {"status": "success", "pass_id": best[1], "travellers": travellers}
+
+    # Index of the first record whose plate is >= key, binary-searched on the mapped file
+    def _first_record(self, key):
+        lo, hi = 0, self.record_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = self._records_at + mid * RECORD.size
+            if self._map[at:at + PLATE_BYTES] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+if __name__ == '__main__':
+
+    import argparse
+    from app import app
+
+    # Cron-style generation, e.g. "build" nightly and "delta" every minute
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["build", "delta"])
+    args = parser.parse_args()
+
+    with app.app_context():
+        folder = app.config['LANE_MANIFEST_FOLDER']
+        if args.command == "build":
+            print(build_manifest(folder, timedelta(hours=app.config['LANE_MANIFEST_WINDOW_HOURS'])))
+        else:
+            print(build_delta(folder) or "No changes since the last delta")
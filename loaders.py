@@ -0,0 +1,153 @@
+from sqlalchemy import func, select, union_all
+from db_instance import db
+from models import UserSensitiveInformation, Pass, PassTraveller, ArchivedPass, ArchivedPassTraveller, Preset, PresetTraveller
+from serialization import TRAVELLER_ROW
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+# Parse ?limit=&after= pagination arguments; returns (limit, after) or raises ValueError
+def parse_page_args(args):
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    after = args.get("after")
+    after = int(after) if after not in (None, "") else None
+
+    if limit < 1:
+        raise ValueError("limit must be positive")
+
+    return min(limit, MAX_PAGE_SIZE), after
+
+
+# One page of a user's passes ordered by pass_id, keyset-paginated with "after" (the last pass_id seen)
+# Live and archived passes are read together (pass ids are unique across both tables, see pass_archive.py)
+# Returns (rows, next_cursor), next_cursor is None on the last page
+def load_user_passes(user_id, limit=DEFAULT_PAGE_SIZE, after=None, utilized=None):
+
+    def passes_from(table):
+        query = (
+            select(table.pass_id, table.pass_date, table.expiry_datetime, table.pass_utilized)
+            .where(table.creator_user_id == user_id)
+        )
+
+        if utilized is not None:
+            query = query.where(table.pass_utilized == utilized)
+
+        if after is not None:
+            query = query.where(table.pass_id > after)
+
+        return query
+
+    # Fetch one extra row to know whether another page exists
+    passes = union_all(passes_from(Pass), passes_from(ArchivedPass))
+    rows = db.session.execute(passes.order_by(passes.selected_columns.pass_id).limit(limit + 1)).all()
+
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].pass_id
+    return rows, None
+
+
+# Travellers of many passes (live or archived) in one query, grouped in memory as {pass_id: [traveller dicts]}
+def load_pass_travellers(pass_ids):
+    travellers_by_pass = {pass_id: [] for pass_id in pass_ids}
+
+    if not pass_ids:
+        return travellers_by_pass
+
+    def travellers_from(table):
+        return (
+            select(
+                table.pass_traveller_id,
+                table.pass_id,
+                UserSensitiveInformation.user_id,
+                UserSensitiveInformation.first_name,
+                UserSensitiveInformation.middle_name,
+                UserSensitiveInformation.last_name,
+                UserSensitiveInformation.passport_number
+            )
+            .join(UserSensitiveInformation, UserSensitiveInformation.user_id == table.user_id)
+            .where(table.pass_id.in_(pass_ids))
+        )
+
+    travellers = union_all(travellers_from(PassTraveller), travellers_from(ArchivedPassTraveller))
+    rows = db.session.execute(travellers.order_by(travellers.selected_columns.pass_traveller_id)).all()
+
+    if rows:
+        render = TRAVELLER_ROW.renderer(rows[0])
+        for t in rows:
+            travellers_by_pass[t.pass_id].append(render(t))
+
+    return travellers_by_pass
+
+
+# A user's presets with their passenger counts, aggregated in one GROUP BY query
+def load_user_presets_with_counts(user_id):
+    return (
+        db.session.query(
+            Preset.preset_id,
+            Preset.preset_name,
+            func.count(PresetTraveller.preset_traveller_id).label("passenger_count")
+        )
+        .outerjoin(PresetTraveller, PresetTraveller.preset_id == Preset.preset_id)
+        .filter(Preset.user_id == user_id)
+        .group_by(Preset.preset_id, Preset.preset_name)
+        .order_by(Preset.preset_id)
+        .all()
+    )
+
+
+# A user's presets with their members from a single join, as a list of {preset_id, preset_name, users}
+def load_user_presets_with_members(user_id):
+    rows = (
+        db.session.query(
+            Preset.preset_id,
+            Preset.preset_name,
+            UserSensitiveInformation.user_id,
+            UserSensitiveInformation.first_name,
+            UserSensitiveInformation.middle_name,
+            UserSensitiveInformation.last_name,
+            UserSensitiveInformation.passport_number
+        )
+        .outerjoin(PresetTraveller, PresetTraveller.preset_id == Preset.preset_id)
+        .outerjoin(UserSensitiveInformation, UserSensitiveInformation.user_id == PresetTraveller.user_id)
+        .filter(Preset.user_id == user_id)
+        .order_by(Preset.preset_id, PresetTraveller.preset_traveller_id)
+        .all()
+    )
+
+    # Group member rows under their preset (a preset without members yields one row with no user)
+    presets = {}
+    render = TRAVELLER_ROW.renderer(rows[0]) if rows else None
+    for r in rows:
+        preset = presets.get(r.preset_id)
+        if preset is None:
+            preset = presets[r.preset_id] = {"preset_id": r.preset_id, "preset_name": r.preset_name, "users": []}
+
+        if r.user_id is not None:
+            preset["users"].append(render(r))
+
+    return list(presets.values())
+
+
+# Users for a list of passport numbers in one IN query, as {passport_number: row}
+# Passport numbers with no matching user are simply absent from the result
+def load_users_by_passport(passport_numbers):
+    passport_numbers = {p for p in passport_numbers if p}
+
+    if not passport_numbers:
+        return {}
+
+    rows = (
+        db.session.query(
+            UserSensitiveInformation.user_id,
+            UserSensitiveInformation.first_name,
+            UserSensitiveInformation.middle_name,
+            UserSensitiveInformation.last_name,
+            UserSensitiveInformation.passport_number
+        )
+        .filter(UserSensitiveInformation.passport_number.in_(passport_numbers))
+        .all()
+    )
+
+    return {r.passport_number: r for r in rows}
@@ -0,0 +1,267 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from plate_utils import canonicalize_plate, fuzzy_keys, SEPARATORS
+
+# Versioned schema migrations for existing databases
+# Each migration is (version, description, function(connection)) and runs once, in order, inside a transaction.
+# Fresh databases are created from models.py and stamped with the latest version instead.
+
+
+# Raised when a migration would have to destroy or guess at data; nothing of the failing migration is applied
+class MigrationError(Exception):
+    pass
+
+
+# 1: Add Vehicle.canonical_plate to an existing database, backfill it and index it
+# Vehicles whose plates only differ by case or separators ("SKR 9859-E", "skr9859e") are the same plate entered twice
+# and are merged into the oldest vehicle row. Plates that only collide through the O->0 / I->1 OCR fold ("SO1", "S01")
+# may be different cars: the migration stops and lists them so they can be resolved by hand.
+def add_canonical_plate(connection):
+
+    # Remember the first vehicle seen for each canonical plate and the unfolded plate it was entered as
+    vehicles = connection.execute(text("SELECT vehicle_id, vehicle_number FROM vehicle ORDER BY vehicle_id")).all()
+    keep = {}
+    duplicates = []
+    collisions = []
+
+    for vehicle_id, vehicle_number in vehicles:
+        canonical = canonicalize_plate(vehicle_number)
+        unfolded = SEPARATORS.sub('', vehicle_number.upper())
+
+        if canonical not in keep:
+            keep[canonical] = (vehicle_id, vehicle_number, unfolded)
+        elif keep[canonical][2] == unfolded:
+            duplicates.append((vehicle_id, keep[canonical][0]))
+        else:
+            collisions.append(f"{keep[canonical][1]!r} (vehicle {keep[canonical][0]}) and {vehicle_number!r} (vehicle {vehicle_id})")
+
+    # Checked before anything is changed, so an aborted migration leaves the database as it was
+    if collisions:
+        raise MigrationError(
+            "Plates that only differ by O/0 or I/1 would share a canonical plate, rename or merge them first: "
+            + "; ".join(collisions)
+        )
+
+    columns = [c['name'] for c in inspect(connection).get_columns('vehicle')]
+    if 'canonical_plate' not in columns:
+        connection.execute(text("ALTER TABLE vehicle ADD COLUMN canonical_plate VARCHAR(20)"))
+
+    # Same plate entered twice: repoint its owners to the kept vehicle, then remove it
+    for vehicle_id, keep_id in duplicates:
+        connection.execute(
+            text("UPDATE user_vehicle SET vehicle_id = :keep_id WHERE vehicle_id = :vehicle_id"),
+            {"keep_id": keep_id, "vehicle_id": vehicle_id}
+        )
+        connection.execute(text("DELETE FROM vehicle WHERE vehicle_id = :vehicle_id"), {"vehicle_id": vehicle_id})
+
+    # An owner of both duplicates now has two links to the kept vehicle, keep the oldest
+    # Only the merged vehicles are touched, links to any other vehicle are left exactly as they were
+    for keep_id in sorted({keep_id for _, keep_id in duplicates}):
+        connection.execute(
+            text(
+                "DELETE FROM user_vehicle WHERE vehicle_id = :keep_id AND user_vehicle_id NOT IN"
+                " (SELECT MIN(user_vehicle_id) FROM user_vehicle WHERE vehicle_id = :keep_id GROUP BY user_id)"
+            ),
+            {"keep_id": keep_id}
+        )
+
+    for canonical, (vehicle_id, _, _) in keep.items():
+        connection.execute(
+            text("UPDATE vehicle SET canonical_plate = :canonical WHERE vehicle_id = :vehicle_id"),
+            {"canonical": canonical, "vehicle_id": vehicle_id}
+        )
+
+    connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_vehicle_canonical_plate ON vehicle (canonical_plate)"))
+
+    return {"backfilled": len(keep), "merged": len(duplicates)}
+
+
+# 2: Composite and covering indexes on the hot foreign keys (see __table_args__ in models.py)
+def add_hot_foreign_key_indexes(connection):
+
+    # Single-column indexes superseded by the composites below
+    for name in ("ix_user_vehicle_vehicle_id", "ix_pass_traveller_pass_id"):
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    statements = [
+        "CREATE INDEX IF NOT EXISTS ix_user_vehicle_vehicle_user ON user_vehicle (vehicle_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_user_vehicle_user_vehicle ON user_vehicle (user_id, vehicle_id)",
+        "CREATE INDEX IF NOT EXISTS ix_pass_creator_expiry ON pass (creator_user_id, expiry_datetime)",
+        "CREATE INDEX IF NOT EXISTS ix_pass_creator_utilized_date ON pass (creator_user_id, pass_utilized, pass_date)",
+        "CREATE INDEX IF NOT EXISTS ix_pass_expiry ON pass (expiry_datetime)",
+        "CREATE INDEX IF NOT EXISTS ix_pass_traveller_pass_user ON pass_traveller (pass_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_pass_traveller_user_pass ON pass_traveller (user_id, pass_id)",
+        "CREATE INDEX IF NOT EXISTS ix_preset_user_id ON preset (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_preset_traveller_preset_user ON preset_traveller (preset_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_preset_traveller_user_preset ON preset_traveller (user_id, preset_id)",
+        "CREATE INDEX IF NOT EXISTS ix_user_traveller_creator_traveller ON user_traveller (creator_user_id, traveller_id)",
+        "CREATE INDEX IF NOT EXISTS ix_user_traveller_traveller ON user_traveller (traveller_id)",
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+    # Refresh planner statistics for the new indexes
+    connection.execute(text("ANALYZE"))
+
+
+# 3: Fuzzy plate index (models.PlateFuzzyKey) for OCR-tolerant matching, backfilled from every vehicle
+def add_plate_fuzzy_index(connection, batch=10_000):
+
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS plate_fuzzy_key ("
+        " key VARCHAR(20) NOT NULL,"
+        " vehicle_id INTEGER NOT NULL REFERENCES vehicle (vehicle_id),"
+        " PRIMARY KEY (key, vehicle_id)) WITHOUT ROWID"
+    ))
+
+    last_id = 0
+    indexed = 0
+    while True:
+        vehicles = connection.execute(
+            text("SELECT vehicle_id, canonical_plate FROM vehicle WHERE vehicle_id > :last_id ORDER BY vehicle_id LIMIT :batch"),
+            {"last_id": last_id, "batch": batch}
+        ).all()
+        if not vehicles:
+            break
+
+        connection.execute(
+            text("INSERT OR IGNORE INTO plate_fuzzy_key (key, vehicle_id) VALUES (:key, :vehicle_id)"),
+            [{"key": key, "vehicle_id": vehicle_id} for vehicle_id, plate in vehicles for key in fuzzy_keys(plate)]
+        )
+        last_id = vehicles[-1][0]
+        indexed += len(vehicles)
+
+    return {"indexed": indexed}
+
+
+# 4: Rebuild pass and pass_traveller with AUTOINCREMENT keys
+# Without it SQLite hands out max(id) + 1, so ids freed by archiving the newest rows came back for new rows and then
+# clashed with the copies already in pass_archive/pass_traveller_archive. The sequences start above every archived id.
+AUTOINCREMENT_TABLES = [
+    ("pass", "pass_id", "pass_archive", (
+        "CREATE TABLE pass_rebuild ("
+        " pass_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,"
+        " creator_user_id INTEGER NOT NULL,"
+        " pass_date DATETIME NOT NULL,"
+        " expiry_datetime DATETIME NOT NULL,"
+        " pass_utilized BOOLEAN NOT NULL,"
+        " FOREIGN KEY(creator_user_id) REFERENCES user_sensitive_information (user_id))"
+    ), "pass_id, creator_user_id, pass_date, expiry_datetime, pass_utilized"),
+    ("pass_traveller", "pass_traveller_id", "pass_traveller_archive", (
+        "CREATE TABLE pass_traveller_rebuild ("
+        " pass_traveller_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,"
+        " pass_id INTEGER NOT NULL,"
+        " user_id INTEGER NOT NULL,"
+        " FOREIGN KEY(pass_id) REFERENCES pass (pass_id),"
+        " FOREIGN KEY(user_id) REFERENCES user_sensitive_information (user_id))"
+    ), "pass_traveller_id, pass_id, user_id"),
+]
+
+
+def add_pass_autoincrement(connection):
+    inspector = inspect(connection)
+
+    for table, id_column, archive_table, create, columns in AUTOINCREMENT_TABLES:
+        existing = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = :table"), {"table": table}).scalar()
+        if "AUTOINCREMENT" in existing.upper():
+            continue
+
+        # SQLite cannot add AUTOINCREMENT to a table: copy it into a new one and swap it in, indexes included
+        indexes = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"),
+            {"table": table}
+        ).scalars().all()
+
+        connection.execute(text(create))
+        connection.execute(text(f"INSERT INTO {table}_rebuild ({columns}) SELECT {columns} FROM {table}"))
+        connection.execute(text(f"DROP TABLE {table}"))
+        connection.execute(text(f"ALTER TABLE {table}_rebuild RENAME TO {table}"))
+        for index in indexes:
+            connection.execute(text(index))
+
+        highest = connection.execute(text(f"SELECT COALESCE(MAX({id_column}), 0) FROM {table}")).scalar()
+        if inspector.has_table(archive_table):
+            archived = connection.execute(text(f"SELECT COALESCE(MAX({id_column}), 0) FROM {archive_table}")).scalar()
+            highest = max(highest, archived)
+
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :table"), {"table": table})
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:table, :seq)"), {"table": table, "seq": highest})
+
+
+MIGRATIONS = [
+    (1, "Add canonical plate column", add_canonical_plate),
+    (2, "Add composite indexes on hot foreign keys", add_hot_foreign_key_indexes),
+    (3, "Add fuzzy plate index", add_plate_fuzzy_index),
+    (4, "Use AUTOINCREMENT keys for passes and pass travellers", add_pass_autoincrement),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version INTEGER PRIMARY KEY,"
+        " description VARCHAR(255) NOT NULL,"
+        " applied_at DATETIME NOT NULL)"
+    ))
+
+
+def current_version(connection):
+    _ensure_version_table(connection)
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def _record(connection, version, description):
+    connection.execute(
+        text("INSERT INTO schema_version (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+        {"version": version, "description": description, "applied_at": datetime.utcnow()}
+    )
+
+
+# Apply every pending migration, each in its own transaction; returns the versions applied
+def upgrade(engine):
+    applied = []
+
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+    for migration_version, description, migrate in MIGRATIONS:
+        if migration_version <= version:
+            continue
+
+        with engine.begin() as connection:
+            migrate(connection)
+            _record(connection, migration_version, description)
+        applied.append(migration_version)
+
+    return applied
+
+
+# Create a fresh database from the models, or bring an existing one up to date
+# Returns True when the database was freshly created (so callers can seed it)
+def create_or_upgrade(db):
+    engine = db.engine
+
+    if not inspect(engine).has_table('vehicle'):
+        db.create_all()
+        with engine.begin() as connection:
+            _ensure_version_table(connection)
+            for migration_version, description, _ in MIGRATIONS:
+                _record(connection, migration_version, description)
+        return True
+
+    # Tables added since the last start (no-op for existing ones), then pending migrations
+    db.create_all()
+    upgrade(engine)
+    return False
+
+
+if __name__ == '__main__':
+
+    from app import app
+    from db_instance import db
+
+    with app.app_context():
+        applied = upgrade(db.engine)
+        print(f"Applied migrations: {applied or 'none'}, schema at version {LATEST_VERSION}")
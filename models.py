@@ -1,7 +1,11 @@
 from datetime import datetime
 from db_instance import db
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import validates
+from plate_utils import canonicalize_plate, fuzzy_keys
 
 # assumption: people who wants to travel are already registered in the app
+# schema changes (columns, indexes) must also ship as a migration in migrations.py for existing databases
 
 '''
 # for login, but now firebase handles this, KIV whether we still need this
@@ -27,7 +31,42 @@ class UserSensitiveInformation(db.Model):
 # db for all vehicles
 class Vehicle(db.Model):
     vehicle_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    vehicle_number = db.Column(db.String(20), nullable=False, unique=True)
+    vehicle_number = db.Column(db.String(20), nullable=False, unique=True) # plate as entered by the user
+    canonical_plate = db.Column(db.String(20), nullable=False, unique=True, index=True) # normalized plate used for every lookup, see plate_utils.canonicalize_plate
+
+    # Keep the canonical plate in sync whenever the vehicle number is set
+    @validates('vehicle_number')
+    def _set_canonical_plate(self, key, vehicle_number):
+        self.canonical_plate = canonicalize_plate(vehicle_number)
+        return vehicle_number
+
+# Fuzzy plate index (see plate_utils.fuzzy_keys and plate_matcher.py), a few rows per vehicle kept in sync by the
+# Vehicle insert/update events below
+class PlateFuzzyKey(db.Model):
+    __tablename__ = 'plate_fuzzy_key'
+    key = db.Column(db.String(20), primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.vehicle_id'), primary_key=True)
+
+    # Clustered on (key, vehicle_id): a match is one index range per key
+    __table_args__ = {'sqlite_with_rowid': False}
+
+
+def _insert_fuzzy_keys(connection, vehicle):
+    connection.execute(PlateFuzzyKey.__table__.insert(), [
+        {"key": key, "vehicle_id": vehicle.vehicle_id} for key in fuzzy_keys(vehicle.canonical_plate)
+    ])
+
+
+@event.listens_for(Vehicle, "after_insert")
+def _index_new_vehicle(mapper, connection, vehicle):
+    _insert_fuzzy_keys(connection, vehicle)
+
+
+@event.listens_for(Vehicle, "after_update")
+def _reindex_vehicle(mapper, connection, vehicle):
+    if inspect(vehicle).attrs.canonical_plate.history.has_changes():
+        connection.execute(PlateFuzzyKey.__table__.delete().where(PlateFuzzyKey.vehicle_id == vehicle.vehicle_id))
+        _insert_fuzzy_keys(connection, vehicle)
 
 # database for a specific user's vehicle
 class UserVehicle(db.Model):
@@ -36,6 +75,12 @@ class UserVehicle(db.Model):
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.vehicle_id'), nullable=False) # get the vehicle we are referring to
     user_vehicle_model = db.Column(db.String(100), nullable=False)
 
+    # Covering indexes for vehicle -> owners (checkpoint) and user -> vehicles (vehicle list, cache invalidation)
+    __table_args__ = (
+        db.Index('ix_user_vehicle_vehicle_user', 'vehicle_id', 'user_id'),
+        db.Index('ix_user_vehicle_user_vehicle', 'user_id', 'vehicle_id'),
+    )
+
 '''
 # database for location (in case IDEMIA wants to expand to other countries)
 class Location(db.Model):
@@ -57,6 +102,15 @@ class Pass(db.Model):
     # destination_id = db.Column(db.Integer, db.ForeignKey('location.location_id'), nullable=False)
     pass_utilized = db.Column(db.Boolean, nullable=False, default=False) # whether the travellers have gone through checkpoint (T/F)
 
+    # Checkpoint lookups search a user's passes by expiry, the history screen by utilization and date,
+    # and the hot-plate cache warm-up scans passes valid right now by expiry
+    __table_args__ = (
+        db.Index('ix_pass_creator_expiry', 'creator_user_id', 'expiry_datetime'),
+        db.Index('ix_pass_creator_utilized_date', 'creator_user_id', 'pass_utilized', 'pass_date'),
+        db.Index('ix_pass_expiry', 'expiry_datetime'),
+        {'sqlite_autoincrement': True},  # ids are never reused, archived passes keep theirs (migration 4)
+    )
+
 
 # stores mapping info between pass and traveller
 class PassTraveller(db.Model):
@@ -64,21 +118,82 @@ class PassTraveller(db.Model):
     pass_id = db.Column(db.Integer, db.ForeignKey('pass.pass_id'), nullable=False) # the specific pass user created
     user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False) # user id of travellers in the pass // pull the users data from class UserSensitiveInformation table
 
+    # Covering indexes for pass -> travellers joins and traveller -> passes lookups
+    __table_args__ = (
+        db.Index('ix_pass_traveller_pass_user', 'pass_id', 'user_id'),
+        db.Index('ix_pass_traveller_user_pass', 'user_id', 'pass_id'),
+        {'sqlite_autoincrement': True},  # ids are never reused, archived travellers keep theirs (migration 4)
+    )
+
+# Passes that expired a while ago, moved out of pass/pass_traveller by the background sweep in pass_archive.py
+# so the checkpoint path only ever searches the small set of live passes. Rows keep their original ids;
+# the list endpoints read both tables (see loaders.py).
+class ArchivedPass(db.Model):
+    __tablename__ = 'pass_archive'
+    pass_id = db.Column(db.Integer, primary_key=True, autoincrement=False) # id the pass had in the pass table
+    creator_user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False)
+    pass_date = db.Column(db.DateTime, nullable=False)
+    expiry_datetime = db.Column(db.DateTime, nullable=False)
+    pass_utilized = db.Column(db.Boolean, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    # A user's passes (pagination by pass_id) and their history (utilized only)
+    __table_args__ = (
+        db.Index('ix_pass_archive_creator_pass', 'creator_user_id', 'pass_id'),
+        db.Index('ix_pass_archive_creator_utilized_pass', 'creator_user_id', 'pass_utilized', 'pass_id'),
+    )
+
+class ArchivedPassTraveller(db.Model):
+    __tablename__ = 'pass_traveller_archive'
+    pass_traveller_id = db.Column(db.Integer, primary_key=True, autoincrement=False) # id the row had in the pass_traveller table
+    pass_id = db.Column(db.Integer, db.ForeignKey('pass_archive.pass_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_pass_traveller_archive_pass_user', 'pass_id', 'user_id'),
+        db.Index('ix_pass_traveller_archive_user_pass', 'user_id', 'pass_id'),
+    )
+
 # stores preset info
 class Preset(db.Model):
     preset_id = db.Column(db.Integer, primary_key=True, autoincrement=True) # autonumber
     preset_name = db.Column(db.String(100), nullable=False) # name of the preset
-    user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False) # the user account that we are referring to, for all the presets he created
+    user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False, index=True) # the user account that we are referring to, for all the presets he created
 
 # stores all the travellers in the preset
 class PresetTraveller(db.Model):
     preset_traveller_id = db.Column(db.Integer, primary_key=True, autoincrement=True) # autonumber
     preset_id = db.Column(db.Integer, db.ForeignKey('preset.preset_id'), nullable=False) # gets the preset
     user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False) # references travelers in the pass, and gets the information from UserSensitiveInformation table
-    
+
+    # Covering indexes for preset -> travellers joins and traveller -> presets lookups
+    __table_args__ = (
+        db.Index('ix_preset_traveller_preset_user', 'preset_id', 'user_id'),
+        db.Index('ix_preset_traveller_user_preset', 'user_id', 'preset_id'),
+    )
+
 # Stores all travelers that the user has added (doesn't need to be related to preset/pass)
 class UserTraveller(db.Model):
     user_traveller_id = db.Column(db.Integer, primary_key=True, autoincrement=True) # autonumber
     creator_user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False) # User id of the particular user who adds travellers linked to their account
     traveller_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), nullable=False) # User id of the travellers that have been added
 
+    # A user's traveller list (and the duplicate check in add_traveller), and traveller -> creators lookups
+    __table_args__ = (
+        db.Index('ix_user_traveller_creator_traveller', 'creator_user_id', 'traveller_id'),
+        db.Index('ix_user_traveller_traveller', 'traveller_id'),
+    )
+
+
+# One row per pass consumed at a checkpoint lane, keyed by the lane's request id so a retried consume is idempotent
+class PassConsumption(db.Model):
+    request_id = db.Column(db.String(64), primary_key=True) # idempotency key sent by the lane
+    pass_id = db.Column(db.Integer, db.ForeignKey('pass.pass_id'), nullable=False, unique=True) # a pass is consumed at most once
+    lane = db.Column(db.String(50), nullable=True)
+    consumed_at = db.Column(db.DateTime, nullable=False)
+
+# Per-user data version, bumped in the same transaction as any write that changes what the user's read endpoints return
+# (used for ETags and conditional GETs, see data_versions.py)
+class UserDataVersion(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey(UserSensitiveInformation.user_id), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
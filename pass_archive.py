@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import delete, func, insert, literal, select
+
+from db_instance import db
+from models import Pass, PassTraveller, PassConsumption, ArchivedPass, ArchivedPassTraveller
+from pass_cache import utc_now
+
+
+# Moves passes that expired more than archive_after ago (with their travellers) from pass/pass_traveller into
+# pass_archive/pass_traveller_archive on a background thread, in small batches so lane writes are never held up
+# for long. The list endpoints read across both tables, so archiving is invisible to clients.
+class PassArchiver:
+
+    def __init__(self, archive_after=timedelta(days=1), batch_size=500, interval=300):
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+        self.interval = interval
+        self._app = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_sweep = None
+        self.archived = 0
+        self.sweeps = 0
+        self.errors = 0
+
+    def configure(self, archive_after=None, batch_size=None, interval=None):
+        if archive_after is not None:
+            self.archive_after = archive_after
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if interval is not None:
+            self.interval = interval
+
+    # Start the sweep thread once; called on the first request so it never runs before the tables exist
+    def start(self, app):
+        with self._lock:
+            if self._thread is None:
+                self._app = app
+                self._thread = threading.Thread(target=self._run, name="pass-archiver", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    self.sweep()
+            except Exception:
+                self.errors += 1
+                self._app.logger.exception("Pass archive sweep failed")
+            time.sleep(self.interval)
+
+    # Archive every pass expired before now - archive_after; returns the number of passes moved
+    def sweep(self, now=None):
+        cutoff = (now or utc_now()) - self.archive_after
+        moved = 0
+
+        while True:
+            count = self.archive_batch(cutoff)
+            moved += count
+            if count < self.batch_size:
+                break
+
+        self.sweeps += 1
+        self.archived += moved
+        self._last_sweep = utc_now()
+        return moved
+
+    # Move one batch of passes expired before cutoff in a single transaction; returns how many were moved
+    def archive_batch(self, cutoff):
+        with db.engine.begin() as connection:
+
+            # Both keys are AUTOINCREMENT (migration 4), so archived ids are never handed out again. The newest pass
+            # and the pass holding the newest traveller row still stay behind, so ids stay unique across the live and
+            # archive tables even on a database whose keys were ever max(id) + 1
+            max_pass_id = select(func.max(Pass.pass_id)).scalar_subquery()
+            newest_traveller_pass = select(PassTraveller.pass_id).where(
+                PassTraveller.pass_traveller_id == select(func.max(PassTraveller.pass_traveller_id)).scalar_subquery()
+            )
+
+            # Copying is the transaction's first statement, so the batch holds the write lock before reading anything
+            pass_ids = connection.execute(
+                insert(ArchivedPass).from_select(
+                    ["pass_id", "creator_user_id", "pass_date", "expiry_datetime", "pass_utilized", "archived_at"],
+                    select(Pass.pass_id, Pass.creator_user_id, Pass.pass_date, Pass.expiry_datetime, Pass.pass_utilized, literal(utc_now(), db.DateTime))
+                    .where(Pass.expiry_datetime <= cutoff, Pass.pass_id < max_pass_id, Pass.pass_id.not_in(newest_traveller_pass))
+                    .order_by(Pass.expiry_datetime)
+                    .limit(self.batch_size)
+                ).returning(ArchivedPass.pass_id)
+            ).scalars().all()
+
+            if not pass_ids:
+                return 0
+
+            connection.execute(insert(ArchivedPassTraveller).from_select(
+                ["pass_traveller_id", "pass_id", "user_id"],
+                select(PassTraveller.pass_traveller_id, PassTraveller.pass_id, PassTraveller.user_id)
+                .where(PassTraveller.pass_id.in_(pass_ids))
+            ))
+
+            # Lane idempotency records only matter while a consume can still be retried, long over for these passes
+            connection.execute(delete(PassConsumption).where(PassConsumption.pass_id.in_(pass_ids)))
+            connection.execute(delete(PassTraveller).where(PassTraveller.pass_id.in_(pass_ids)))
+            connection.execute(delete(Pass).where(Pass.pass_id.in_(pass_ids)))
+
+        return len(pass_ids)
+
+    def stats(self):
+        return {
+            "archived": self.archived,
+            "sweeps": self.sweeps,
+            "errors": self.errors,
+            "last_sweep": self._last_sweep.strftime("%Y-%m-%d %H:%M:%S") if self._last_sweep else None
+        }
+
+
+# Shared instance started by app.py
+pass_archiver = PassArchiver()
+
+
+if __name__ == '__main__':
+
+    from app import app
+
+    # One-off sweep, e.g. from cron when the background thread is disabled
+    with app.app_context():
+        print(f"Archived {pass_archiver.sweep()} expired passes")
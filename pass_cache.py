@@ -0,0 +1,277 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from db_instance import db
+from models import Vehicle, UserVehicle, Pass, PassTraveller, UserSensitiveInformation, UserDataVersion
+from plate_utils import canonicalize_plate
+
+
+# Pass dates and expiries are stored as naive UTC
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Cached results are handed out and stored as copies, so a caller editing its result never changes the cache
+def _copy_result(result):
+    return dict(result, travellers=[dict(traveller) for traveller in result["travellers"]])
+
+
+# Data versions of the given users (see data_versions.bump_user_versions), 0 for users never written
+def _user_versions(user_ids, chunk_size=500):
+    versions = dict.fromkeys(user_ids, 0)
+    user_ids = list(versions)
+
+    for start in range(0, len(user_ids), chunk_size):
+        for user_id, version in (
+            db.session.query(UserDataVersion.user_id, UserDataVersion.version)
+            .filter(UserDataVersion.user_id.in_(user_ids[start:start + chunk_size]))
+        ):
+            versions[user_id] = version
+
+    return versions
+
+
+# In-process map of canonical plate -> pre-resolved checkpoint result for passes valid right now
+# Every entry expires at its pass's expiry_datetime and is tagged with the users involved in the pass,
+# so writes touching those users or the vehicle can drop it.
+# Writes through other worker processes cannot reach this map, but every one of them bumps the data version of the
+# users involved; entries keep the versions they were read at and a hit re-reads them (one primary-key query).
+class HotPlateCache:
+
+    def __init__(self, max_entries=100_000, refresh_interval=timedelta(minutes=15)):
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self._entries = {}  # canonical plate -> (expires_at, result, {user_id: data version})
+        self._generation = 0  # bumped by every invalidation, see put()
+        self._lock = threading.Lock()
+        self._warmed_at = None
+        self._warming = False
+        self._replay = None  # invalidations seen while warm() loads rows, applied to the new map before it is swapped in
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # The map is rebuilt periodically so passes whose pass_date has just started are picked up
+    def needs_refresh(self, now=None):
+        now = now or utc_now()
+        return self._warmed_at is None or now - self._warmed_at >= self.refresh_interval
+
+    # Rebuild the map on a background thread when it is stale, one rebuild at a time
+    # Lane requests never wait for it: until the new map is swapped in they use the current one or the database
+    def refresh_in_background(self, app, now=None):
+        with self._lock:
+            if self._warming or not self.needs_refresh(now):
+                return
+            self._warming = True
+
+        threading.Thread(target=self._warm_in_background, args=(app, now), name="hot-plate-warm", daemon=True).start()
+
+    def _warm_in_background(self, app, now):
+        try:
+            with app.app_context():
+                self.warm(now)
+        except Exception:
+            app.logger.exception("Hot plate cache warm-up failed")
+        finally:
+            with self._lock:
+                self._warming = False
+
+    # Bulk-load every unused pass valid right now (pass_date <= now < expiry) with its travellers in one query
+    def warm(self, now=None):
+        now = now or utc_now()
+
+        with self._lock:
+            self._replay = []
+
+        try:
+            entries = self._load(now)
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+
+        with self._lock:
+            # A pass consumed (or a user changed) while the rows were loading may already be in them
+            for invalidation in self._replay:
+                for plate in self._stale(entries, *invalidation):
+                    del entries[plate]
+
+            self._replay = None
+            self._entries = entries
+            self._warmed_at = now
+
+    def _load(self, now):
+        rows = (
+            db.session.query(
+                Vehicle.canonical_plate,
+                Pass.pass_id,
+                Pass.creator_user_id,
+                Pass.expiry_datetime,
+                PassTraveller.user_id,
+                UserSensitiveInformation.first_name,
+                UserSensitiveInformation.last_name
+            )
+            .join(UserVehicle, UserVehicle.vehicle_id == Vehicle.vehicle_id)
+            .join(Pass, Pass.creator_user_id == UserVehicle.user_id)
+            .outerjoin(PassTraveller, PassTraveller.pass_id == Pass.pass_id)
+            .outerjoin(UserSensitiveInformation, UserSensitiveInformation.user_id == PassTraveller.user_id)
+            .filter(Pass.pass_date <= now, Pass.expiry_datetime > now, Pass.pass_utilized == False)
+            .order_by(Pass.expiry_datetime, Pass.pass_id, PassTraveller.pass_traveller_id)
+            .all()
+        )
+
+        # Rows are ordered by expiry, so the first pass seen per plate is the earliest-expiring one, matching resolve_checkpoint
+        entries = {}
+        for r in rows:
+            entry = entries.get(r.canonical_plate)
+
+            if entry is None:
+                entry = (r.expiry_datetime, {"status": "success", "pass_id": r.pass_id, "travellers": []}, {r.creator_user_id})
+                entries[r.canonical_plate] = entry
+            elif entry[1]["pass_id"] != r.pass_id:
+                continue
+
+            if r.first_name is not None:
+                entry[1]["travellers"].append({"first_name": r.first_name, "last_name": r.last_name})
+                entry[2].add(r.user_id)
+
+        # Respect the size cap, keeping the passes that stay valid the longest
+        if len(entries) > self.max_entries:
+            kept = sorted(entries.items(), key=lambda item: item[1][0], reverse=True)[:self.max_entries]
+            entries = dict(kept)
+
+        # Read in the same transaction as the rows, so the versions match what was loaded
+        versions = _user_versions(set().union(*(user_ids for _, _, user_ids in entries.values())))
+        return {
+            plate: (expires_at, result, {user_id: versions[user_id] for user_id in user_ids})
+            for plate, (expires_at, result, user_ids) in entries.items()
+        }
+
+    # Return the cached result for a plate, or None on a miss
+    def get(self, plate, now=None):
+        now = now or utc_now()
+        canonical = canonicalize_plate(plate)
+
+        with self._lock:
+            entry = self._entries.get(canonical)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # The pass has expired since it was cached
+            if entry[0] <= now:
+                del self._entries[canonical]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+        # Another worker process changed one of the users (consumed the pass, edited a traveller, linked the vehicle)
+        current = _user_versions(entry[2])
+
+        with self._lock:
+            if current != entry[2]:
+                if self._entries.get(canonical) is entry:
+                    del self._entries[canonical]
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return _copy_result(entry[1])
+
+    # Current invalidation generation; read it before resolving a plate and hand it to put()
+    @property
+    def generation(self):
+        return self._generation
+
+    # Cache a successful resolution until its pass expires
+    # Call it in the transaction that resolved the plate, so the data versions read here match the result.
+    # Nothing is cached when an invalidation ran since generation was read: the result may predate it.
+    def put(self, plate, result, expires_at, user_ids, generation):
+        canonical = canonicalize_plate(plate)
+        versions = _user_versions(user_ids)
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            if canonical not in self._entries and len(self._entries) >= self.max_entries:
+                self._evict_one()
+
+            self._entries[canonical] = (expires_at, _copy_result(result), versions)
+
+    # Drop expired entries first, otherwise the oldest inserted entry (dicts keep insertion order)
+    def _evict_one(self):
+        now = utc_now()
+        expired = [plate for plate, entry in self._entries.items() if entry[0] <= now]
+
+        if expired:
+            for plate in expired:
+                del self._entries[plate]
+            self.evictions += len(expired)
+        else:
+            del self._entries[next(iter(self._entries))]
+            self.evictions += 1
+
+    # Plates of entries to drop: the given plates, the entries of pass_id and the entries user_id travels on
+    @staticmethod
+    def _stale(entries, plates=(), pass_id=None, user_id=None):
+        stale = {plate for plate in plates if plate in entries}
+        if pass_id is not None or user_id is not None:
+            stale.update(plate for plate, entry in entries.items() if entry[1]["pass_id"] == pass_id or user_id in entry[2])
+        return stale
+
+    def _invalidate(self, plates=(), pass_id=None, user_id=None):
+        with self._lock:
+            self._generation += 1
+            if self._replay is not None:
+                self._replay.append((plates, pass_id, user_id))
+
+            for plate in self._stale(self._entries, plates, pass_id, user_id):
+                del self._entries[plate]
+                self.invalidations += 1
+
+    # A vehicle's owners changed (e.g. add_vehicle_to_user)
+    def invalidate_plate(self, plate):
+        self._invalidate(plates=[canonicalize_plate(plate)])
+
+    # A pass was consumed at a lane: its vehicles must resolve to the next valid pass, if any
+    def invalidate_pass(self, pass_id):
+        self._invalidate(pass_id=pass_id)
+
+    # A user's passes or profile changed: drop entries they travel on and entries for every vehicle they own
+    def invalidate_user(self, user_id):
+        owned_plates = [
+            plate for (plate,) in
+            db.session.query(Vehicle.canonical_plate)
+            .join(UserVehicle, UserVehicle.vehicle_id == Vehicle.vehicle_id)
+            .filter(UserVehicle.user_id == user_id)
+            .all()
+        ]
+
+        self._invalidate(plates=owned_plates, user_id=user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._generation += 1
+            self._warmed_at = None
+
+    # Counters exposed through /api/checkpoint/cache-stats
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "warmed_at": self._warmed_at.strftime("%Y-%m-%d %H:%M:%S") if self._warmed_at else None
+            }
+
+
+# Shared instance used by immigration_walkthrough and invalidated by the write endpoints in app.py
+hot_plate_cache = HotPlateCache()
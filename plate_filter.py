@@ -0,0 +1,275 @@
+import hashlib
+import math
+import os
+import struct
+import threading
+from datetime import timedelta
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from db_instance import db
+from models import Vehicle
+from pass_cache import utc_now
+from plate_utils import canonicalize_plate
+
+# Default on-disk location, next to the app database in the Flask instance folder
+DEFAULT_FILTER_PATH = os.environ.get("PLATE_FILTER_PATH", os.path.join("instance", "plate_filter.bin"))
+
+
+# Fixed-size Bloom filter over strings: no false negatives, false positives at about error_rate once capacity items are in
+# Bit positions come from one blake2b digest split into two 64-bit hashes (double hashing: h1 + i * h2)
+class BloomFilter:
+
+    MAGIC = b"BLM1"
+    HEADER = struct.Struct("<4sQIQQd")  # magic, bits, hashes, count, capacity, error rate
+
+    def __init__(self, capacity, error_rate=0.001, bits=None, hashes=None, data=None, count=0):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+
+        # Optimal sizing: m = -n ln p / (ln 2)^2 bits, k = m / n ln 2 hashes
+        self.bits = bits or max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.bits / self.capacity * math.log(2)))
+        self.data = data if data is not None else bytearray((self.bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def add(self, key):
+        data = self.data
+        for position in self._positions(key):
+            data[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        data = self.data
+        for position in self._positions(key):
+            if not data[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    # Expected false-positive rate at the current fill: (1 - e^(-kn/m))^k
+    def expected_error_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def to_bytes(self):
+        return self.HEADER.pack(self.MAGIC, self.bits, self.hashes, self.count, self.capacity, self.error_rate) + bytes(self.data)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        magic, bits, hashes, count, capacity, error_rate = cls.HEADER.unpack_from(blob)
+        data = bytearray(blob[cls.HEADER.size:])
+
+        if magic != cls.MAGIC or len(data) != (bits + 7) // 8:
+            raise ValueError("Not a Bloom filter file")
+
+        return cls(capacity, error_rate, bits=bits, hashes=hashes, data=data, count=count)
+
+
+# Bloom filter of every registered canonical plate, so the checkpoint rejects unknown vehicles without a query
+# The filter only ever grows (vehicles are never deleted), so a "no" is definite. It is persisted with the highest
+# vehicle id it covers; loading it and catching up on newer vehicles is one index range query instead of a full scan,
+# and the same catch-up every refresh_interval picks up vehicles registered through other worker processes.
+# The file also records which database it was built from, so one left behind by a recreated or restored database
+# is rebuilt instead of rejecting plates it has never seen.
+class PlateFilter:
+
+    FILE_HEADER = struct.Struct("<Q16s")  # highest vehicle id covered, database identity
+
+    def __init__(self, path=DEFAULT_FILTER_PATH, error_rate=0.001, min_capacity=100_000,
+                 refresh_interval=timedelta(seconds=5), save_interval=timedelta(minutes=5)):
+        self.path = path
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.refresh_interval = refresh_interval
+        self.save_interval = save_interval
+        self._filter = None
+        self._max_vehicle_id = 0
+        self._refreshed_at = None
+        self._saved_at = None
+        self._dirty = False
+        self._refreshing = False
+        self._lock = threading.Lock()  # guards the filter, held only to swap, add or snapshot it
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+        self.rejected = 0
+        self.passed = 0
+
+    def configure(self, path=None, error_rate=None, refresh_interval=None, save_interval=None):
+        if path is not None:
+            self.path = path
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        if save_interval is not None:
+            self.save_interval = save_interval
+
+    def needs_refresh(self, now=None):
+        now = now or utc_now()
+        return self._refreshed_at is None or now - self._refreshed_at >= self.refresh_interval
+
+    # Refresh on a background thread when due, one at a time; lane requests keep using the current filter
+    # (or, before it is loaded, the database) and never wait for a build, a catch-up or a save
+    def refresh_in_background(self, app, now=None):
+        with self._lock:
+            if self._refreshing or not self.needs_refresh(now):
+                return
+            self._refreshing = True
+
+        threading.Thread(target=self._refresh_in_background, args=(app, now), name="plate-filter-refresh", daemon=True).start()
+
+    def _refresh_in_background(self, app, now):
+        try:
+            with app.app_context():
+                self.refresh(now)
+        except Exception:
+            app.logger.exception("Plate filter refresh failed")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    # Load (or build) the filter on first use, then add vehicles registered since it was last brought up to date
+    # Queries and file I/O run outside self._lock, so add() and might_contain() are never held up by them
+    def refresh(self, now=None):
+        now = now or utc_now()
+
+        with self._refresh_lock:
+            if self._filter is None:
+                loaded = self._load()
+                self._swap(*(loaded or self._build()), saved=loaded is not None)
+
+            # Past capacity the error rate climbs quickly, size a new filter for twice the vehicles
+            elif self._filter.count > self._filter.capacity:
+                self._swap(*self._build(), saved=False)
+
+            # Vehicles committed after the build's snapshot all have higher ids, so this also covers them
+            rows = (
+                db.session.query(Vehicle.vehicle_id, Vehicle.canonical_plate)
+                .filter(Vehicle.vehicle_id > self._max_vehicle_id)
+                .order_by(Vehicle.vehicle_id)
+                .all()
+            )
+
+            with self._lock:
+                for vehicle_id, plate in rows:
+                    self._filter.add(plate)
+                    self._max_vehicle_id = vehicle_id
+                    self._dirty = True
+
+            if self._dirty and (self._saved_at is None or now - self._saved_at >= self.save_interval):
+                self._save(now)
+
+            self._refreshed_at = now
+
+    def _swap(self, bloom, max_vehicle_id, saved):
+        with self._lock:
+            self._filter = bloom
+            self._max_vehicle_id = max_vehicle_id
+            self._dirty = not saved
+            self._saved_at = utc_now() if saved else None
+
+    def _build(self):
+        vehicles = db.session.query(db.func.count(Vehicle.vehicle_id), db.func.max(Vehicle.vehicle_id)).one()
+        bloom = BloomFilter(max(self.min_capacity, 2 * vehicles[0]), self.error_rate)
+
+        for (plate,) in db.session.query(Vehicle.canonical_plate).yield_per(10_000):
+            bloom.add(plate)
+
+        return bloom, vehicles[1] or 0
+
+    # Fingerprint of the database a filter covering vehicles up to max_vehicle_id was built from: when the schema was
+    # first stamped (new for every created database) and the plate of that vehicle (gone or different after a restore)
+    @staticmethod
+    def _database_identity(max_vehicle_id):
+        try:
+            created = db.session.execute(text("SELECT applied_at FROM schema_version ORDER BY version LIMIT 1")).scalar()
+        except OperationalError:
+            db.session.rollback()
+            created = None
+
+        plate = db.session.query(Vehicle.canonical_plate).filter(Vehicle.vehicle_id == max_vehicle_id).scalar()
+        return hashlib.blake2b(f"{created}|{max_vehicle_id}|{plate}".encode("utf-8"), digest_size=16).digest()
+
+    # Returns (filter, max_vehicle_id), or None when there is no usable file for this database
+    def _load(self):
+        try:
+            with open(self.path, "rb") as fp:
+                blob = fp.read()
+            max_vehicle_id, identity = self.FILE_HEADER.unpack_from(blob)
+            bloom = BloomFilter.from_bytes(blob[self.FILE_HEADER.size:])
+        except (OSError, ValueError, struct.error):
+            return None
+
+        # A filter saved with another target error rate, or from another database, is rebuilt
+        if bloom.error_rate != self.error_rate or identity != self._database_identity(max_vehicle_id):
+            return None
+
+        return bloom, max_vehicle_id
+
+    # Written via a temporary file so a crash never leaves a partial filter behind
+    def _save(self, now):
+        with self._lock:
+            max_vehicle_id = self._max_vehicle_id
+            blob = self._filter.to_bytes()
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as fp:
+                fp.write(self.FILE_HEADER.pack(max_vehicle_id, self._database_identity(max_vehicle_id)))
+                fp.write(blob)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            raise
+
+        self._saved_at = now
+
+    # A vehicle was registered by this process (add_vehicle_to_user); no-op until the filter is loaded
+    def add(self, plate):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(canonicalize_plate(plate))
+                self._dirty = True
+
+    # False only when the plate is definitely not registered; True (maybe registered) until the filter is loaded
+    def might_contain(self, plate):
+        bloom = self._filter
+        if bloom is None:
+            return True
+
+        if canonicalize_plate(plate) in bloom:
+            self.passed += 1
+            return True
+
+        self.rejected += 1
+        return False
+
+    def stats(self):
+        bloom = self._filter
+        return {
+            "loaded": bloom is not None,
+            "plates": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "bytes": len(bloom.data) if bloom else 0,
+            "expected_error_rate": round(bloom.expected_error_rate(), 6) if bloom else None,
+            "rejected": self.rejected,
+            "passed": self.passed,
+            "refreshed_at": self._refreshed_at.strftime("%Y-%m-%d %H:%M:%S") if self._refreshed_at else None
+        }
+
+
+# Shared instance consulted by immigration_walkthrough and updated by add_vehicle_to_user in app.py
+plate_filter = PlateFilter()
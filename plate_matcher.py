@@ -0,0 +1,171 @@
+import math
+import threading
+import time
+
+from db_instance import db
+from models import Vehicle, PlateFuzzyKey
+from plate_utils import canonicalize_plate, fuzzy_keys, CONFUSION_CLASSES
+
+# Substitution costs for the weighted edit distance: characters OCR engines swap all the time are cheap,
+# characters that only look somewhat alike cost more, anything else (and every insertion or deletion) costs 1
+CONFUSION_COST = 0.3
+LOOKALIKE_COST = 0.6
+LOOKALIKES = ["MN", "MH", "HN", "KX", "EF", "PR", "38", "3B", "9G", "C0", "UJ", "WV", "YV"]
+
+SUBSTITUTION_COSTS = {}
+for group in CONFUSION_CLASSES:
+    for a in group:
+        for b in group:
+            if a != b:
+                SUBSTITUTION_COSTS[a, b] = CONFUSION_COST
+for a, b in LOOKALIKES:
+    SUBSTITUTION_COSTS.setdefault((a, b), LOOKALIKE_COST)
+    SUBSTITUTION_COSTS.setdefault((b, a), LOOKALIKE_COST)
+
+
+# Levenshtein distance with OCR-weighted substitutions; stops early and returns None once it must exceed max_cost
+def weighted_distance(a, b, max_cost=None):
+    if a == b:
+        return 0.0
+    if max_cost is not None and abs(len(a) - len(b)) > max_cost:
+        return None
+
+    costs = SUBSTITUTION_COSTS
+    previous = [float(j) for j in range(len(b) + 1)]
+
+    for i, ca in enumerate(a, 1):
+        current = [float(i)]
+        for j, cb in enumerate(b, 1):
+            substitution = previous[j - 1] if ca == cb else previous[j - 1] + costs.get((ca, cb), 1.0)
+            current.append(min(substitution, previous[j] + 1.0, current[j - 1] + 1.0))
+
+        if max_cost is not None and min(current) > max_cost:
+            return None
+        previous = current
+
+    distance = previous[-1]
+    return distance if max_cost is None or distance <= max_cost else None
+
+
+# Ranks registered vehicles against the recognizer's plate candidates, tolerating OCR misreads
+# Candidates come from the fuzzy plate index (one query, index range per key), are verified with the weighted
+# distance and scored as recognizer score * e^-cost. Verification stops at the latency budget, so a lane always
+# gets an answer in time; "complete" tells whether every candidate was checked.
+class PlateMatcher:
+
+    def __init__(self, max_cost=1.0, auto_accept=False, auto_accept_cost=0.6, ambiguity_ratio=0.55, budget_ms=25, limit=5, max_rows=500):
+        self.max_cost = max_cost
+        self.auto_accept = auto_accept
+        self.auto_accept_cost = auto_accept_cost
+        self.ambiguity_ratio = ambiguity_ratio
+        self.budget_ms = budget_ms
+        self.limit = limit
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.matched = 0
+        self.auto_accepted = 0
+        self.over_budget = 0
+
+    def configure(self, max_cost=None, auto_accept=None, auto_accept_cost=None, budget_ms=None, limit=None):
+        if max_cost is not None:
+            self.max_cost = max_cost
+        if auto_accept is not None:
+            self.auto_accept = auto_accept
+        if auto_accept_cost is not None:
+            self.auto_accept_cost = auto_accept_cost
+        if budget_ms is not None:
+            self.budget_ms = budget_ms
+        if limit is not None:
+            self.limit = limit
+
+    # candidates: [(plate, recognizer score)] as read. Returns (ranked matches, complete)
+    # Each match: {"vehicle_id", "vehicle_number", "canonical_plate", "read_as", "cost", "score"}
+    def match(self, candidates, limit=None, budget_ms=None):
+        started = time.perf_counter()
+        deadline = started + (self.budget_ms if budget_ms is None else budget_ms) / 1000
+
+        reads = {}
+        for plate, score in candidates:
+            canonical = canonicalize_plate(plate or "")
+            if canonical and score > reads.get(canonical, -1):
+                reads[canonical] = score
+
+        if not reads:
+            return [], True
+
+        keys = set()
+        for canonical in reads:
+            keys.update(fuzzy_keys(canonical))
+
+        rows = (
+            db.session.query(Vehicle.vehicle_id, Vehicle.vehicle_number, Vehicle.canonical_plate)
+            .join(PlateFuzzyKey, PlateFuzzyKey.vehicle_id == Vehicle.vehicle_id)
+            .filter(PlateFuzzyKey.key.in_(keys))
+            .distinct()
+            .limit(self.max_rows)
+            .all()
+        )
+
+        best = {}
+        complete = len(rows) < self.max_rows
+        for row in rows:
+            if time.perf_counter() > deadline:
+                complete = False
+                break
+
+            for canonical, score in reads.items():
+                cost = weighted_distance(canonical, row.canonical_plate, self.max_cost)
+                if cost is None:
+                    continue
+
+                match_score = score * math.exp(-cost)
+                if row.vehicle_id not in best or match_score > best[row.vehicle_id]["score"]:
+                    best[row.vehicle_id] = {
+                        "vehicle_id": row.vehicle_id,
+                        "vehicle_number": row.vehicle_number,
+                        "canonical_plate": row.canonical_plate,
+                        "read_as": canonical,
+                        "cost": round(cost, 2),
+                        "score": round(match_score, 4)
+                    }
+
+        ranked = sorted(best.values(), key=lambda m: (-m["score"], m["cost"], m["canonical_plate"]))[:limit or self.limit]
+
+        with self._lock:
+            self.lookups += 1
+            self.matched += bool(ranked)
+            self.over_budget += not complete
+
+        return ranked, complete
+
+    # The top match when it is cheap enough (confusion-level misreads) and clearly ahead of the runner-up, else None
+    def clear_match(self, ranked):
+        if not ranked or ranked[0]["cost"] > self.auto_accept_cost:
+            return None
+        if len(ranked) > 1 and ranked[1]["score"] > ranked[0]["score"] * self.ambiguity_ratio:
+            return None
+        return ranked[0]
+
+    # The match to resolve without an officer: the clear match, only when auto_accept is enabled
+    # A confusion-level match can still be another car (an unregistered plate one 8/B away from a registered one)
+    def accept(self, ranked):
+        match = self.clear_match(ranked) if self.auto_accept else None
+
+        if match is not None:
+            with self._lock:
+                self.auto_accepted += 1
+        return match
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "matched": self.matched,
+                "auto_accepted": self.auto_accepted,
+                "over_budget": self.over_budget
+            }
+
+
+# Shared instance used by immigration_walkthrough_fuzzy and /api/checkpoint/match
+plate_matcher = PlateMatcher()
@@ -0,0 +1,297 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from recognition_cache import image_digest, recognition_cache
+from image_preprocess import image_preprocessor
+
+API_URL = os.environ.get("PLATE_RECOGNIZER_URL", "https://api.platerecognizer.com/v1/plate-reader/") # This is the PlateRecognizer API Url
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# Raised when PlateRecognizer could not be reached or kept failing after all retries
+class RecognitionError(Exception):
+
+    def __init__(self, message, status_code=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+# Read an image given as a path, raw bytes or a file-like object into bytes, so retries can resend it
+def read_image_bytes(image):
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+
+    if isinstance(image, (str, os.PathLike)):
+        with open(image, "rb") as fp:
+            return fp.read()
+
+    # File-like object (e.g. werkzeug FileStorage stream), rewound if possible
+    if hasattr(image, "seek"):
+        image.seek(0)
+    return image.read()
+
+
+# Turn the PlateRecognizer JSON into the legacy string result used by the upload pages
+def plate_from_response(data):
+    if data.get('results'):
+        # Extract license plate from the response
+        return data['results'][0]['plate']
+
+    return "No license plate detected."
+
+
+# All plate readings of the best detection with their scores: [(plate, score)]
+# The reported plate (plate_from_response) comes first, then the alternatives PlateRecognizer lists under
+# "candidates", best first
+def plate_candidates_from_response(data):
+    if not data.get('results'):
+        return []
+
+    result = data['results'][0]
+    alternatives = [(c['plate'], c.get('score', 0.0)) for c in result.get('candidates', []) if c.get('plate')]
+    candidates = [(result['plate'], result.get('score', 1.0))] + sorted(alternatives, key=lambda c: -c[1])
+
+    seen = set()
+    unique = []
+    for plate, score in candidates:
+        if plate.upper() not in seen:
+            seen.add(plate.upper())
+            unique.append((plate, score))
+    return unique
+
+
+# Pooled, retrying client for the PlateRecognizer API
+class PlateRecognizerClient:
+
+    def __init__(self, token, api_url=API_URL, connect_timeout=3.05, read_timeout=10, max_retries=3,
+                 backoff_base=0.25, backoff_cap=4.0, pool_size=20, deadline=15.0, cache=None, preprocessor=None):
+        self.api_url = api_url
+        self.cache = cache  # optional RecognitionCache, repeated frames then skip the network
+        self.preprocessor = preprocessor  # optional ImagePreprocessor, downscales/crops frames before upload
+        self._stats_lock = threading.Lock()
+        self.api_calls = 0
+        self.api_seconds = 0.0
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.deadline = deadline  # seconds for a whole recognition, attempts and backoff included
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        # One session per client keeps TLS connections alive between uploads
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Token {token}"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # "Full jitter" exponential backoff: random delay in [0, min(cap, base * 2^attempt)]
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    # Delay before the next attempt after error e, or None when it must not be retried: not retryable, out of
+    # attempts, or the backoff plus a connect would run past the deadline (time.monotonic() value)
+    def retry_delay(self, e, attempt, deadline_at):
+        if not e.retryable or attempt == self.max_retries:
+            return None
+
+        delay = self.backoff_delay(attempt)
+        if time.monotonic() + delay + self.timeout[0] > deadline_at:
+            return None
+        return delay
+
+    # One HTTP attempt; returns the decoded JSON or raises RecognitionError
+    # The read timeout is cut to what is left before deadline_at, so retries never outlast the deadline
+    def _attempt(self, payload, deadline_at=None):
+        timeout = self.timeout
+        if deadline_at is not None:
+            timeout = (timeout[0], max(0.1, min(timeout[1], deadline_at - time.monotonic())))
+
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.api_url, files={"upload": payload}, timeout=timeout)
+        except requests.ConnectionError as e:
+            # Includes ConnectTimeout: the frame never reached PlateRecognizer, sending it again is safe
+            raise RecognitionError(f"Error: {e}", retryable=True)
+        except requests.Timeout as e:
+            # Read timeout: the frame was delivered and may already be recognized (and billed), do not resend it
+            raise RecognitionError(f"Error: {e}")
+        finally:
+            with self._stats_lock:
+                self.api_calls += 1
+                self.api_seconds += time.perf_counter() - started
+
+        # If request was successful
+        if response.status_code == 200 or response.status_code == 201:
+            try:
+                return response.json()
+            except ValueError:
+                raise RecognitionError(f"Error: {response.status_code}, invalid JSON response", status_code=response.status_code)
+
+        raise RecognitionError(
+            f"Error: {response.status_code}, {response.text}",
+            status_code=response.status_code,
+            retryable=response.status_code in RETRY_STATUS_CODES
+        )
+
+    # Send an image and return the full PlateRecognizer JSON, retrying transient failures
+    # The cache is keyed on the original frame, so a hit also skips preprocessing
+    def recognize(self, image, lane=None):
+        payload = read_image_bytes(image)
+
+        digest = None
+        if self.cache is not None:
+            digest = image_digest(payload)
+            cached = self.cache.get(digest)
+            if cached is not None:
+                return cached
+
+        if self.preprocessor is not None:
+            payload = self.preprocessor.process(payload, lane)
+
+        deadline_at = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            try:
+                data = self._attempt(payload, deadline_at)
+                break
+            except RecognitionError as e:
+                delay = self.retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+        if digest is not None:
+            self.cache.put(digest, data)
+        return data
+
+    # Legacy string result: the plate, "No license plate detected." or "Error: ..."
+    def recognize_plate(self, image, lane=None):
+        try:
+            return plate_from_response(self.recognize(image, lane))
+        except RecognitionError as e:
+            return str(e)
+
+    # Upload counters, read together so the average is consistent while lanes are recognizing
+    def api_stats(self):
+        with self._stats_lock:
+            return {
+                "api_calls": self.api_calls,
+                "avg_api_latency_ms": round(self.api_seconds / self.api_calls * 1000, 2) if self.api_calls else None
+            }
+
+    def close(self):
+        self.session.close()
+
+
+# asyncio variant that keeps up to max_in_flight recognitions running at once
+# HTTP calls run on a dedicated thread pool sharing the pooled session, backoff sleeps are awaited
+class AsyncPlateRecognizerClient:
+
+    def __init__(self, token, max_in_flight=64, **client_options):
+        client_options.setdefault("pool_size", max_in_flight)
+        self.client = PlateRecognizerClient(token, **client_options)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="plate-recognizer")
+        self.max_in_flight = max_in_flight
+        self._semaphore = None
+
+    async def recognize(self, image, lane=None):
+        loop = asyncio.get_running_loop()
+
+        # Created lazily so the semaphore belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        payload = read_image_bytes(image)
+        cache = self.client.cache
+
+        # Hashing the frame and the cache's SQLite lookup run on the thread pool, not on the event loop
+        digest = None
+        if cache is not None:
+            digest = await loop.run_in_executor(self.executor, image_digest, payload)
+            cached = await loop.run_in_executor(self.executor, cache.get, digest)
+            if cached is not None:
+                return cached
+
+        # Preprocessing already runs on a process pool, wait for it without blocking the loop
+        if self.client.preprocessor is not None:
+            payload = await loop.run_in_executor(self.executor, self.client.preprocessor.process, payload, lane)
+
+        async with self._semaphore:
+            deadline_at = time.monotonic() + self.client.deadline
+            for attempt in range(self.client.max_retries + 1):
+                try:
+                    data = await loop.run_in_executor(self.executor, self.client._attempt, payload, deadline_at)
+                    break
+                except RecognitionError as e:
+                    delay = self.client.retry_delay(e, attempt, deadline_at)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+
+        if digest is not None:
+            await loop.run_in_executor(self.executor, cache.put, digest, data)
+        return data
+
+    async def recognize_plate(self, image, lane=None):
+        try:
+            return plate_from_response(await self.recognize(image, lane))
+        except RecognitionError as e:
+            return str(e)
+
+    # Recognize many images concurrently, results are returned in input order
+    async def recognize_many(self, images):
+        return await asyncio.gather(*(self.recognize_plate(image) for image in images))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+
+# One shared client per token, created on first use and backed by the shared recognition cache and preprocessor
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token):
+    with _clients_lock:
+        if token not in _clients:
+            _clients[token] = PlateRecognizerClient(token, cache=recognition_cache, preprocessor=image_preprocessor)
+        return _clients[token]
+
+
+# One shared async client per token for the ASGI lane service, sharing the recognition cache and preprocessor
+_async_clients = {}
+
+
+def get_async_client(token, max_in_flight=64):
+    with _clients_lock:
+        if token not in _async_clients:
+            _async_clients[token] = AsyncPlateRecognizerClient(
+                token, max_in_flight=max_in_flight, cache=recognition_cache, preprocessor=image_preprocessor
+            )
+        return _async_clients[token]
+
+
+# Function to recognize license plate using PlateRecognizer API
+def recognize_license_plate(image, token, lane=None):
+    return get_client(token).recognize_plate(image, lane)
+
+
+# Threads used to run many recognitions of one request concurrently (shares the pooled session)
+_batch_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="plate-recognizer-batch")
+
+
+# Recognize several frames concurrently; returns the legacy string results in input order
+def recognize_license_plates(images, token, lanes=None):
+    lanes = lanes or [None] * len(images)
+    client = get_client(token)
+    return list(_batch_executor.map(client.recognize_plate, images, lanes))
@@ -0,0 +1,78 @@
+# Local stand-in for the PlateRecognizer API, used by benchmarks and local testing
+#
+# Usage: python plate_recognizer_stub.py [--port 8081] [--plate SKR9859E] [--latency 0.2] [--error-rate 0.0] [--bandwidth 0]
+# Then point the app at it: PLATE_RECOGNIZER_URL=http://127.0.0.1:8081/v1/plate-reader/ python app.py
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# bandwidth (bytes/s, 0 = unlimited) simulates the upload link, so payload size shows up in latency
+def make_handler(plate, latency, error_rate, bandwidth=0):
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling can be observed
+        disable_nagle_algorithm = True  # avoid delayed-ACK stalls on kept-alive connections
+
+        def do_POST(self):
+            # Drain the multipart body, the stub does not look at the image
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+
+            time.sleep(latency + (length / bandwidth if bandwidth else 0))
+
+            if random.random() < error_rate:
+                self.send_json(503, {"detail": "Stub: service unavailable"})
+                return
+
+            self.server.requests_served += 1
+            self.send_json(201, {
+                "processing_time": latency * 1000,
+                "results": [{
+                    "plate": plate.lower(),
+                    "score": 0.9,
+                    "candidates": [{"plate": plate.lower(), "score": 0.9}],
+                    "box": {"xmin": 0, "ymin": 0, "xmax": 10, "ymax": 10}
+                }]
+            })
+
+        def send_json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+# Start the stub on a background thread; returns the server and the API url to use
+def start_stub_server(port=0, plate="SKR9859E", latency=0.0, error_rate=0.0, bandwidth=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(plate, latency, error_rate, bandwidth))
+    server.daemon_threads = True
+    server.requests_served = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/plate-reader/"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--plate", default="SKR9859E")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.plate, args.latency, args.error_rate, args.bandwidth))
+    server.requests_served = 0
+    print(f"PlateRecognizer stub listening on http://127.0.0.1:{args.port}/v1/plate-reader/")
+    server.serve_forever()
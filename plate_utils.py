@@ -0,0 +1,39 @@
+import re
+
+# Characters that separate plate groups on real plates or in OCR output (spaces, dashes, dots, etc.)
+SEPARATORS = re.compile(r'[^0-9A-Z]')
+
+# Common OCR confusions folded to a single form, letters are folded onto the digit they resemble
+OCR_FOLDS = str.maketrans({
+    'O': '0',
+    'I': '1',
+})
+
+
+# Canonical form of a license plate used for all lookups: "skr 9859-e" -> "SKR9859E", "SG0 1I2" -> "SG0112"
+def canonicalize_plate(plate):
+    if plate is None:
+        return None
+
+    plate = SEPARATORS.sub('', plate.upper())
+    return plate.translate(OCR_FOLDS)
+
+
+# OCR confusion classes on canonical plates (8/B, 0/D/Q, 5/S, ...), each folded onto its first character
+# A plate misread only within these classes folds to the same key as the real plate
+CONFUSION_CLASSES = ["0DQ", "8B", "5S", "2Z", "6G", "17L", "4A", "VU"]
+CONFUSION_FOLDS = str.maketrans({c: group[0] for group in CONFUSION_CLASSES for c in group[1:]})
+
+
+def fold_plate(canonical_plate):
+    return canonical_plate.translate(CONFUSION_FOLDS)
+
+
+# Keys of the fuzzy plate index (symmetric deletion dictionary): the folded plate and every single-character deletion
+# of it. Two plates share a key when they differ by confusions plus at most one insertion, deletion or substitution.
+def fuzzy_keys(canonical_plate):
+    folded = fold_plate(canonical_plate)
+    keys = {folded}
+    if len(folded) > 1:
+        keys.update(folded[:i] + folded[i + 1:] for i in range(len(folded)))
+    return keys
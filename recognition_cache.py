@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Default on-disk location for standalone use; app.py points it at the Flask instance folder (RECOGNITION_CACHE_PATH)
+DEFAULT_CACHE_PATH = os.environ.get("RECOGNITION_CACHE_PATH", os.path.join("instance", "recognition_cache.db"))
+
+
+# Content digest of an image, used as the cache key (byte-identical frames share one entry)
+def image_digest(image_bytes):
+    return hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+
+
+# Content-addressed cache of PlateRecognizer results stored in SQLite
+# Entries expire after ttl seconds; when more than max_entries are stored the least recently used are dropped.
+# Counting the table is a full scan, so the size cap is enforced every evict_interval puts rather than on each one
+# (the file is shared by every worker process, a per-process running count would drift).
+class RecognitionCache:
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=24 * 3600, max_entries=50_000, evict_interval=500):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self._puts_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # Takes effect when the database is next opened (it is opened lazily, on the first lookup)
+    def configure(self, path=None, ttl=None, max_entries=None):
+        if path is not None:
+            self.path = path
+        if ttl is not None:
+            self.ttl = ttl
+        if max_entries is not None:
+            self.max_entries = max_entries
+
+    # Opened lazily so importing the module never touches the disk
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS recognition_cache ("
+                " digest TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_recognition_cache_last_used ON recognition_cache (last_used_at)")
+        return self._conn
+
+    # Return the cached PlateRecognizer JSON for an image digest, or None
+    def get(self, digest):
+        now = time.time()
+
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT result, created_at FROM recognition_cache WHERE digest = ?", (digest,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            if now - row[1] > self.ttl:
+                conn.execute("DELETE FROM recognition_cache WHERE digest = ?", (digest,))
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE recognition_cache SET last_used_at = ? WHERE digest = ?", (now, digest))
+            self.hits += 1
+            return json.loads(row[0])
+
+    # Store a successful PlateRecognizer response; the size cap is checked every evict_interval puts
+    def put(self, digest, result):
+        now = time.time()
+
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO recognition_cache (digest, result, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (digest, json.dumps(result), now, now)
+            )
+
+            self._puts_since_evict += 1
+            if self._puts_since_evict < self.evict_interval:
+                return
+            self._puts_since_evict = 0
+
+            count = conn.execute("SELECT COUNT(*) FROM recognition_cache").fetchone()[0]
+            if count > self.max_entries:
+                cursor = conn.execute(
+                    "DELETE FROM recognition_cache WHERE digest IN ("
+                    " SELECT digest FROM recognition_cache ORDER BY last_used_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.evictions += cursor.rowcount
+
+    # Drop every entry older than the TTL, returns how many were removed
+    def purge_expired(self):
+        with self._lock:
+            cursor = self._connection().execute("DELETE FROM recognition_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            self.expired += cursor.rowcount
+            return cursor.rowcount
+
+    # Counters exposed through /api/recognition/cache-stats
+    def stats(self):
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM recognition_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "expired": self.expired,
+                "evictions": self.evictions
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared instance used by the default PlateRecognizer client
+recognition_cache = RecognitionCache()
@@ -0,0 +1,212 @@
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+
+
+# Raised by submit when the queue is at max_depth, so uploads are turned away instead of piling up
+class QueueFull(Exception):
+
+    def __init__(self, depth, retry_after):
+        super().__init__(f"Recognition queue is full ({depth} jobs waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class RecognitionJob:
+
+    def __init__(self, image_bytes, lane, priority, filename=None):
+        self.job_id = uuid.uuid4().hex
+        self.image_bytes = image_bytes
+        self.lane = lane
+        self.priority = priority
+        self.filename = filename
+        self.status = "queued"  # queued -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        job = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "lane": self.lane,
+            "filename": self.filename,
+            "queued_ms": round(((self.started_at or time.time()) - self.enqueued_at) * 1000, 1),
+        }
+        if self.finished_at is not None:
+            job["processing_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.result is not None:
+            job.update(self.result)
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+# In-process recognition job queue with a worker pool, no external broker
+# Jobs are served by lane priority (lower first, LANE_PRIORITIES config), FIFO within a priority.
+# submit() raises QueueFull past max_depth (backpressure); finished jobs are kept for result_ttl seconds for polling,
+# and expired on every submit, poll and stats call and by idle workers, so results never outlive that when traffic stops.
+# Jobs live in memory only, a restart drops queued work and unpolled results.
+class RecognitionJobQueue:
+
+    def __init__(self, handler=None, workers=8, max_depth=1000, result_ttl=600, lane_priorities=None, default_priority=10):
+        self.handler = handler  # handler(image_bytes, lane) -> result dict, run on a worker thread
+        self.workers = workers
+        self.max_depth = max_depth
+        self.result_ttl = result_ttl
+        self.lane_priorities = lane_priorities or {}
+        self.default_priority = default_priority
+        self._heap = []
+        self._sequence = itertools.count()
+        self._jobs = {}
+        self._finished = deque()  # (finished_at, job_id) in completion order, for expiry
+        self._condition = threading.Condition()
+        self._threads = []
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queue_waits = deque(maxlen=1000)
+        self._processing_times = deque(maxlen=1000)
+
+    def configure(self, **options):
+        for key, value in options.items():
+            setattr(self, key, value)
+
+    def priority_for(self, lane):
+        return self.lane_priorities.get(lane, self.default_priority)
+
+    # Queue a frame; returns the job, or raises QueueFull
+    def submit(self, image_bytes, lane=None, filename=None):
+        job = RecognitionJob(image_bytes, lane, self.priority_for(lane), filename)
+
+        with self._condition:
+            self._expire_finished()
+
+            if len(self._heap) >= self.max_depth:
+                self.rejected += 1
+                raise QueueFull(len(self._heap), self._retry_after())
+
+            heapq.heappush(self._heap, (job.priority, next(self._sequence), job))
+            self._jobs[job.job_id] = job
+            self.submitted += 1
+            self._start_workers()
+            self._condition.notify()
+
+        return job
+
+    def get(self, job_id):
+        with self._condition:
+            self._expire_finished()
+            return self._jobs.get(job_id)
+
+    # Long-poll: wait up to timeout seconds for the job to finish, returns the job (None if unknown or expired)
+    def wait(self, job_id, timeout):
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            job.done.wait(timeout)
+        return job
+
+    # Started lazily, like the preprocessing pool
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"recognition-job-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    # Idle workers wake up now and then to drop results nobody polled
+                    self._condition.wait(self.result_ttl)
+                    self._expire_finished()
+                _, _, job = heapq.heappop(self._heap)
+                job.status = "running"
+                job.started_at = time.time()
+                self.running += 1
+
+            try:
+                job.result = self.handler(job.image_bytes, job.lane)
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+
+            job.finished_at = time.time()
+            job.image_bytes = None  # the frame is no longer needed once processed
+
+            with self._condition:
+                self.running -= 1
+                if job.status == "done":
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._queue_waits.append(job.started_at - job.enqueued_at)
+                self._processing_times.append(job.finished_at - job.started_at)
+                self._finished.append((job.finished_at, job.job_id))
+
+            job.done.set()
+
+    def _expire_finished(self):
+        cutoff = time.time() - self.result_ttl
+        while self._finished and self._finished[0][0] < cutoff:
+            _, job_id = self._finished.popleft()
+            self._jobs.pop(job_id, None)
+
+    # Rough wait until a slot frees up: the queue drained at the recent processing rate
+    def _retry_after(self):
+        if not self._processing_times:
+            return 1
+        average = sum(self._processing_times) / len(self._processing_times)
+        return max(1, round(len(self._heap) * average / max(1, self.workers)))
+
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return None, None
+        ordered = sorted(samples)
+        p50 = ordered[len(ordered) // 2]
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return round(p50 * 1000, 1), round(p95 * 1000, 1)
+
+    # Counters exposed through /api/checkpoint/jobs/stats
+    def stats(self):
+        with self._condition:
+            self._expire_finished()
+
+            depth_by_lane = {}
+            for _, _, job in self._heap:
+                key = job.lane if job.lane is not None else "default"
+                depth_by_lane[key] = depth_by_lane.get(key, 0) + 1
+
+            wait_p50, wait_p95 = self._percentiles(self._queue_waits)
+            processing_p50, processing_p95 = self._percentiles(self._processing_times)
+
+            return {
+                "depth": len(self._heap),
+                "depth_by_lane": depth_by_lane,
+                "max_depth": self.max_depth,
+                "running": self.running,
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "results_kept": len(self._jobs) - len(self._heap) - self.running,
+                "queue_wait_p50_ms": wait_p50,
+                "queue_wait_p95_ms": wait_p95,
+                "processing_p50_ms": processing_p50,
+                "processing_p95_ms": processing_p95
+            }
+
+
+# Shared instance, configured with its handler and limits from app.config in app.py
+recognition_jobs = RecognitionJobQueue()
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Shared store on a local SQLite file, a stand-in for a cache server that every worker process on the host can fill
+class SQLiteResponseStore:
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # Opened lazily so importing the module never touches the disk
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl))
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared store on Redis (optional dependency, only imported when configured)
+class RedisResponseStore:
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_SHARED_URL points at Redis but the redis package is not installed")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def close(self):
+        self._client.close()
+
+
+# Shared store for a RESPONSE_CACHE_SHARED_URL: "" (none), "sqlite:///path/to/file.db" or "redis://host:port/db"
+def make_shared_store(url):
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteResponseStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisResponseStore(url)
+    raise ValueError(f"Unsupported response cache URL: {url}")
+
+
+# Cache of rendered read-endpoint responses keyed by (endpoint, user id, query string)
+# Every entry records the user's data version it was rendered at (see data_versions.py) and only serves that version,
+# so a write in any process makes it stale. Writes also drop the affected users' local entries right away.
+# The in-process LRU is bounded by entry count and bytes; an optional shared store lets worker processes fill each other,
+# its keys include the version so they never need deleting and simply expire after ttl seconds.
+class ResponseCache:
+
+    def __init__(self, max_entries=10_000, max_bytes=64 * 1024 * 1024, ttl=300, shared=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (version, mimetype, body, stored_at)
+        self._keys_by_user = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def configure(self, max_entries=None, max_bytes=None, ttl=None, shared_url=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if ttl is not None:
+                self.ttl = ttl
+            if shared_url is not None:
+                if self.shared is not None:
+                    self.shared.close()
+                self.shared = make_shared_store(shared_url)
+
+    @staticmethod
+    def _shared_key(key, version):
+        endpoint, user_id, query_string = key
+        query = hashlib.blake2b(query_string, digest_size=8).hexdigest()
+        return f"response:{endpoint}:{user_id}:{version}:{query}"
+
+    # Return (mimetype, body) rendered at this version, or None on a miss
+    def get(self, key, version):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] == version and now - entry[3] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+
+        if self.shared is not None:
+            value = self.shared.get(self._shared_key(key, version))
+            if value is not None:
+                mimetype, _, body = bytes(value).partition(b"\n")
+                mimetype = mimetype.decode("ascii")
+                self._store(key, version, mimetype, body, now)
+                with self._lock:
+                    self.shared_hits += 1
+                return mimetype, body
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, version, mimetype, body):
+        self._store(key, version, mimetype, body, time.time())
+
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key, version), mimetype.encode("ascii") + b"\n" + body, self.ttl)
+
+    def _store(self, key, version, mimetype, body, now):
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (version, mimetype, body, now)
+            self._keys_by_user.setdefault(key[1], set()).add(key)
+            self._bytes += len(body)
+
+            # Least recently used entries go first
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+
+        self._bytes -= len(entry[2])
+        keys = self._keys_by_user.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[1]]
+        return True
+
+    # The data behind these users' responses changed (the writer bumps their versions in the same transaction)
+    def invalidate_users(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                for key in list(self._keys_by_user.get(user_id, ())):
+                    if self._remove(key):
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._bytes = 0
+
+    # Counters exposed through /api/responses/cache-stats
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "shared_store": type(self.shared).__name__ if self.shared is not None else None
+            }
+
+
+# Shared instance used by the cached read endpoints in app.py and invalidated by bump_user_versions
+response_cache = ResponseCache()
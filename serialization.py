@@ -0,0 +1,200 @@
+import gzip
+import json
+
+from flask import current_app, request
+
+# Fast JSON encoder, the standard library is used when orjson isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Brotli is optional, gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Datetimes in API responses use "%Y-%m-%d %H:%M:%S"; isoformat produces the same text without parsing a format string
+def format_datetime(value):
+    return value.isoformat(" ", "seconds") if value is not None else None
+
+
+def format_date(value):
+    return value.isoformat() if value is not None else None
+
+
+# Template field taking its value from a per-request mapping: context[name][row.<key>]
+# e.g. Lookup("travellers", "pass_id") renders travellers_by_pass[row.pass_id]
+class Lookup:
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+
+
+# Precompiled row -> dict renderer for one response shape
+# fields are (json key, row attribute or Lookup[, converter]). A plain function is generated per shape of input row:
+# for query rows (which have _fields) it reads columns by position, which is much cheaper than attribute access,
+# otherwise by attribute. Rendering a row is then a single dict literal with no per-field dispatch.
+class RowTemplate:
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.context_names = sorted({f[1].name for f in fields if isinstance(f[1], Lookup)})
+        self._renderers = {}  # row _fields (None for plain objects) -> compiled function
+
+    def _compile(self, row_fields):
+        positions = {name: i for i, name in enumerate(row_fields)} if row_fields is not None else None
+
+        def load(attribute):
+            if positions is not None and attribute in positions:
+                return f"row[{positions[attribute]}]"
+            return f"row.{attribute}"
+
+        namespace = {}
+        items = []
+        for i, field in enumerate(self.fields):
+            key, source = field[0], field[1]
+            converter = field[2] if len(field) > 2 else None
+
+            if isinstance(source, Lookup):
+                expr = f"ctx_{source.name}[{load(source.key)}]"
+            else:
+                expr = load(source)
+
+            if converter is not None:
+                namespace[f"conv_{i}"] = converter
+                expr = f"conv_{i}({expr})"
+
+            items.append(f"{key!r}: {expr}")
+
+        params = "".join(f", ctx_{name}" for name in self.context_names)
+        source_code = f"def render(row{params}):\n    return {{{', '.join(items)}}}\n"
+        exec(compile(source_code, f"<RowTemplate {', '.join(f[0] for f in self.fields)}>", "exec"), namespace)
+        return namespace["render"]
+
+    # The compiled function for rows shaped like this one
+    def renderer(self, row):
+        row_fields = getattr(row, "_fields", None)
+        render = self._renderers.get(row_fields)
+        if render is None:
+            render = self._renderers[row_fields] = self._compile(row_fields)
+        return render
+
+    def render(self, row, **context):
+        return self.renderer(row)(row, *(context[name] for name in self.context_names))
+
+    def render_many(self, rows, **context):
+        if not rows:
+            return []
+
+        render = self.renderer(rows[0])
+        if not self.context_names:
+            return [render(row) for row in rows]
+
+        values = [context[name] for name in self.context_names]
+        return [render(row, *values) for row in rows]
+
+
+# Serialize a payload the way jsonify does (sorted keys, non-ASCII escaped as \uXXXX, trailing newline)
+# orjson always writes raw UTF-8, so the rare payload with non-ASCII text (e.g. "José") goes through json instead
+def dumps(payload):
+    if orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        if body.isascii():
+            return body
+    return (json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n").encode("ascii")
+
+
+# Drop-in replacement for jsonify on the read endpoints
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype="application/json")
+
+
+# Compress JSON responses with brotli or gzip, whichever the client prefers in Accept-Encoding
+# Runs after the view (and after the response cache), so cached bodies stay uncompressed and serve any client.
+# A compressed body is not byte-identical to the identity one, so its ETag becomes weak (W/"..."); conditional GETs
+# compare weakly and still answer 304.
+def init_response_compression(app):
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype != "application/json" or response.direct_passthrough:
+            return response
+
+        response.vary.add("Accept-Encoding")
+
+        if (response.status_code != 200 or "Content-Encoding" in response.headers
+                or response.content_length is None or response.content_length < app.config.get("COMPRESS_MIN_BYTES", 1024)):
+            return response
+
+        offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+        encoding = request.accept_encodings.best_match(offered)
+
+        if encoding == "br":
+            response.set_data(brotli.compress(response.get_data(), quality=app.config.get("COMPRESS_BROTLI_QUALITY", 4)))
+        elif encoding == "gzip":
+            response.set_data(gzip.compress(response.get_data(), compresslevel=app.config.get("COMPRESS_GZIP_LEVEL", 6), mtime=0))
+        else:
+            return response
+
+        response.headers["Content-Encoding"] = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+# Response shapes of the read endpoints
+TRAVELLER_ROW = RowTemplate([
+    ("user_id", "user_id"),
+    ("first_name", "first_name"),
+    ("middle_name", "middle_name"),
+    ("last_name", "last_name"),
+    ("passport_number", "passport_number"),
+])
+
+USER_TRAVELLER_ROW = RowTemplate([
+    ("traveller_id", "user_id"),
+    ("first_name", "first_name"),
+    ("middle_name", "middle_name"),
+    ("last_name", "last_name"),
+    ("passport_number", "passport_number"),
+])
+
+PASS_ROW = RowTemplate([
+    ("pass_id", "pass_id"),
+    ("expiry_datetime", "expiry_datetime", format_datetime),
+    ("pass_date", "pass_date", format_datetime),
+    ("pass_utilized", "pass_utilized"),
+    ("travellers", Lookup("travellers", "pass_id")),
+])
+
+UTILIZED_PASS_ROW = RowTemplate([
+    ("pass_id", "pass_id"),
+    ("expiry_datetime", "expiry_datetime", format_datetime),
+    ("pass_date", "pass_date", format_datetime),
+])
+
+VEHICLE_ROW = RowTemplate([
+    ("user_vehicle_id", "user_vehicle_id"),
+    ("user_vehicle_model", "user_vehicle_model"),
+    ("vehicle_id", "vehicle_id"),
+    ("vehicle_number", "vehicle_number"),
+])
+
+PRESET_COUNT_ROW = RowTemplate([
+    ("preset_id", "preset_id"),
+    ("preset_name", "preset_name"),
+    ("passenger_count", "passenger_count"),
+])
+
+PRESET_USER_ROW = RowTemplate([
+    ("user_id", "user_id"),
+    ("first_name", "first_name"),
+    ("middle_name", "middle_name"),
+    ("last_name", "last_name"),
+])
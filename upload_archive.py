@@ -0,0 +1,139 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from recognition_cache import image_digest
+
+logger = logging.getLogger(__name__)
+
+
+# Writes uploaded frames to disk on a background thread, off the request path
+# Frames are stored content-addressed ("<digest>_<filename>") so resubmitted frames share one file,
+# and the folder is trimmed by age and total size so it cannot grow without bound.
+class UploadArchiver:
+
+    def __init__(self, folder, max_age_days=7, max_total_bytes=500 * 1024 * 1024, cleanup_interval=60, max_pending=256):
+        self.folder = folder
+        self.max_age = max_age_days * 24 * 3600
+        self.max_total_bytes = max_total_bytes
+        self.cleanup_interval = cleanup_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}  # archived name -> bytes not yet on disk, so pages can show the image right away
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_cleanup = 0
+        self.written = 0
+        self.dropped = 0
+        self.removed = 0
+        self.errors = 0
+
+    # Queue a frame for archiving; returns its archived name, or None if the queue is full
+    def archive(self, filename, data):
+        name = f"{image_digest(data)[:16]}_{filename}"
+
+        with self._lock:
+            if name in self._pending:
+                return name
+
+            try:
+                self._queue.put_nowait((name, data))
+            except queue.Full:
+                # Never block an upload on archiving
+                self.dropped += 1
+                return None
+
+            self._pending[name] = data
+
+            # (Re)started here, so a writer that died never leaves frames queued with nobody to write them
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="upload-archiver", daemon=True)
+                self._thread.start()
+
+        return name
+
+    # Bytes of a frame that is queued but not written yet
+    def pending_bytes(self, name):
+        with self._lock:
+            return self._pending.get(name)
+
+    # A frame that cannot be written (disk full, permissions) is logged and counted, the writer keeps going
+    def _run(self):
+        while True:
+            name, data = self._queue.get()
+            try:
+                self._write(name, data)
+            except Exception:
+                self.errors += 1
+                logger.exception("Could not archive upload %s", name)
+            finally:
+                with self._lock:
+                    self._pending.pop(name, None)
+                self._queue.task_done()
+
+            if time.time() - self._last_cleanup >= self.cleanup_interval:
+                try:
+                    self.cleanup()
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Upload archive cleanup failed")
+
+    # Write via a temporary file so readers never see a partial image
+    def _write(self, name, data):
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder, exist_ok=True)
+
+        path = os.path.join(self.folder, name)
+        if os.path.exists(path):
+            os.utime(path)  # identical frame already archived, refresh its age
+            return
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp_path, path)
+        self.written += 1
+
+    # Retention policy: drop files older than max_age, then the oldest files until under max_total_bytes
+    def cleanup(self):
+        self._last_cleanup = time.time()
+        if not os.path.exists(self.folder):
+            return 0
+
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        cutoff = time.time() - self.max_age
+        total = sum(size for _, size, _ in files)
+        removed = 0
+
+        for mtime, size, path in files:
+            if mtime >= cutoff and total <= self.max_total_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        self.removed += removed
+        return removed
+
+    # Block until every queued frame is on disk (used by scripts and shutdown)
+    def flush(self):
+        self._queue.join()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "removed": self.removed,
+            "errors": self.errors
+        }
@@ -0,0 +1,85 @@
+import hashlib
+import json
+from datetime import datetime
+
+from models import UserSensitiveInformation
+
+
+# Parsers for each editable profile field; they return the column value or raise ValueError
+def _name(max_length, optional=False):
+
+    def parse(value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if optional:
+                return None
+            raise ValueError("must not be empty")
+
+        if not isinstance(value, str):
+            raise ValueError("must be a string")
+
+        value = value.strip()
+        if len(value) > max_length:
+            raise ValueError(f"must be at most {max_length} characters")
+        return value
+
+    return parse
+
+
+def _date(value):
+    if not isinstance(value, str):
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+
+# JSON field -> (model column, parser), in the order the profile is returned
+PROFILE_FIELDS = {
+    "first_name": (UserSensitiveInformation.first_name, _name(50)),
+    "middle_name": (UserSensitiveInformation.middle_name, _name(50, optional=True)),
+    "last_name": (UserSensitiveInformation.last_name, _name(50)),
+    "date_of_birth": (UserSensitiveInformation.date_of_birth, _date),
+    "nationality": (UserSensitiveInformation.passport_issuing_country, _name(255)),
+    "passport_expiry": (UserSensitiveInformation.passport_expiry, _date),
+    "passport_number": (UserSensitiveInformation.passport_number, _name(20)),
+}
+
+
+# The profile as returned by the profile endpoints
+def profile_dict(user):
+    # Only middle name should be the truly optional field. Adding if-else statements for the rest to safely return None in JSON.
+    return {
+        "first_name": user.first_name if user.first_name else None,
+        "middle_name": user.middle_name if user.middle_name else None,
+        "last_name": user.last_name if user.last_name else None,
+        "date_of_birth": user.date_of_birth.strftime("%Y-%m-%d") if user.date_of_birth else None,
+        "nationality": user.passport_issuing_country if user.passport_issuing_country else None,
+        "passport_expiry": user.passport_expiry.strftime("%Y-%m-%d") if user.passport_expiry else None,
+        "passport_number": user.passport_number if user.passport_number else None
+    }
+
+
+# Strong ETag of a profile, a hash of its content
+def profile_etag(profile):
+    body = json.dumps(profile, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+# Validate a PATCH body into {column attribute name: value}
+# Returns (changes, errors); errors maps each rejected field to its message
+def parse_profile_patch(data):
+    changes, errors = {}, {}
+
+    for field, value in data.items():
+        if field not in PROFILE_FIELDS:
+            errors[field] = "unknown field"
+            continue
+
+        column, parse = PROFILE_FIELDS[field]
+        try:
+            changes[column.key] = parse(value)
+        except ValueError as e:
+            errors[field] = str(e)
+
+    return changes, errors